@@ -22,7 +22,7 @@ from .registry.registry import ComponentsRegistry,MissingBevyType
 from .registry.operators import (COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_ALL, COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_CURRENT, COMPONENTS_OT_REFRESH_PROPGROUPS_FROM_CUSTOM_PROPERTIES_ALL, COMPONENTS_OT_REFRESH_PROPGROUPS_FROM_CUSTOM_PROPERTIES_CURRENT, OT_select_component_name_to_replace, OT_select_object, ReloadRegistryOperator, OT_OpenFilebrowser)
 from .registry.ui import (BEVY_COMPONENTS_PT_Configuration, BEVY_COMPONENTS_PT_AdvancedToolsPanel, BEVY_COMPONENTS_PT_MissingTypesPanel, MISSING_TYPES_UL_List)
 
-from .components.metadata import (ComponentMetadata, ComponentsMeta, ensure_metadata_for_all_objects)
+from .components.metadata import (ComponentMetadata, ComponentsMeta, clear_component_metadata_indices, clear_dirty_component_objects, ensure_metadata_for_all_objects, find_dirty_components_after_undo, write_dirty_components)
 from .propGroups.prop_groups import (generate_propertyGroups_for_components)
 from .components.lists import GENERIC_LIST_OT_actions, Generic_LIST_OT_AddItem, Generic_LIST_OT_RemoveItem, Generic_LIST_OT_SelectItem
 from .components.definitions_list import (ComponentDefinitionsList, ClearComponentDefinitionsList)
@@ -130,15 +130,60 @@ from bpy.app.handlers import persistent
 
 @persistent
 def post_load(file_name):
+    clear_component_metadata_indices() # the objects of the previous file are gone
+    clear_dirty_component_objects()
     registry = bpy.context.window_manager.components_registry
     if registry != None:
+        registry.component_usage_index.invalidate()
         registry.load_settings()
-        
+
+@persistent
+def pre_save(file_name):
+    registry = bpy.context.window_manager.components_registry
+    if registry != None:
+        registry.serialize_registry()
+        write_dirty_components()
+
+# the undo steps can be taken between a change & the (coalesced) write of its custom property, see prop_groups.update_component
+# restoring such a step restores the component as dirty: write it again (only the objects edited since the file was loaded are visited)
+# the restored metadata can differ from the indexed one without changing its length (ie undoing a rename): the indices are dropped
+@persistent
+def post_undo(scene):
+    clear_component_metadata_indices()
+    find_dirty_components_after_undo()
+    registry = bpy.context.window_manager.components_registry
+    if registry != None:
+        registry.component_usage_index.invalidate()
+        if not registry.deferred_custom_properties:
+            write_dirty_components()
+
+# the objects changed by the user (ie custom properties edited by hand) might have added/removed components
+@persistent
+def post_depsgraph_update(scene, depsgraph):
+    registry = bpy.context.window_manager.components_registry
+    if registry != None:
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                registry.component_usage_index.mark_object(update.id)
+
+# picked up by the gltf exporter from the enabled add-ons: the components edited in deferred mode (or not written yet) get their custom properties written before the export
+class glTF2ExportUserExtension:
+    def pre_export_hook(self, export_settings):
+        registry = bpy.context.window_manager.components_registry
+        if registry != None:
+            written = write_dirty_components()
+            if written > 0:
+                print("wrote", written, "deferred component values before export")
+
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.WindowManager.blueprint_name = StringProperty()
     bpy.app.handlers.load_post.append(post_load)
+    bpy.app.handlers.save_pre.append(pre_save)
+    bpy.app.handlers.undo_post.append(post_undo)
+    bpy.app.handlers.redo_post.append(post_undo)
+    bpy.app.handlers.depsgraph_update_post.append(post_depsgraph_update)
 
 def unregister():
     for cls in classes:
@@ -146,4 +191,8 @@ def unregister():
     del bpy.types.WindowManager.blueprint_name
     
     bpy.app.handlers.load_post.remove(post_load)
+    bpy.app.handlers.save_pre.remove(pre_save)
+    bpy.app.handlers.undo_post.remove(post_undo)
+    bpy.app.handlers.redo_post.remove(post_undo)
+    bpy.app.handlers.depsgraph_update_post.remove(post_depsgraph_update)
 
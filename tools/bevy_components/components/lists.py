@@ -1,6 +1,7 @@
 import json
 from bpy_types import Operator, UIList
 from bpy.props import (StringProperty, EnumProperty, PointerProperty, FloatVectorProperty, IntProperty)
+from .metadata import find_component_metadata
 
 class Generic_LIST_OT_AddItem(Operator): 
     """Add a new item to the list.""" 
@@ -21,8 +22,7 @@ class Generic_LIST_OT_AddItem(Operator):
         print("")
         object = context.object
         # information is stored in component meta
-        components_in_object = object.components_meta.components
-        component_meta =  next(filter(lambda component: component["name"] == self.component_name, components_in_object), None)
+        component_meta = find_component_metadata(object, self.component_name)
 
         propertyGroup = component_meta
         for path_item in json.loads(self.property_group_path):
@@ -58,8 +58,7 @@ class Generic_LIST_OT_RemoveItem(Operator):
 
         object = context.object
         # information is stored in component meta
-        components_in_object = object.components_meta.components
-        component_meta =  next(filter(lambda component: component["name"] == self.component_name, components_in_object), None)
+        component_meta = find_component_metadata(object, self.component_name)
 
         propertyGroup = component_meta
         for path_item in json.loads(self.property_group_path):
@@ -95,8 +94,7 @@ class Generic_LIST_OT_SelectItem(Operator):
 
         object = context.object
         # information is stored in component meta
-        components_in_object = object.components_meta.components
-        component_meta =  next(filter(lambda component: component["name"] == self.component_name, components_in_object), None)
+        component_meta = find_component_metadata(object, self.component_name)
 
         propertyGroup = component_meta
         for path_item in json.loads(self.property_group_path):
@@ -136,8 +134,7 @@ class GENERIC_LIST_OT_actions(Operator):
     def invoke(self, context, event):
         object = context.object
         # information is stored in component meta
-        components_in_object = object.components_meta.components
-        component_meta =  next(filter(lambda component: component["name"] == self.component_name, components_in_object), None)
+        component_meta = find_component_metadata(object, self.component_name)
 
         propertyGroup = component_meta
         for path_item in json.loads(self.property_group_path):
@@ -1,3 +1,5 @@
+import time
+import zlib
 import bpy
 from bpy.props import (StringProperty, BoolProperty, PointerProperty)
 from bpy_types import (PropertyGroup)
@@ -47,26 +49,90 @@ class ComponentMetadata(bpy.types.PropertyGroup):
         default=True
     )
 
+    values_dirty: BoolProperty(
+        name="values dirty",
+        description="the values of the component were changed, but not written to its custom property yet (deferred custom properties only)",
+        default=False
+    )
+
 class ComponentsMeta(PropertyGroup):
     infos_per_component:  StringProperty(
         name="infos per component",
         description="component"
     )
     components: bpy.props.CollectionProperty(type = ComponentMetadata)  
+    metadata_stamp: StringProperty(
+        name="metadata stamp",
+        description="registry & custom properties the metadata was last checked against, see get_metadata_stamp",
+        default=""
+    )
 
     @classmethod
     def register(cls):
         bpy.types.Object.components_meta = PointerProperty(type=ComponentsMeta)
+        bpy.types.WindowManager.components_metadata_progress = bpy.props.FloatProperty(default=-1.0)
 
     @classmethod
     def unregister(cls):
         del bpy.types.Object.components_meta
+        del bpy.types.WindowManager.components_metadata_progress
 
 # We need a collection property of components PER object
 def get_component_metadata_by_short_name(object, short_name):
     if not "components_meta" in object:
         return None
-    return next(filter(lambda component: component["name"] == short_name, object.components_meta.components), None)
+    return find_component_metadata(object, short_name)
+
+# per object (session uid, unlike pointers it is not reused for other objects): (amount of components metadata, short name => index in object.components_meta.components)
+# looking through the collection is a python level loop over blender data, for every single lookup: the indices are kept instead
+# they are dropped when removing metadata, cleared on undo/redo & load (the metadata can change without its length changing), & rebuilt when found out of date (ie changes made by other scripts)
+component_metadata_indices = {}
+
+def clear_component_metadata_indices():
+    component_metadata_indices.clear()
+
+# drops the indices of the objects that no longer exist, once there are a lot more indices than objects
+def prune_component_metadata_indices():
+    objects = bpy.data.objects
+    if len(component_metadata_indices) > 2 * len(objects) + 100:
+        live_objects = set(object.session_uid for object in objects)
+        for key in [key for key in component_metadata_indices if key not in live_objects]:
+            del component_metadata_indices[key]
+
+# verify_miss: rebuilds the indices before reporting a component as missing, for the rare cases where it matters (ie before adding it)
+def find_component_metadata_index(object, short_name, verify_miss=False):
+    components_metadata = object.components_meta.components
+    key = object.session_uid
+    entry = component_metadata_indices.get(key, None)
+    if entry is not None and entry[0] == len(components_metadata):
+        index = entry[1].get(short_name, None)
+        if index is None and not verify_miss or index is not None and components_metadata[index].name == short_name:
+            return index
+    elif entry is None:
+        prune_component_metadata_indices()
+    # missing or out of date
+    indices = {component_meta.name: index for (index, component_meta) in enumerate(components_metadata)}
+    component_metadata_indices[key] = (len(components_metadata), indices)
+    return indices.get(short_name, None)
+
+def find_component_metadata(object, short_name, verify_miss=False):
+    index = find_component_metadata_index(object, short_name, verify_miss)
+    return object.components_meta.components[index] if index is not None else None
+
+def add_component_metadata(object, short_name):
+    components_metadata = object.components_meta.components
+    component_meta = components_metadata.add()
+    component_meta.name = short_name
+    entry = component_metadata_indices.get(object.session_uid, None)
+    if entry is not None and entry[0] == len(components_metadata) - 1:
+        entry[1][short_name] = len(components_metadata) - 1
+        component_metadata_indices[object.session_uid] = (len(components_metadata), entry[1])
+    return component_meta
+
+def remove_component_metadata(object, index):
+    object.components_meta.components.remove(index)
+    component_metadata_indices.pop(object.session_uid, None)
+    bpy.context.window_manager.components_registry.component_usage_index.mark_object(object)
 
 # remove no longer valid metadata from object
 def cleanup_invalid_metadata(object):
@@ -77,8 +143,9 @@ def cleanup_invalid_metadata(object):
         if short_name not in object.keys():
             print("component:", short_name, "present in metadata, but not in object")
             to_remove.append(index)
-    for index in to_remove:
-        components_metadata.remove(index)
+    # the last ones first, so that the indices of the others do not change
+    for index in reversed(to_remove):
+        remove_component_metadata(object, index)
 
 
 # returns a component definition ( an entry in registry's type_infos) with matching short name or None if nothing has been found
@@ -89,11 +156,113 @@ def find_component_definition_from_short_name(short_name):
         return registry.type_infos.get(long_name, None)
     return None
 
-# FIXME: feels a bit heavy duty, should only be done
-# if the components panel is active ?
+# the metadata of an object only needs checking if the registry or the custom properties of the object changed since the last check
+def get_metadata_stamp(object, registry):
+    keys = "\n".join(key for key in object.keys() if key != "components_meta")
+    return registry.schema_hash + ":" + format(zlib.crc32(keys.encode()), "08x")
+
+# returns whether the metadata of the object had to be checked
+def ensure_metadata_for_object(object, registry, ensured_propertyGroups):
+    if len(object.keys()) == 0: # nothing to check, & no need to add data to the object
+        return False
+    stamp = get_metadata_stamp(object, registry)
+    components_meta = object.components_meta
+    if components_meta.metadata_stamp == stamp:
+        # the metadata is fine, but the propertyGroups are only generated on first use, & have to exist for the components of the object
+        for component_name in object.keys():
+            if component_name not in ensured_propertyGroups:
+                ensured_propertyGroups.add(component_name)
+                ensure_component_propertyGroup(component_name, registry)
+        return False
+    add_metadata_to_components_without_metadata(object)
+    components_meta.metadata_stamp = stamp
+    return True
+
+def ensure_component_propertyGroup(component_name, registry):
+    long_name = registry.short_names_to_long_names.get(component_name, None)
+    property_group_name = registry.get_propertyGroupName_from_shortName(component_name)
+    if long_name is not None:
+        registry.ensure_propertyGroups(long_name)
+    # the propertyGroups might already exist without being injected, ie generated as a dependency of another component
+    if property_group_name in registry.component_propertyGroups and not hasattr(ComponentMetadata, property_group_name):
+        setattr(ComponentMetadata, property_group_name, registry.component_propertyGroups[property_group_name])
+
+# returns the amount of objects whose metadata had to be checked
 def ensure_metadata_for_all_objects():
+    stop_ensure_metadata_job() # everything gets done right away
+    component_metadata_indices.clear()
+    registry = bpy.context.window_manager.components_registry
+    ensured_propertyGroups = set()
+    checked = 0
     for object in bpy.data.objects:
-        add_metadata_to_components_without_metadata(object)
+        if ensure_metadata_for_object(object, registry, ensured_propertyGroups):
+            checked += 1
+    return checked
+
+# on file load, big files (tens of thousands of objects) would freeze the ui for a long time: the metadata is ensured by a timer instead,
+# a bounded time slice at a time, with its progress in window_manager.components_metadata_progress
+class EnsureMetadataJob():
+    def __init__(self, object_names, slice_duration):
+        self.object_names = object_names
+        self.slice_duration = slice_duration # (s)
+        self.position = 0
+        self.checked = 0
+        self.ensured_propertyGroups = set()
+
+    def progress(self):
+        return self.position / len(self.object_names) if len(self.object_names) > 0 else 1.0
+
+    def is_done(self):
+        return self.position >= len(self.object_names)
+
+    # processes objects until the time slice is used up (at least one object), returns whether everything is done
+    def run_slice(self):
+        registry = bpy.context.window_manager.components_registry
+        end_time = time.perf_counter() + self.slice_duration
+        while not self.is_done():
+            # objects renamed/removed in the meantime get checked on the next load/reload
+            object = bpy.data.objects.get(self.object_names[self.position], None)
+            self.position += 1
+            if object is not None and ensure_metadata_for_object(object, registry, self.ensured_propertyGroups):
+                self.checked += 1
+            if time.perf_counter() >= end_time:
+                break
+        return self.is_done()
+
+ensure_metadata_job = None
+
+def start_ensure_metadata_job(slice_duration=0.02):
+    global ensure_metadata_job
+    stop_ensure_metadata_job()
+    component_metadata_indices.clear()
+    ensure_metadata_job = EnsureMetadataJob([object.name for object in bpy.data.objects], slice_duration)
+    bpy.context.window_manager.components_metadata_progress = 0.0
+    bpy.app.timers.register(run_ensure_metadata_job)
+    return ensure_metadata_job
+
+def stop_ensure_metadata_job():
+    global ensure_metadata_job
+    if ensure_metadata_job is None:
+        return
+    ensure_metadata_job = None
+    if bpy.app.timers.is_registered(run_ensure_metadata_job):
+        bpy.app.timers.unregister(run_ensure_metadata_job)
+    bpy.context.window_manager.components_metadata_progress = -1.0
+
+def run_ensure_metadata_job():
+    job = ensure_metadata_job
+    if job is None:
+        return None
+    done = job.run_slice()
+    bpy.context.window_manager.components_metadata_progress = -1.0 if done else job.progress()
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            area.tag_redraw()
+    if done:
+        print("ensured metadata of", len(job.object_names), "objects,", job.checked, "checked")
+        stop_ensure_metadata_job()
+        return None
+    return 0.0
 
 # returns whether an object has custom properties without matching metadata
 def do_object_custom_properties_have_missing_metadata(object):
@@ -101,13 +270,11 @@ def do_object_custom_properties_have_missing_metadata(object):
     if components_metadata == None:
         return True
 
-    components_metadata = components_metadata.components
-
     missing_metadata = False
     for component_name in dict(object) :
         if component_name == "components_meta":
             continue
-        component_meta =  next(filter(lambda component: component["name"] == component_name, components_metadata), None)
+        component_meta = find_component_metadata(object, component_name)
         if component_meta == None: 
             # current component has no metadata but is there even a compatible type in the registry ?
             # if not ignore it
@@ -128,6 +295,26 @@ def add_metadata_to_components_without_metadata(object):
             continue
         upsert_component_in_object(object, component_name, registry)
        
+# the propertyGroups of a component are generated on first use, but blender does not allow registering classes while drawing the ui
+# so if the ui finds a component without propertyGroup, it asks for it to be upserted right after drawing
+pending_upserts = set()
+def request_upsert_component_in_object(object, component_name):
+    key = (object.name, component_name)
+    if key in pending_upserts:
+        return
+    pending_upserts.add(key)
+
+    def upsert():
+        pending_upserts.discard(key)
+        target_object = bpy.data.objects.get(key[0], None)
+        if target_object is not None and key[1] in target_object:
+            upsert_component_in_object(target_object, key[1], bpy.context.window_manager.components_registry)
+            for window in bpy.context.window_manager.windows:
+                for area in window.screen.areas:
+                    area.tag_redraw()
+        return None
+    bpy.app.timers.register(upsert)
+
 # adds a component to an object (including metadata) using the provided component definition & optional value
 def add_component_to_object(object, component_definition, value=None):
     cleanup_invalid_metadata(object)
@@ -153,18 +340,20 @@ def add_component_to_object(object, component_definition, value=None):
 def upsert_component_in_object(object, component_name, registry):
     # print("upsert_component_in_object", object, "component name", component_name)
     # TODO: upsert this part too ?
-    target_components_metadata = object.components_meta.components
+    registry.component_usage_index.mark_object(object)
     component_definition = find_component_definition_from_short_name(component_name)
     if component_definition != None:
         short_name = component_definition["short_name"]
         long_name = component_definition["title"]
         property_group_name = registry.get_propertyGroupName_from_shortName(short_name)
         propertyGroup = None
+        # the propertyGroups of a component are only generated on first use
+        if registry.ensure_propertyGroups(long_name) and property_group_name in registry.component_propertyGroups:
+            setattr(ComponentMetadata, property_group_name, registry.component_propertyGroups[property_group_name])
 
-        component_meta = next(filter(lambda component: component["name"] == short_name, target_components_metadata), None)
+        component_meta = find_component_metadata(object, short_name, verify_miss=True)
         if not component_meta:
-            component_meta = target_components_metadata.add()
-            component_meta.name = short_name
+            component_meta = add_component_metadata(object, short_name)
             component_meta.long_name = long_name
             propertyGroup = getattr(component_meta, property_group_name, None)
         else: # this one has metadata but we check that the relevant property group is present
@@ -207,8 +396,7 @@ def copy_propertyGroup_values_to_another_object(source_object, target_object, co
 
     registry = bpy.context.window_manager.components_registry
 
-    source_components_metadata = source_object.components_meta.components
-    source_componentMeta = next(filter(lambda component: component["name"] == short_name, source_components_metadata), None)
+    source_componentMeta = find_component_metadata(source_object, short_name)
     # matching component means we already have this type of component 
     source_propertyGroup = getattr(source_componentMeta, property_group_name)
 
@@ -218,11 +406,20 @@ def copy_propertyGroup_values_to_another_object(source_object, target_object, co
     value = property_group_value_to_custom_property_value(target_propertyGroup, component_definition, registry, None)
     target_object[short_name] = value
 
-    # copy the values over 
+    copy_propertyGroup_values(source_propertyGroup, target_propertyGroup)
+    if registry.deferred_custom_properties:
+        mark_component_dirty(target_object, get_component_metadata_by_short_name(target_object, short_name))
+    else:
+        apply_propertyGroup_values_to_object_customProperties(target_object)
+
+# copies the raw values (idProperties) of a propertyGroup over to another propertyGroup of the same type, nested propertyGroups & lists included
+# the fields that are not set in the source (ie still at their default value) get reset in the target
+def copy_propertyGroup_values(source_propertyGroup, target_propertyGroup):
     for field_name in source_propertyGroup.field_names:
         if field_name in source_propertyGroup:
             target_propertyGroup[field_name] = source_propertyGroup[field_name]
-    apply_propertyGroup_values_to_object_customProperties(target_object)
+        elif field_name in target_propertyGroup:
+            del target_propertyGroup[field_name]
 
 # TODO: move to propgroups ?
 def apply_propertyGroup_values_to_object_customProperties(object):
@@ -248,8 +445,7 @@ def apply_propertyGroup_values_to_object_customProperties_for_component(object,
         value = property_group_value_to_custom_property_value(propertyGroup, component_definition, registry, None)
         object[component_name] = value
     
-    components_metadata = object.components_meta.components
-    componentMeta = next(filter(lambda component: component["name"] == component_name, components_metadata), None)
+    componentMeta = find_component_metadata(object, component_name)
     if componentMeta:
         print("here")
         componentMeta.invalid = False
@@ -259,14 +455,15 @@ def apply_propertyGroup_values_to_object_customProperties_for_component(object,
 def apply_customProperty_values_to_object_propertyGroups(object):
     print("apply custom properties to ", object.name)
     registry = bpy.context.window_manager.components_registry
+    registry.component_usage_index.mark_object(object)
+    discard_dirty_components([object])
     for component_name in dict(object) :
         if component_name == "components_meta":
             continue
         component_definition = find_component_definition_from_short_name(component_name)
         if component_definition != None:
             property_group_name = registry.get_propertyGroupName_from_shortName(component_name)
-            components_metadata = object.components_meta.components
-            source_componentMeta = next(filter(lambda component: component["name"] == component_name, components_metadata), None)
+            source_componentMeta = find_component_metadata(object, component_name)
             # matching component means we already have this type of component 
             propertyGroup = getattr(source_componentMeta, property_group_name, None)
             customProperty_value = object[component_name]
@@ -278,23 +475,256 @@ def apply_customProperty_values_to_object_propertyGroups(object):
             source_componentMeta.invalid = False
             source_componentMeta.invalid_details = ""
 
+# batch versions of apply_propertyGroup_values_to_object_customProperties & apply_customProperty_values_to_object_propertyGroups, for the bulk operators
+# the objects are processed one component type at a time, so that everything about a component (definition, conversion plan, propertyGroup name)
+# is only looked up once for all the objects using it
+def group_objects_per_component(objects):
+    objects_per_component = {}
+    for object in objects:
+        for component_name in object.keys():
+            if component_name == "components_meta":
+                continue
+            objects_per_component.setdefault(component_name, []).append(object)
+    return objects_per_component
+
+# the same batches, split into (component name, objects) chunks of at most chunk_size objects, for the bulk operators' jobs (see jobs.ComponentsJob)
+def chunk_objects_per_component(objects, chunk_size=200):
+    chunks = []
+    for (component_name, component_objects) in group_objects_per_component(objects).items():
+        for start in range(0, len(component_objects), chunk_size):
+            chunks.append((component_name, component_objects[start:start + chunk_size]))
+    return chunks
+
+# progress_callback (optional): called with the progress (0 => 1) after each component type
+def apply_propertyGroup_values_to_objects_customProperties(objects, progress_callback=None):
+    objects = list(objects)
+    for object in objects:
+        cleanup_invalid_metadata(object)
+    objects_per_component = group_objects_per_component(objects)
+    for index, (component_name, component_objects) in enumerate(objects_per_component.items()):
+        apply_propertyGroup_values_to_objects_customProperties_for_component(component_objects, component_name)
+        if progress_callback is not None:
+            progress_callback((index + 1) / len(objects_per_component))
+
+def apply_propertyGroup_values_to_objects_customProperties_for_component(objects, component_name):
+    registry = bpy.context.window_manager.components_registry
+    component_definition = find_component_definition_from_short_name(component_name)
+    if component_definition == None:
+        return
+    for object in objects:
+        (component_meta, propertyGroup) = upsert_component_in_object(object, component_name, registry)
+        object[component_name] = property_group_value_to_custom_property_value(propertyGroup, component_definition, registry, None)
+        if component_meta.values_dirty:
+            component_meta.values_dirty = False
+
+# returns the errors, one per object & component that failed
+def apply_customProperty_values_to_objects_propertyGroups(objects, progress_callback=None):
+    errors = []
+    stats = {"conversions": 0, "copies": 0}
+    objects_per_component = group_objects_per_component(objects)
+    for index, (component_name, component_objects) in enumerate(objects_per_component.items()):
+        errors.extend(apply_customProperty_values_to_objects_propertyGroups_for_component(component_objects, component_name, {}, stats))
+        if progress_callback is not None:
+            progress_callback((index + 1) / len(objects_per_component))
+    print(format_conversion_stats(stats))
+    return errors
+
+# lots of objects (ie instances of the same blueprint) have the exact same component values: each distinct value is only converted once,
+# the other objects with that value get the resulting propertyGroup values copied over (see copy_propertyGroup_values)
+# - converted_values (optional): custom property value => (object it was converted for, error or None), to share the conversions between several calls (ie chunks) for the same component
+# - stats (optional): {"conversions", "copies"} counters, updated as we go
+def apply_customProperty_values_to_objects_propertyGroups_for_component(objects, component_name, converted_values=None, stats=None):
+    registry = bpy.context.window_manager.components_registry
+    component_definition = find_component_definition_from_short_name(component_name)
+    if component_definition == None:
+        return []
+    property_group_name = registry.get_propertyGroupName_from_shortName(component_name)
+    converted_values = {} if converted_values is None else converted_values
+    errors = []
+    # the update callbacks would write back the values we are reading from, for the whole batch: disabled globally rather than per object
+    disable_all_object_updates = registry.disable_all_object_updates
+    registry.disable_all_object_updates = True
+    try:
+        # everything is done per object: an object that fails is reported (by name) without stopping the others
+        for object in objects:
+            object_name = "?"
+            try:
+                object_name = object.name
+                registry.component_usage_index.mark_object(object)
+                discard_dirty_components([object], component_name)
+                component_meta = find_component_metadata(object, component_name)
+                propertyGroup = getattr(component_meta, property_group_name, None)
+                value = object[component_name]
+                key = value if isinstance(value, str) else None # only the actual RON strings
+                converted = converted_values.get(key, None) if key is not None else None
+                if converted is None:
+                    try:
+                        property_group_value_from_custom_property_value(propertyGroup, component_definition, registry, value)
+                        converted = (object, None)
+                    except Exception as error:
+                        converted = (object, error)
+                    if key is not None:
+                        converted_values[key] = converted
+                    if stats is not None:
+                        stats["conversions"] += 1
+                else:
+                    (source_object, error) = converted
+                    if error is None:
+                        copy_propertyGroup_values(getattr(find_component_metadata(source_object, component_name), property_group_name), propertyGroup)
+                    if stats is not None:
+                        stats["copies"] += 1
+                if converted[1] is not None:
+                    raise converted[1] # the same value fails the same way for all objects
+                component_meta.invalid = False
+                component_meta.invalid_details = ""
+            except Exception as error:
+                errors.append("object: '" + object_name + "', component: '" + component_name + "', error: " + str(error))
+    finally:
+        registry.disable_all_object_updates = disable_all_object_updates
+    return errors
+
+def format_conversion_stats(stats):
+    return "{} custom property values converted, {} copied from identical values".format(stats["conversions"], stats["copies"])
+
+# after an incremental reload of the registry: cleans up the data of the removed propertyGroups
+# & updates the regenerated propertyGroups of the given components (short names) from the custom property values, for all objects
+def refresh_components_of_all_objects(component_names, removed_propertyGroup_names):
+    registry = bpy.context.window_manager.components_registry
+    for property_group_name in removed_propertyGroup_names:
+        if hasattr(ComponentMetadata, property_group_name):
+            try:
+                delattr(ComponentMetadata, property_group_name)
+            except Exception as error:
+                print("failed to remove the propertyGroup", property_group_name, "from the components metadata", error)
+
+    for object in bpy.data.objects:
+        components_metadata = getattr(object, "components_meta", None)
+        if components_metadata == None:
+            continue
+        for component_meta in components_metadata.components:
+            for property_group_name in removed_propertyGroup_names:
+                if property_group_name in component_meta:
+                    del component_meta[property_group_name]
+
+        for component_name in dict(object):
+            if component_name not in component_names:
+                continue
+            component_definition = find_component_definition_from_short_name(component_name)
+            registry.component_usage_index.mark_object(object)
+            if component_definition == None:
+                component_meta = get_component_metadata_by_short_name(object, component_name)
+                if component_meta != None:
+                    component_meta.enabled = False
+                    component_meta.invalid = True
+                    component_meta.invalid_details = "component not present in the schema, possibly renamed? Disabling for now"
+                continue
+
+            (component_meta, propertyGroup) = upsert_component_in_object(object, component_name, registry)
+            if propertyGroup == None:
+                continue
+            # the update callbacks work on the current object, not necessarily this one, so we disable them globally
+            disable_all_object_updates = registry.disable_all_object_updates
+            registry.disable_all_object_updates = True
+            try:
+                property_group_value_from_custom_property_value(propertyGroup, component_definition, registry, object[component_name])
+                # the custom property value is regenerated, so that it matches the new definition of the component
+                object[component_name] = property_group_value_to_custom_property_value(propertyGroup, component_definition, registry, None)
+                if component_name not in registry.invalid_components:
+                    component_meta.invalid = False
+                    component_meta.invalid_details = ""
+            except Exception as error:
+                component_meta.invalid = True
+                component_meta.invalid_details = "wrong custom property value after registry reload, overwrite them by changing the values in the ui"
+                print("failed to refresh component", component_name, "of object", object.name, error)
+            finally:
+                registry.disable_all_object_updates = disable_all_object_updates
+
+# the names of the objects that (might) have dirty components: writing them all does not have to visit every object & component of the scene
+dirty_component_objects = set()
+# the names of all the objects that had dirty components since the file was loaded: undo/redo can restore any of them as dirty
+edited_component_objects = set()
+
+def mark_component_dirty(object, component_meta):
+    if not component_meta.values_dirty:
+        component_meta.values_dirty = True
+    dirty_component_objects.add(object.name)
+    edited_component_objects.add(object.name)
+
+def clear_dirty_component_objects():
+    dirty_component_objects.clear()
+    edited_component_objects.clear()
+
+# the objects with the given names, or all the objects if some of them were renamed/removed in the meantime
+def get_objects_by_names(object_names):
+    objects = [bpy.data.objects.get(object_name, None) for object_name in object_names]
+    return bpy.data.objects if None in objects else objects
+
+# in deferred mode (see ComponentsRegistry.deferred_custom_properties), editing a component only flags it as dirty
+# its custom property is written when it is needed: on export & save, or before anything reads it back
+# objects: the objects to write, defaults to the ones with dirty components (see dirty_component_objects)
+# returns the amount of components written
+def write_dirty_components(objects=None):
+    registry = bpy.context.window_manager.components_registry
+    if objects is None:
+        objects = get_objects_by_names(dirty_component_objects)
+        dirty_component_objects.clear()
+    written = 0
+    for object in objects:
+        components_metadata = getattr(object, "components_meta", None)
+        if components_metadata == None:
+            continue
+        for component_meta in components_metadata.components:
+            if component_meta.values_dirty:
+                if write_dirty_component(object, component_meta, registry):
+                    written += 1
+                else:
+                    dirty_component_objects.add(object.name)
+    return written
+
+# after undo/redo: the objects with dirty components are found again, among the ones that were edited
+def find_dirty_components_after_undo():
+    dirty_component_objects.clear()
+    for object in get_objects_by_names(edited_component_objects):
+        components_metadata = getattr(object, "components_meta", None)
+        if components_metadata != None and any(component_meta.values_dirty for component_meta in components_metadata.components):
+            dirty_component_objects.add(object.name)
+            edited_component_objects.add(object.name)
+
+# the component stays dirty if it cannot be written (ie registry not loaded)
+def write_dirty_component(object, component_meta, registry):
+    component_name = component_meta.name
+    component_definition = find_component_definition_from_short_name(component_name)
+    property_group_name = registry.get_propertyGroupName_from_shortName(component_name)
+    propertyGroup = getattr(component_meta, property_group_name, None) if property_group_name is not None else None
+    if component_definition == None or propertyGroup == None or component_name not in object:
+        return False
+    object[component_name] = property_group_value_to_custom_property_value(propertyGroup, component_definition, registry, None)
+    component_meta.values_dirty = False
+    return True
+
+# the custom properties are the source of truth when the propertyGroups get (re)generated from them: the pending edits of the ui are dropped
+# rather than written, which would overwrite the values (ie edited by hand) we are about to read
+def discard_dirty_components(objects, component_name=None):
+    for object in objects:
+        components_metadata = getattr(object, "components_meta", None)
+        if components_metadata == None:
+            continue
+        for component_meta in components_metadata.components:
+            if component_meta.values_dirty and (component_name is None or component_meta.name == component_name):
+                component_meta.values_dirty = False
+
 # removes the given component from the object: removes both the custom property and the matching metadata from the object
 def remove_component_from_object(object, component_name):
     del object[component_name]
+    bpy.context.window_manager.components_registry.component_usage_index.mark_object(object)
 
     components_metadata = getattr(object, "components_meta", None)
     if components_metadata == None:
         return False
     
-    components_metadata = components_metadata.components
-    to_remove = []
-    for index, component_meta in enumerate(components_metadata):
-        short_name = component_meta.name
-        if short_name == component_name:
-            to_remove.append(index)
-            break
-    for index in to_remove:
-        components_metadata.remove(index)
+    index = find_component_metadata_index(object, component_name)
+    if index is not None:
+        remove_component_metadata(object, index)
     return True
 
   
\ No newline at end of file
@@ -3,7 +3,8 @@ import json
 import bpy
 from bpy_types import Operator
 from bpy.props import (StringProperty)
-from .metadata import add_component_to_object, add_metadata_to_components_without_metadata, apply_customProperty_values_to_object_propertyGroups, apply_propertyGroup_values_to_object_customProperties_for_component, copy_propertyGroup_values_to_another_object, find_component_definition_from_short_name, remove_component_from_object
+from ..jobs import ComponentsJob, ComponentsJobOperator
+from .metadata import add_component_to_object, add_metadata_to_components_without_metadata, apply_customProperty_values_to_object_propertyGroups, apply_propertyGroup_values_to_object_customProperties_for_component, copy_propertyGroup_values_to_another_object, find_component_definition_from_short_name, find_component_metadata, get_component_metadata_by_short_name, remove_component_from_object, write_dirty_components
 
 class AddComponentOperator(Operator):
     """Add component to blueprint"""
@@ -121,11 +122,12 @@ class RemoveComponentOperator(Operator):
         return {'FINISHED'}
 
 
-class RemoveComponentFromAllObjectsOperator(Operator):
+class RemoveComponentFromAllObjectsOperator(ComponentsJobOperator, Operator):
     """Remove component from all object"""
     bl_idname = "object.remove_bevy_component_all"
     bl_label = "Remove component from all objects Operator"
     bl_options = {"UNDO"}
+    progress_property = "components_remove_progress"
 
     component_name: StringProperty(
         name="component name",
@@ -140,21 +142,19 @@ class RemoveComponentFromAllObjectsOperator(Operator):
     def unregister(cls):
         del bpy.types.WindowManager.components_remove_progress
 
-    def execute(self, context):
+    def create_job(self, context):
         print("removing component ", self.component_name, "from all objects")
-        total = len(bpy.data.objects)
-        for index, object in enumerate(bpy.data.objects):
-            if len(object.keys()) > 0:
-                if object is not None and self.component_name in object: 
-                    remove_component_from_object(object, self.component_name)
-            
-            progress = index / total
-            context.window_manager.components_remove_progress = progress
-            # now force refresh the ui
-            bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
-        context.window_manager.components_remove_progress = -1.0
-
-        return {'FINISHED'}
+        component_name = self.component_name
+        def remove_component(object_name):
+            object = bpy.data.objects.get(object_name, None)
+            if object is not None and component_name in object:
+                remove_component_from_object(object, component_name)
+        # only the objects that have the component: the index misses the changes that did not go through the add-on or a depsgraph update
+        # (ie custom properties set from python, renamed objects), so it gets rebuilt from all the objects first
+        usage_index = context.window_manager.components_registry.component_usage_index
+        usage_index.invalidate()
+        object_names = usage_index.get_objects_with_component(component_name)
+        return ComponentsJob(object_names, remove_component)
 
 
 class RenameHelper(bpy.types.PropertyGroup):
@@ -171,11 +171,12 @@ class RenameHelper(bpy.types.PropertyGroup):
         # remove handlers & co
         del bpy.types.WindowManager.bevy_component_rename_helper
 
-class OT_rename_component(Operator):
+class OT_rename_component(ComponentsJobOperator, Operator):
     """Rename component"""
     bl_idname = "object.rename_bevy_component"
     bl_label = "rename component"
     bl_options = {"UNDO"}
+    progress_property = "components_rename_progress"
 
     original_name: bpy.props.StringProperty(default="") # type: ignore
     new_name: StringProperty(
@@ -193,80 +194,66 @@ class OT_rename_component(Operator):
     def unregister(cls):
         del bpy.types.WindowManager.components_rename_progress
 
-    def execute(self, context):
-        registry = context.window_manager.components_registry
-        type_infos = registry.type_infos
+    def create_job(self, context):
         settings = context.window_manager.bevy_component_rename_helper
         original_name = settings.original_name if self.original_name == "" else self.original_name
         new_name = self.new_name
 
-
         print("renaming components: original name", original_name, "new_name", self.new_name, "targets", self.target_objects)
         target_objects = json.loads(self.target_objects)
-        errors = []
-        total = len(target_objects)
-
         if original_name != '' and new_name != '' and original_name != new_name and len(target_objects) > 0:
-            for index, object_name in enumerate(target_objects):
-                object = bpy.data.objects[object_name]
-                if object and original_name in object:
-                    
-                    # copy data to new component, remove the old one
-                    try: 
-                        object[new_name] = object[original_name]
-                        remove_component_from_object(object, original_name)
-                    except Exception as error:
-                        if '__disable__update' in object:
-                            del object["__disable__update"] # make sure custom properties are updateable afterwards, even in the case of failure
-                        # get metadata
-                        components_metadata = getattr(object, "components_meta", None)
-                        if components_metadata:
-                            components_metadata = components_metadata.components
-                            component_meta =  next(filter(lambda component: component["name"] == new_name, components_metadata), None)
-                            if component_meta:
-                                component_meta.invalid = True
-                                component_meta.invalid_details = "unknow issue when renaming/transforming component, please remove it & add it back again"
-
-                        errors.append( "failed to copy old component value to new component: object: '" + object.name + "', error: " + str(error))
-                        
-                    try:
-                        # attempt conversion
-                        long_name = registry.short_names_to_long_names[new_name]
-                        component_definition = type_infos[long_name]
-                        add_component_to_object(object, component_definition, object[new_name])
-                    except Exception as error:
-                        if '__disable__update' in object:
-                            del object["__disable__update"] # make sure custom properties are updateable afterwards, even in the case of failure
-                        components_metadata = getattr(object, "components_meta", None)
-                        if components_metadata:
-                            components_metadata = components_metadata.components
-                            component_meta =  next(filter(lambda component: component["name"] == new_name, components_metadata), None)
-                            if component_meta:
-                                component_meta.invalid = True
-                                component_meta.invalid_details = "wrong custom property value, overwrite them by changing the values in the ui or change them & regenerate"
-
-                        errors.append( "wrong custom property values to generate target component: object: '" + object.name + "', error: " + str(error))
-                
-                progress = index / total
-                context.window_manager.components_rename_progress = progress
-
-                try:
-                    # now force refresh the ui
-                    bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
-                except: pass # this is to allow this to run in cli/headless mode
+            # runs on later timer ticks (modal): the context of invoke is no longer valid by then, see rename_component
+            return ComponentsJob(target_objects, lambda object_name: self.rename_component(bpy.data.objects.get(object_name, None), original_name, new_name))
+        return ComponentsJob([], None)
 
-        if len(errors) > 0:
-            self.report({'ERROR'}, "Failed to rename component: Errors:" + str(errors))
+    # returns the errors
+    def rename_component(self, object, original_name, new_name):
+        registry = bpy.context.window_manager.components_registry
+        type_infos = registry.type_infos
+        errors = []
+        if object and original_name in object:
+            
+            # copy data to new component, remove the old one
+            try: 
+                write_dirty_components([object])
+                object[new_name] = object[original_name]
+                remove_component_from_object(object, original_name)
+            except Exception as error:
+                if '__disable__update' in object:
+                    del object["__disable__update"] # make sure custom properties are updateable afterwards, even in the case of failure
+                # get metadata
+                component_meta = get_component_metadata_by_short_name(object, new_name)
+                if component_meta:
+                    component_meta.invalid = True
+                    component_meta.invalid_details = "unknow issue when renaming/transforming component, please remove it & add it back again"
+
+                errors.append( "failed to copy old component value to new component: object: '" + object.name + "', error: " + str(error))
+                
+            try:
+                # attempt conversion
+                long_name = registry.short_names_to_long_names[new_name]
+                component_definition = type_infos[long_name]
+                add_component_to_object(object, component_definition, object[new_name])
+            except Exception as error:
+                if '__disable__update' in object:
+                    del object["__disable__update"] # make sure custom properties are updateable afterwards, even in the case of failure
+                component_meta = get_component_metadata_by_short_name(object, new_name)
+                if component_meta:
+                    component_meta.invalid = True
+                    component_meta.invalid_details = "wrong custom property value, overwrite them by changing the values in the ui or change them & regenerate"
+
+                errors.append( "wrong custom property values to generate target component: object: '" + object.name + "', error: " + str(error))
+        return errors
+
+    def finish(self, context, job):
+        if len(job.errors) > 0:
+            self.report({'ERROR'}, "Failed to rename component: Errors:" + job.format_errors())
         else: 
             self.report({'INFO'}, "Sucessfully renamed component")
 
         #clear data after we are done
         self.original_name = ""
         context.window_manager.bevy_component_rename_helper.original_name = ""
-        context.window_manager.components_rename_progress = -1.0
-
-
-        return {'FINISHED'}
 
 
 class GenerateComponent_From_custom_property_Operator(Operator):
@@ -334,8 +321,7 @@ class Toggle_ComponentVisibility(Operator):
 
     def execute(self, context):
         object = context.object
-        components_in_object = object.components_meta.components
-        component_meta =  next(filter(lambda component: component["name"] == self.component_name, components_in_object), None)
+        component_meta = find_component_metadata(object, self.component_name)
         if component_meta != None: 
             component_meta.visible = not component_meta.visible
 
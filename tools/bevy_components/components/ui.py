@@ -2,7 +2,7 @@ import json
 import bpy
 
 from ..registry.operators import COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_CURRENT
-from .metadata import do_object_custom_properties_have_missing_metadata
+from .metadata import do_object_custom_properties_have_missing_metadata, find_component_metadata, request_upsert_component_in_object
 from .operators import AddComponentOperator, CopyComponentOperator, Fix_Component_Operator, RemoveComponentOperator, GenerateComponent_From_custom_property_Operator, PasteComponentOperator, Toggle_ComponentVisibility
    
 def draw_propertyGroup( propertyGroup, layout, nesting =[], rootName=None):
@@ -25,18 +25,17 @@ def draw_propertyGroup( propertyGroup, layout, nesting =[], rootName=None):
         subrow.separator()
         selection = getattr(propertyGroup, field_names[0])
 
-        for fname in field_names[1:]:
-            if fname == "variant_" + selection:
-                subrow = layout.row()
-                display_name = fname if propertyGroup.tupple_or_struct == "struct" else ""
-
-                nestedPropertyGroup = getattr(propertyGroup, fname)
-                nested = getattr(nestedPropertyGroup, "nested", False)
-                #print("nestedPropertyGroup", nestedPropertyGroup, fname, nested)
-                if nested:
-                    draw_propertyGroup(nestedPropertyGroup, subrow.column(), nesting + [fname], rootName )
-                # if an enum variant is not a propertyGroup
-                break
+        # only the selected variant is drawn
+        fname = "variant_" + selection
+        if fname in field_names:
+            subrow = layout.row()
+            display_name = fname if propertyGroup.tupple_or_struct == "struct" else ""
+
+            nestedPropertyGroup = getattr(propertyGroup, fname)
+            nested = getattr(nestedPropertyGroup, "nested", False)
+            #print("nestedPropertyGroup", nestedPropertyGroup, fname, nested)
+            if nested:
+                draw_propertyGroup(nestedPropertyGroup, subrow.column(), nesting + [fname], rootName )
     elif is_list:
         #print("show list", propertyGroup, dict(propertyGroup), propertyGroup.type_name)
         item_list = getattr(propertyGroup, "list")
@@ -123,6 +122,14 @@ class BEVY_COMPONENTS_PT_ComponentsPanel(bpy.types.Panel):
         registry_has_type_infos = registry.has_type_infos()
 
         if object is not None:
+            metadata_progress = context.window_manager.components_metadata_progress
+            if metadata_progress != -1.0:
+                row = layout.row()
+                if hasattr(layout,"progress") : # only for Blender > 4.0
+                    row.progress(factor = metadata_progress, text=f"checking components of all objects {metadata_progress * 100.0:.2f}%")
+                else:
+                    row.label(text=f"checking components of all objects {metadata_progress * 100.0:.2f}%")
+
             row = layout.row(align=True)
             row.prop(available_components, "list", text="Component")
             row.prop(available_components, "filter",text="Filter")
@@ -150,12 +157,11 @@ class BEVY_COMPONENTS_PT_ComponentsPanel(bpy.types.Panel):
                 layout.separator()
 
 
-            components_in_object = object.components_meta.components
             for component_name in sorted(dict(object)) : # sorted by component name, practical
                 if component_name == "components_meta": 
                     continue
                 # anything withouth metadata gets skipped, we only want to see real components, not all custom props
-                component_meta =  next(filter(lambda component: component["name"] == component_name, components_in_object), None)
+                component_meta = find_component_metadata(object, component_name)
                 if component_meta == None: 
                     continue
 
@@ -190,6 +196,10 @@ class BEVY_COMPONENTS_PT_ComponentsPanel(bpy.types.Panel):
                             draw_propertyGroup(propertyGroup, prop_group_location, [root_propertyGroup_name], component_name)
                         else :
                             row.label(text="details hidden, click on toggle to display")
+                    elif not component_invalid and registry.short_names_to_long_names.get(component_name, None) not in registry.propertyGroup_classes:
+                        # the propertyGroups of this component have not been generated yet
+                        request_upsert_component_in_object(object, component_name)
+                        row.label(text="generating component UI...")
                     else:
                         error_message = invalid_details if component_invalid else "Missing component UI data, please reload registry !"
                         row.label(text=error_message)
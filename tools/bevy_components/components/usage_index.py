@@ -0,0 +1,81 @@
+import bpy
+
+# which objects use which components, kept up to date rather than scanning all the objects (& all their custom properties)
+# on every redraw of the ui or bulk operation
+# the objects changed by the add-on (see metadata.py) or the user (depsgraph updates) are marked, & only scanned again on the next query
+# everything gets rebuilt after undo/load, or when objects were added/removed
+class ComponentUsageIndex():
+    def __init__(self):
+        self.objects_per_component = {} # custom property name => set of object names
+        self.components_per_object = {} # object name => custom property names
+        self.invalid_per_object = {} # object name => {component name: "Invalid" (flagged in its metadata) or "Unregistered" (no metadata)}
+        self.dirty_objects = set()
+        self.objects_count = -1 # amount of objects at the last update, -1 when everything needs to be rebuilt
+
+    def invalidate(self):
+        self.objects_count = -1
+
+    def mark_object(self, object):
+        self.dirty_objects.add(object.name)
+
+    def update(self):
+        objects = bpy.data.objects
+        if self.objects_count != len(objects):
+            self.objects_per_component.clear()
+            self.components_per_object.clear()
+            self.invalid_per_object.clear()
+            self.dirty_objects.clear()
+            for object in objects:
+                self.scan_object(object)
+            self.objects_count = len(objects)
+        elif len(self.dirty_objects) > 0:
+            for object_name in self.dirty_objects:
+                self.forget_object(object_name)
+                object = objects.get(object_name, None)
+                if object is not None:
+                    self.scan_object(object)
+            self.dirty_objects.clear()
+
+    def forget_object(self, object_name):
+        for component_name in self.components_per_object.pop(object_name, ()):
+            object_names = self.objects_per_component.get(component_name, None)
+            if object_names is not None:
+                object_names.discard(object_name)
+                if len(object_names) == 0:
+                    del self.objects_per_component[component_name]
+        self.invalid_per_object.pop(object_name, None)
+
+    def scan_object(self, object):
+        component_names = [key for key in object.keys() if key != "components_meta"]
+        if len(component_names) == 0:
+            return
+        object_name = object.name
+        self.components_per_object[object_name] = component_names
+        for component_name in component_names:
+            self.objects_per_component.setdefault(component_name, set()).add(object_name)
+
+        if "components_meta" in object:
+            invalid = {}
+            registered = set()
+            for component_meta in object.components_meta.components:
+                registered.add(component_meta.name)
+                if component_meta.invalid:
+                    invalid[component_meta.name] = "Invalid"
+            for component_name in component_names:
+                if component_name not in registered:
+                    invalid[component_name] = "Unregistered"
+            if len(invalid) > 0:
+                self.invalid_per_object[object_name] = invalid
+
+    # the names of the objects with the given component (custom property), sorted
+    # renamed objects are only found under their new name once their update came through: the old names are skipped
+    def get_objects_with_component(self, component_name):
+        self.update()
+        objects = bpy.data.objects
+        return sorted(object_name for object_name in self.objects_per_component.get(component_name, ()) if object_name in objects)
+
+    # [(object name, component name, status)] of the components that are invalid or unregistered, sorted by object name
+    def get_invalid_components(self):
+        self.update()
+        objects = bpy.data.objects
+        return [(object_name, component_name, status) for object_name in sorted(self.invalid_per_object) if object_name in objects for (component_name, status) in self.invalid_per_object[object_name].items()]
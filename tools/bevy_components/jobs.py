@@ -0,0 +1,130 @@
+import time
+import bpy
+
+# a bulk operation (ie over all objects), split into items that are processed a few at a time rather than in one blocking go
+# - items: the things to process (objects, (component name, objects) batches...)
+# - process_item(item): does the work for a single item, returns the list of errors (strings) it ran into, if any
+#   the exceptions it raises are reported as errors too, the job goes on with the next item
+class ComponentsJob():
+    def __init__(self, items, process_item):
+        self.items = list(items)
+        self.process_item = process_item
+        self.position = 0
+        self.errors = []
+        self.cancelled = False
+
+    def is_done(self):
+        return self.cancelled or self.position >= len(self.items)
+
+    def progress(self):
+        return self.position / len(self.items) if len(self.items) > 0 else 1.0
+
+    # processes items until the time budget (s) is used up (at least one item), returns whether the job is done
+    def run_chunk(self, time_budget):
+        end_time = time.perf_counter() + time_budget
+        while not self.is_done():
+            item = self.items[self.position]
+            self.position += 1
+            try:
+                errors = self.process_item(item)
+            except Exception as error:
+                errors = [str(error)]
+            if errors:
+                self.errors.extend(errors)
+            if time.perf_counter() >= end_time:
+                break
+        return self.is_done()
+
+    def run_all(self):
+        while not self.is_done():
+            self.run_chunk(float("inf"))
+
+    def cancel(self):
+        self.cancelled = True
+
+    # the errors as a list, shortened if there are too many to report
+    def format_errors(self, max_errors=10):
+        summary = str(self.errors[:max_errors])
+        if len(self.errors) > max_errors:
+            summary += " (and {} more)".format(len(self.errors) - max_errors)
+        return summary
+
+# base class of the operators running a ComponentsJob:
+# - from the ui (invoke), as a modal operator: a chunk of work on each timer tick, with the progress redrawn at a fixed rate & escape to cancel
+# - from scripts (execute), all at once
+# subclasses implement create_job(context) (returns the job, or None if the operator cannot run) & finish(context, job)
+# progress_property: the window manager property holding the progress of the job (-1 when not running), for the ui
+class ComponentsJobOperator():
+    progress_property = None
+    chunk_duration = 0.05 # (s) of work per timer tick, the ui stays responsive in between
+    redraw_interval = 0.1 # (s) between redraws of the progress
+
+    def execute(self, context):
+        job = self.create_job(context)
+        if job is None:
+            return {'CANCELLED'}
+        try:
+            job.run_all()
+        except:
+            job.cancel()
+            raise
+        finally:
+            result = self.finish_job(context, job)
+        return result
+
+    def invoke(self, context, event):
+        if bpy.app.background or context.window is None:
+            return self.execute(context)
+        self.job = self.create_job(context)
+        if self.job is None:
+            return {'CANCELLED'}
+        self.last_redraw_time = 0.0
+        self.set_progress(context, 0.0)
+        self.timer = context.window_manager.event_timer_add(0.001, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.job.cancel()
+        elif event.type != 'TIMER' or event.timer != self.timer:
+            # the data must not change under our feet while the job runs: the other events are blocked, the ui still gets redrawn
+            return {'RUNNING_MODAL'}
+
+        # whatever goes wrong, the timer gets removed & the job finished (ie the settings it changed restored)
+        try:
+            if not self.job.is_done():
+                self.job.run_chunk(self.chunk_duration)
+            if not self.job.is_done():
+                now = time.perf_counter()
+                if now - self.last_redraw_time >= self.redraw_interval:
+                    self.last_redraw_time = now
+                    self.set_progress(context, self.job.progress())
+                    for area in context.screen.areas:
+                        area.tag_redraw()
+                return {'RUNNING_MODAL'}
+        except:
+            self.job.cancel()
+            raise
+        finally:
+            if self.job.is_done():
+                context.window_manager.event_timer_remove(self.timer)
+                for area in context.screen.areas:
+                    area.tag_redraw()
+                result = self.finish_job(context, self.job)
+        return result
+
+    def set_progress(self, context, progress):
+        if self.progress_property is not None:
+            setattr(context.window_manager, self.progress_property, progress)
+
+    # the work done until a cancellation is kept (& can be undone as a whole)
+    def finish_job(self, context, job):
+        self.set_progress(context, -1.0)
+        self.finish(context, job)
+        if job.cancelled:
+            self.report({'WARNING'}, "Cancelled after {} / {} steps".format(job.position, len(job.items)))
+        return {'FINISHED'}
+
+    def finish(self, context, job):
+        pass
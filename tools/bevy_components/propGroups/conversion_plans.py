@@ -0,0 +1,114 @@
+from bpy_types import PropertyGroup
+from .conversions_from_prop_group import conversion_tables
+from .conversions_to_prop_group import type_mappings
+from .ron import ron_to_string, unwrap_ron_value
+from ..registry.type_refs import MISSING_TYPE
+
+# what a conversion plan does with its propertyGroup/value, see ConversionPlan
+VALUE = "value" # value types: a single blender property
+STRUCT = "struct"
+TUPLE = "tuple" # tuples & tuple structs
+ENUM = "enum"
+LIST = "list"
+OPAQUE = "opaque" # types without any ui (typeInfo "Value" etc)
+
+# everything the conversions (to & from custom properties) need to know about a type, resolved once instead of on every conversion:
+# - fields: [(field name, plan of the field type or None if the type is missing, whether the field is a plain blender property)], in field order
+# - to_ron/from_ron: the converters of value types
+# - selector & variants: for enums, the name of the field holding the selected variant
+#   & for enums with data, the table of the variants: variant name => (index in oneOf, variant definition, field name, plan of the variant content or None)
+# - item_plan: for lists, the plan of the items, item_is_wrapper: if the items are "fake" tuples around value types (see generate_wrapper_propertyGroup)
+class ConversionPlan():
+    __slots__ = ("type_name", "kind", "to_ron", "from_ron", "fields", "selector", "variants", "item_plan", "item_is_wrapper")
+
+    def __init__(self, type_name, kind):
+        self.type_name = type_name
+        self.kind = kind
+        self.to_ron = None
+        self.from_ron = None
+        self.fields = []
+        self.selector = None
+        self.variants = None
+        self.item_plan = None
+        self.item_is_wrapper = False
+
+# raw blender values (ints, floats, uuid strings that are already RON) as RON text
+def raw_value_to_ron(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "[" + ", ".join(str(item) for item in value) + "]"
+
+def opaque_value_to_ron(value):
+    if isinstance(value, PropertyGroup):
+        return '""'
+    if value is None:
+        return "None"
+    return raw_value_to_ron(value)
+
+def value_parser(type_name):
+    mapping = type_mappings[type_name] if type_name in type_mappings else ron_to_string
+    return lambda value: mapping(unwrap_ron_value(value)) # (5) => 5
+
+# returns the conversion plan of the given type definition, compiling it (& the plans of the types it uses) if needed
+# plans: long name => plan, the plans of the named types (ie not enum variants) are added to it, so recursive types end up pointing to themselves
+def compile_conversion_plan(registry, definition, plans):
+    type_name = definition["title"]
+    is_named_type = registry.type_infos.get(type_name, None) is definition
+    if is_named_type and type_name in plans:
+        return plans[type_name]
+
+    type_info = definition["typeInfo"] if "typeInfo" in definition else None
+    if type_name in registry.value_types_defaults:
+        plan = ConversionPlan(type_name, VALUE)
+        plan.to_ron = conversion_tables[type_name] if type_name in conversion_tables else raw_value_to_ron
+        plan.from_ron = value_parser(type_name)
+    elif type_info == "Struct":
+        plan = ConversionPlan(type_name, STRUCT)
+    elif type_info == "Tuple" or type_info == "TupleStruct":
+        plan = ConversionPlan(type_name, TUPLE)
+    elif type_info == "Enum":
+        plan = ConversionPlan(type_name, ENUM)
+        plan.selector = definition["short_name"]
+    elif type_info == "List":
+        plan = ConversionPlan(type_name, LIST)
+    else:
+        plan = ConversionPlan(type_name, OPAQUE)
+        plan.to_ron = opaque_value_to_ron
+    # registered before compiling the fields, for recursive types
+    if is_named_type:
+        plans[type_name] = plan
+
+    if plan.kind == STRUCT:
+        properties = definition["properties"] if "properties" in definition else {}
+        plan.fields = [compile_field_plan(registry, field_name, properties[field_name], plans) for field_name in properties]
+    elif plan.kind == TUPLE:
+        prefix_items = definition["prefixItems"] if "prefixItems" in definition else []
+        plan.fields = [compile_field_plan(registry, str(index), item, plans) for (index, item) in enumerate(prefix_items)]
+    elif plan.kind == ENUM and definition.get("type", None) == "object":
+        plan.variants = {}
+        for (index, variant_definition) in enumerate(definition["oneOf"]):
+            variant_name = variant_definition["title"]
+            # variants without content are just the name of the variant
+            has_content = "prefixItems" in variant_definition or "properties" in variant_definition
+            variant_plan = compile_conversion_plan(registry, variant_definition, plans) if has_content else None
+            plan.variants[variant_name] = (index, variant_definition, "variant_" + variant_name, variant_plan)
+    elif plan.kind == LIST:
+        item_definition = definition["items"]["type"].definition
+        # the list items of value types are wrapped, see process_list
+        plan.item_is_wrapper = item_definition is not MISSING_TYPE and item_definition["title"] in registry.value_types_defaults
+        if plan.item_is_wrapper:
+            item_definition = registry.type_infos.get("wrapper_" + definition["short_name"], MISSING_TYPE)
+        if item_definition is not MISSING_TYPE:
+            plan.item_plan = compile_conversion_plan(registry, item_definition, plans)
+    return plan
+
+def compile_field_plan(registry, field_name, field_definition, plans):
+    item_definition = field_definition["type"].definition
+    if item_definition is MISSING_TYPE:
+        return (field_name, None, True)
+    field_plan = compile_conversion_plan(registry, item_definition, plans)
+    return (field_name, field_plan, field_plan.kind == VALUE)
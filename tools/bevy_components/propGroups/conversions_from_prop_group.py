@@ -1,151 +1,93 @@
-from bpy_types import PropertyGroup
+from .ron import quote_ron_string
 
 conversion_tables = {
-    "bool": lambda value: value,
+    "bool": lambda value: "true" if value else "false",
 
-    "char": lambda value: '"'+value+'"',
-    "str": lambda value: '"'+value+'"',
-    "alloc::string::String": lambda value: '"'+value+'"',
-    "alloc::borrow::Cow<str>": lambda value: '"'+value+'"',
+    "char": lambda value: quote_ron_string(value),
+    "str": lambda value: quote_ron_string(value),
+    "alloc::string::String": lambda value: quote_ron_string(value),
+    "alloc::borrow::Cow<str>": lambda value: quote_ron_string(value),
 
-    "glam::Vec2": lambda value: "Vec2(x:"+str(value[0])+ ", y:"+str(value[1])+")",
-    "glam::DVec2": lambda value: "DVec2(x:"+str(value[0])+ ", y:"+str(value[1])+")",
-    "glam::UVec2": lambda value: "UVec2(x:"+str(value[0])+ ", y:"+str(value[1])+")",
+    # vectors are read in one go (value[:]) rather than one component at a time, each access of a blender array being a full property lookup
+    "glam::Vec2": lambda value: "Vec2(x:{}, y:{})".format(*value[:]),
+    "glam::DVec2": lambda value: "DVec2(x:{}, y:{})".format(*value[:]),
+    "glam::UVec2": lambda value: "UVec2(x:{}, y:{})".format(*value[:]),
 
-    "glam::Vec3": lambda value: "Vec3(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+")",
-    "glam::Vec3A": lambda value: "Vec3A(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+")",
-    "glam::UVec3": lambda value: "UVec3(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+")",
+    "glam::Vec3": lambda value: "Vec3(x:{}, y:{}, z:{})".format(*value[:]),
+    "glam::Vec3A": lambda value: "Vec3A(x:{}, y:{}, z:{})".format(*value[:]),
+    "glam::UVec3": lambda value: "UVec3(x:{}, y:{}, z:{})".format(*value[:]),
 
-    "glam::Vec4": lambda value: "Vec4(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+ ", w:"+str(value[3])+")",
-    "glam::DVec4": lambda value: "DVec4(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+ ", w:"+str(value[3])+")",
-    "glam::UVec4": lambda value: "UVec4(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+ ", w:"+str(value[3])+")",
+    "glam::Vec4": lambda value: "Vec4(x:{}, y:{}, z:{}, w:{})".format(*value[:]),
+    "glam::DVec4": lambda value: "DVec4(x:{}, y:{}, z:{}, w:{})".format(*value[:]),
+    "glam::UVec4": lambda value: "UVec4(x:{}, y:{}, z:{}, w:{})".format(*value[:]),
 
-    "glam::Quat":  lambda value: "Quat(x:"+str(value[0])+ ", y:"+str(value[1])+ ", z:"+str(value[2])+ ", w:"+str(value[3])+")",
+    "glam::Quat":  lambda value: "Quat(x:{}, y:{}, z:{}, w:{})".format(*value[:]),
 
-    "bevy_render::color::Color": lambda value: "Rgba(red:"+str(value[0])+ ", green:"+str(value[1])+ ", blue:"+str(value[2])+ ", alpha:"+str(value[3])+   ")",
+    "bevy_render::color::Color": lambda value: "Rgba(red:{}, green:{}, blue:{}, alpha:{})".format(*value[:]),
 }
 
 #converts the value of a property group(no matter its complexity) into a single custom property value
 # this is more or less a glorified "to_ron()" method (not quite but close to)
+# this runs on every property change, so the RON text is written as we walk the property group, into a single buffer that is only joined at the end
+# what to write for each type is precompiled by the registry, see conversion_plans.ConversionPlan
 def property_group_value_to_custom_property_value(property_group, definition, registry, parent=None, value=None):
-    component_name = definition["short_name"]
-    type_info = definition["typeInfo"] if "typeInfo" in definition else None
-    type_def = definition["type"] if "type" in definition else None
-    type_name = definition["title"]
-    is_value_type = type_name in conversion_tables
-    #print("computing custom property", component_name, type_info, type_def, type_name)
-
-    if is_value_type:
-        value = conversion_tables[type_name](value)
-    elif type_info == "Struct":
-        values = {}
-        if len(property_group.field_names) ==0:
-            value = '()'
-        else:
-            for index, field_name in enumerate(property_group.field_names):
-                item_type_name = definition["properties"][field_name]["type"]["$ref"].replace("#/$defs/", "")
-                item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-
-                value = getattr(property_group, field_name)
-                is_property_group = isinstance(value, PropertyGroup)
-                child_property_group = value if is_property_group else None
-                if item_definition != None:
-                    value = property_group_value_to_custom_property_value(child_property_group, item_definition, registry, parent=component_name, value=value)
-                else:
-                    value = '""'
-                values[field_name] = value
-            value = values        
-    elif type_info == "Tuple": 
-        values = {}
-        for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["prefixItems"][index]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-
-            value = getattr(property_group, field_name)
-            is_property_group = isinstance(value, PropertyGroup)
-            child_property_group = value if is_property_group else None
-            if item_definition != None:
-                value = property_group_value_to_custom_property_value(child_property_group, item_definition, registry, parent=component_name, value=value)
-            else:
-                value = '""'
-            values[field_name] = value
-        value = tuple(e for e in list(values.values()))
-
-    elif type_info == "TupleStruct":
-        values = {}
-        for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["prefixItems"][index]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-
-            value = getattr(property_group, field_name)
-            is_property_group = isinstance(value, PropertyGroup)
-            child_property_group = value if is_property_group else None
-            if item_definition != None:
-                value = property_group_value_to_custom_property_value(child_property_group, item_definition, registry, parent=component_name, value=value)
-            else:
-                value = '""'
-            values[field_name] = value
-        
-        value = tuple(e for e in list(values.values()))
-    elif type_info == "Enum":
-        selected = getattr(property_group, component_name)
-
-        if type_def == "object":
-            selection_index = property_group.field_names.index("variant_"+selected)
-            variant_name = property_group.field_names[selection_index]
-            variant_definition = definition["oneOf"][selection_index-1]
-            if "prefixItems" in variant_definition:
-                value = getattr(property_group, variant_name)
-                is_property_group = isinstance(value, PropertyGroup)
-                child_property_group = value if is_property_group else None
-
-                value = property_group_value_to_custom_property_value(child_property_group, variant_definition, registry, parent=component_name, value=value)
-                value = selected + str(value,) #"{}{},".format(selected ,value)
-            elif "properties" in variant_definition:
-                value = getattr(property_group, variant_name)
-                is_property_group = isinstance(value, PropertyGroup)
-                child_property_group = value if is_property_group else None
-
-                value = property_group_value_to_custom_property_value(child_property_group, variant_definition, registry, parent=component_name, value=value)
-                value = selected + str(value,)
+    buffer = []
+    write_property_group_value(buffer, property_group, registry.get_conversion_plan(definition), value)
+    return "".join(buffer)
+
+# appends the RON text of the given property group (or plain value for value types) to the buffer
+def write_property_group_value(buffer, property_group, plan, value=None):
+    kind = plan.kind
+    if kind == "value":
+        buffer.append(plan.to_ron(value))
+    elif kind == "struct":
+        buffer.append("(")
+        for (index, (field_name, field_plan, is_value)) in enumerate(plan.fields):
+            if index > 0:
+                buffer.append(", ")
+            buffer.append(field_name)
+            buffer.append(": ")
+            write_field_value(buffer, property_group, field_name, field_plan, is_value)
+        buffer.append(")")
+    elif kind == "tuple":
+        buffer.append("(")
+        write_tuple_fields(buffer, property_group, plan)
+        buffer.append(")")
+    elif kind == "enum":
+        selected = getattr(property_group, plan.selector)
+        buffer.append(selected)
+        if plan.variants is not None:
+            (_, _, variant_field_name, variant_plan) = plan.variants[selected]
+            if variant_plan is not None:
+                write_property_group_value(buffer, getattr(property_group, variant_field_name), variant_plan)
+    elif kind == "list":
+        item_plan = plan.item_plan
+        buffer.append("[")
+        for index, item in enumerate(getattr(property_group, "list")):
+            if index > 0:
+                buffer.append(", ")
+            if item_plan is None:
+                buffer.append('""')
+            elif plan.item_is_wrapper: #if we have a "fake" tupple for aka for value types, we need to remove one nested level
+                write_tuple_fields(buffer, item, item_plan)
             else:
-                value = getattr(property_group, variant_name)
-                is_property_group = isinstance(value, PropertyGroup)
-                child_property_group = value if is_property_group else None
-                if child_property_group:
-                    value = property_group_value_to_custom_property_value(child_property_group, variant_definition, registry, parent=component_name, value=value)
-                    value = selected + str(value,)
-                else:
-                    value = selected # here the value of the enum is just the name of the variant
-        else: 
-            value = selected
-
-    elif type_info == "List":
-        item_list = getattr(property_group, "list")
-        #item_type = getattr(property_group, "type_name_short")
-        value = []
-        for item in item_list:
-            item_type_name = getattr(item, "type_name")
-            definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-            if definition != None:
-                item_value = property_group_value_to_custom_property_value(item, definition, registry, component_name, None)
-                if item_type_name.startswith("wrapper_"): #if we have a "fake" tupple for aka for value types, we need to remove one nested level
-                    item_value = item_value[0]
-            else:
-                item_value = '""'
-            value.append(item_value) 
+                write_property_group_value(buffer, item, item_plan)
+        buffer.append("]")
+    else: # "opaque"
+        buffer.append(plan.to_ron(value))
+
+# appends "a, b" for the fields of a tuple (struct), without the enclosing parenthesis
+def write_tuple_fields(buffer, property_group, plan):
+    for (index, (field_name, field_plan, is_value)) in enumerate(plan.fields):
+        if index > 0:
+            buffer.append(", ")
+        write_field_value(buffer, property_group, field_name, field_plan, is_value)
+
+def write_field_value(buffer, property_group, field_name, field_plan, is_value):
+    if field_plan is None:
+        buffer.append('""')
+    elif is_value:
+        buffer.append(field_plan.to_ron(getattr(property_group, field_name)))
     else:
-        value = conversion_tables[type_name](value) if is_value_type else value
-        value = '""' if isinstance(value, PropertyGroup) else value
-        
-    #print("generating custom property value", value, type(value))
-    if isinstance(value, str):
-        value = value.replace("'", "")
-
-    if parent == None:
-        value = str(value).replace("'",  "")
-        value = value.replace(",)",")")
-        value = value.replace("{", "(").replace("}", ")")
-        value = value.replace("True", "true").replace("False", "false")
-    return value
-
+        value = getattr(property_group, field_name)
+        write_property_group_value(buffer, value, field_plan, value)
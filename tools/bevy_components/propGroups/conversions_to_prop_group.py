@@ -1,130 +1,24 @@
-from bpy_types import PropertyGroup
-import re
+from .ron import RonStruct, RonTuple, RonList, ron_to_string, unwrap_ron_value
 
-def parse_struct_string(string, start_nesting=0):
-    #print("processing struct string", string, "start_nesting", start_nesting)
-    fields = {}
-    buff = []
-    current_fieldName = None
-    nesting_level = 0 
+def parse_vec2(value, caster):
+    return [caster(value['x']), caster(value['y'])]
 
-    start_offset = 0
-    end_offset = 0
+def parse_vec3(value, caster):
+    return [caster(value['x']), caster(value['y']), caster(value['z'])]
 
-    for index, char in enumerate(string):
-        buff.append(char)
-        if char == "," and nesting_level == start_nesting:
-            #print("first case", end_offset)
-            end_offset = index
-            end_offset = len(string) if end_offset == 0 else end_offset
+def parse_vec4(value, caster):
+    return [caster(value['x']), caster(value['y']), caster(value['z']), caster(value['w'])]
 
-            val = "".join(string[start_offset:end_offset])
-            fields[current_fieldName] = val.strip()
-            start_offset = index + 1
-            #print("done with field name", current_fieldName, "value", fields[current_fieldName])
+def parse_color(value, caster):
+    return [caster(value['red']), caster(value['green']), caster(value['blue']), caster(value['alpha'])]
 
-        if char == "[" or char == "(":
-            nesting_level  += 1
-            if nesting_level == start_nesting:
-                start_offset = index + 1 
-                #print("nesting & setting start offset", start_offset)
-            #print("nesting down", nesting_level)
-
-        if char == "]" or char == ")" :
-            #print("nesting up", nesting_level)
-            if nesting_level == start_nesting:
-                end_offset = index
-                #print("unesting & setting end offset", end_offset)
-            nesting_level  -= 1
-
-
-        if char == ":" and nesting_level == start_nesting:
-            end_offset = index
-            fieldName = "".join(string[start_offset:end_offset])
-            current_fieldName = fieldName.strip()
-            start_offset = index + 1
-            end_offset = 0 #hack
-            #print("starting field name", fieldName, "index", index)
-            buff = []
-            
-    end_offset = len(string) if end_offset == 0 else end_offset
-    #print("final start and end offset", start_offset, end_offset, "total length", len(string))
-
-    val = "".join(string[start_offset:end_offset])
-
-    fields[current_fieldName] = val.strip()
-    #print("done with all fields", fields)
-    return fields
-
-def parse_tuplestruct_string(string, start_nesting=0):
-    #print("processing tuppleStruct", string, "start_nesting", start_nesting)
-    fields = []
-    buff = []
-    nesting_level = 0 
-    field_index = 0
-
-    start_offset = 0
-    end_offset = 0
-    # todo: strip all stuff before start_nesting
-
-    for index, char in enumerate(string):
-        buff.append(char)
-        if char == "," and nesting_level == start_nesting:
-            end_offset = index
-            end_offset = len(string) if end_offset == 0 else end_offset
-
-            val = "".join(string[start_offset:end_offset])
-            fields.append(val.strip())
-            field_index += 1
-            #print("start and end offset", start_offset, end_offset, "total length", len(string))
-            #print("done with field name", field_index, "value", fields)
-            start_offset = index + 1
-            end_offset = 0 # hack
-
-        if char == "[" or char == "(":
-            nesting_level  += 1
-            if nesting_level == start_nesting:
-                start_offset = index + 1 
-                #print("nesting & setting start offset", start_offset)
-            #print("nesting down", nesting_level)
-
-        if char == "]" or char == ")" :
-            if nesting_level == start_nesting:
-                end_offset = index
-                #print("unesting & setting end offset", end_offset)
-            #print("nesting up", nesting_level)
-            nesting_level  -= 1
-
-
-    end_offset = len(string) if end_offset == 0 else end_offset
-    #print("final start and end offset", start_offset, end_offset, "total length", len(string))
-
-    val = "".join(string[start_offset:end_offset]) #if end_offset != 0 else buff)
-    fields.append(val.strip())
-    fields = list(filter(lambda entry: entry != '', fields))
-    #print("done with all fields", fields)
-    return fields
-
-
-def parse_vec2(value, caster, typeName):
-    parsed = parse_struct_string(value.replace(typeName,"").replace("(", "").replace(")","") )
-    return [caster(parsed['x']), caster(parsed['y'])]
-
-def parse_vec3(value, caster, typeName):
-    parsed = parse_struct_string(value.replace(typeName,"").replace("(", "").replace(")","") )
-    return [caster(parsed['x']), caster(parsed['y']), caster(parsed['z'])]
-
-def parse_vec4(value, caster, typeName):
-    parsed = parse_struct_string(value.replace(typeName,"").replace("(", "").replace(")","") )
-    return [caster(parsed['x']), caster(parsed['y']), caster(parsed['z']), caster(parsed['w'])]
-
-def parse_color(value, caster, typeName):
-    parsed = parse_struct_string(value.replace(typeName,"").replace("(", "").replace(")","") )
-    return [caster(parsed['red']), caster(parsed['green']), caster(parsed['blue']), caster(parsed['alpha'])]
+def parse_string(value):
+    return str(value) if isinstance(value, str) else ron_to_string(value)
 
 def to_int(input):
     return int(float(input))
 
+# value type => conversion from a parsed RON value (see ron.parse_ron) to the value of the matching blender property
 type_mappings = {
     "bool": lambda value: True if value == "true" else False,
 
@@ -146,178 +40,96 @@ type_mappings = {
     'f32': lambda value: float(value),
     'f64': lambda value: float(value),
 
-    "glam::Vec2": lambda value: parse_vec2(value, float, "Vec2"),
-    "glam::DVec2": lambda value: parse_vec2(value, float, "DVec2"),
-    "glam::UVec2": lambda value: parse_vec2(value, to_int, "UVec2"),
+    "glam::Vec2": lambda value: parse_vec2(value, float),
+    "glam::DVec2": lambda value: parse_vec2(value, float),
+    "glam::UVec2": lambda value: parse_vec2(value, to_int),
 
-    'glam::Vec3': lambda value: parse_vec3(value, float, "Vec3"),
-    "glam::Vec3A": lambda value: parse_vec3(value, float, "Vec3A"),
-    "glam::UVec3": lambda value: parse_vec3(value, to_int, "UVec3"),
+    'glam::Vec3': lambda value: parse_vec3(value, float),
+    "glam::Vec3A": lambda value: parse_vec3(value, float),
+    "glam::UVec3": lambda value: parse_vec3(value, to_int),
 
-    "glam::Vec4": lambda value: parse_vec4(value, float, "Vec4"),
-    "glam::DVec4": lambda value: parse_vec4(value, float, "DVec4"),
-    "glam::UVec4": lambda value: parse_vec4(value, to_int, "UVec4"),
+    "glam::Vec4": lambda value: parse_vec4(value, float),
+    "glam::DVec4": lambda value: parse_vec4(value, float),
+    "glam::UVec4": lambda value: parse_vec4(value, to_int),
 
-    "glam::Quat": lambda value: parse_vec4(value, float, "Quat"),
+    "glam::Quat": lambda value: parse_vec4(value, float),
 
-    'alloc::string::String': lambda value: str(value.replace('"', "")),
-    'alloc::borrow::Cow<str>': lambda value: str(value.replace('"', "")),
+    'alloc::string::String': parse_string,
+    'alloc::borrow::Cow<str>': parse_string,
 
-    'bevy_render::color::Color': lambda value: parse_color(value, float, "Rgba"),
+    'bevy_render::color::Color': lambda value: parse_color(value, float),
     'bevy_ecs::entity::Entity': lambda value: int(value),
 }
 
-def is_def_value_type(definition, registry):
-    if definition == None:
-        return True
-    value_types_defaults = registry.value_types_defaults
-    type_name = definition["title"]
-    is_value_type = type_name in value_types_defaults
-    return is_value_type
-
 #converts the value of a single custom property into a value (values) of a property group 
+# the custom property value is only parsed once (& identical values only once per registry load, see ParsedValuesCache)
+# the propertyGroups are then filled in from the parsed values, see property_group_value_from_ron_value
+# what to do for each type is precompiled by the registry, see conversion_plans.ConversionPlan
 def property_group_value_from_custom_property_value(property_group, definition, registry, value, nesting = []):
-    value_types_defaults = registry.value_types_defaults
-
-    type_info = definition["typeInfo"] if "typeInfo" in definition else None
-    type_def = definition["type"] if "type" in definition else None
-    properties = definition["properties"] if "properties" in definition else {}
-    prefixItems = definition["prefixItems"] if "prefixItems" in definition else []
-    has_properties = len(properties.keys()) > 0
-    has_prefixItems = len(prefixItems) > 0
-    is_enum = type_info == "Enum"
-    is_list = type_info == "List"
-    type_name = definition["title"]
-
-    #is_value_type = type_def in value_types_defaults or type_name in value_types_defaults
-    is_value_type = type_name in value_types_defaults
-    nesting = nesting + [definition["short_name"]]
-
-    """print(" ")
-    print("raw value", value, "nesting", nesting)
-    print("nesting", len(nesting))
-    print("definition", definition)"""
-
-    if is_value_type:
-        value = value.replace("(", "").replace(")", "")# FIXME: temporary, incoherent use of nesting levels between parse_tuplestruct_string & parse_struct_string
-        value = type_mappings[type_name](value) if type_name in type_mappings else value
-        return value
-    elif type_info == "Struct":
-        if len(property_group.field_names) != 0 :
-            custom_property_values = parse_struct_string(value, start_nesting=1 if value.startswith("(") else 0)
-            for index, field_name in enumerate(property_group.field_names):
-                item_type_name = definition["properties"][field_name]["type"]["$ref"].replace("#/$defs/", "")
-                item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-
-                custom_prop_value = custom_property_values[field_name]
-                #print("field name", field_name, "value", custom_prop_value)
-                propGroup_value = getattr(property_group, field_name)
-                is_property_group = isinstance(propGroup_value, PropertyGroup)
-                child_property_group = propGroup_value if is_property_group else None
-                if item_definition != None:
-                    custom_prop_value = property_group_value_from_custom_property_value(child_property_group, item_definition, registry, value=custom_prop_value, nesting=nesting)
-                else:
-                    custom_prop_value = custom_prop_value
-
-                if is_def_value_type(item_definition, registry):
-                    setattr(property_group , field_name, custom_prop_value)
-               
-
+    parsed_value = registry.parsed_values_cache.parse(definition["title"], value)
+    return property_group_value_from_ron_value(property_group, registry.get_conversion_plan(definition), parsed_value)
+
+def property_group_value_from_ron_value(property_group, plan, value):
+    kind = plan.kind
+    if kind == "value":
+        return plan.from_ron(value)
+    elif kind == "struct":
+        if len(plan.fields) != 0 :
+            custom_property_values = value if isinstance(value, RonStruct) else {}
+            for (field_name, field_plan, is_value) in plan.fields:
+                set_field_value(property_group, field_name, field_plan, is_value, custom_property_values[field_name])
         else:
-            if len(value) > 2: #a unit struct should be two chars long :()
-                #print("struct with zero fields")
+            if not isinstance(value, (RonTuple, RonStruct)) or len(value) != 0: #a unit struct should be empty :()
                 raise Exception("input string too big for a unit struct")
 
-    elif type_info == "Tuple": 
-        custom_property_values = parse_tuplestruct_string(value, start_nesting=1 if len(nesting) == 1 else 1)
-
-        for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["prefixItems"][index]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-            
-            custom_property_value = custom_property_values[index]
-
-            propGroup_value = getattr(property_group, field_name)
-            is_property_group = isinstance(propGroup_value, PropertyGroup)
-            child_property_group = propGroup_value if is_property_group else None
-            if item_definition != None:
-                custom_property_value = property_group_value_from_custom_property_value(child_property_group, item_definition, registry, value=custom_property_value, nesting=nesting)
-            if is_def_value_type(item_definition, registry):
-                setattr(property_group , field_name, custom_property_value)
-
-    elif type_info == "TupleStruct":
-        custom_property_values = parse_tuplestruct_string(value, start_nesting=1 if len(nesting) == 1 else 0)
-        for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["prefixItems"][index]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-
-            custom_prop_value = custom_property_values[index]
-
-            value = getattr(property_group, field_name)
-            is_property_group = isinstance(value, PropertyGroup)
-            child_property_group = value if is_property_group else None
-            if item_definition != None:
-                custom_prop_value = property_group_value_from_custom_property_value(child_property_group, item_definition, registry, value=custom_prop_value, nesting=nesting)
-
-            if is_def_value_type(item_definition, registry):
-                    setattr(property_group , field_name, custom_prop_value)
-
-    elif type_info == "Enum":
-        field_names = property_group.field_names
-        if type_def == "object":
-            regexp = re.search('(^[^\(]+)(\((.*)\))', value)
-            try:
-                chosen_variant_raw = regexp.group(1)
-                chosen_variant_value = regexp.group(3)
-                chosen_variant_name = "variant_" + chosen_variant_raw 
-            except:
-                chosen_variant_raw = value
-                chosen_variant_value = ""
-                chosen_variant_name = "variant_" + chosen_variant_raw 
-            selection_index = property_group.field_names.index(chosen_variant_name)
-            variant_definition = definition["oneOf"][selection_index-1]
+    elif kind == "tuple":
+        # (a, b) => a, b; but single values (ie list items for wrappers, see generate_wrapper_propertyGroup) are not always wrapped
+        custom_property_values = value if isinstance(value, RonTuple) else [value]
+        for (index, (field_name, field_plan, is_value)) in enumerate(plan.fields):
+            set_field_value(property_group, field_name, field_plan, is_value, custom_property_values[index])
+
+    elif kind == "enum":
+        if plan.variants is not None:
+            value = unwrap_ron_value(value)
+            # Variant(...) or just Variant
+            if isinstance(value, (RonTuple, RonStruct)) and value.name is not None:
+                chosen_variant_raw = value.name
+                chosen_variant_value = value
+            else:
+                chosen_variant_raw = ron_to_string(value)
+                chosen_variant_value = RonTuple()
+            variant = plan.variants.get(chosen_variant_raw, None)
+            if variant is None:
+                raise Exception("unknown variant '{}' for enum {}, expected one of {}".format(chosen_variant_raw, plan.type_name, list(plan.variants.keys())))
+            (_, _, variant_field_name, variant_plan) = variant
             # first we set WHAT variant is selected
-            setattr(property_group, field_names[0], chosen_variant_raw)
+            setattr(property_group, plan.selector, chosen_variant_raw)
 
             # and then we set the value of the variant
-            if "prefixItems" in variant_definition:
-                value = getattr(property_group, chosen_variant_name)
-                is_property_group = isinstance(value, PropertyGroup)
-                child_property_group = value if is_property_group else None
-                
-                chosen_variant_value = "(" +chosen_variant_value +")" # needed to handle nesting correctly
-                value = property_group_value_from_custom_property_value(child_property_group, variant_definition, registry, value=chosen_variant_value, nesting=nesting)
-                
-            elif "properties" in variant_definition:
-                value = getattr(property_group, chosen_variant_name)
-                is_property_group = isinstance(value, PropertyGroup)
-                child_property_group = value if is_property_group else None
-
-                value = property_group_value_from_custom_property_value(child_property_group, variant_definition, registry, value=chosen_variant_value, nesting=nesting)
-                
+            if variant_plan is not None:
+                property_group_value_from_ron_value(getattr(property_group, variant_field_name), variant_plan, chosen_variant_value)
         else:
-            chosen_variant_raw = value
-            setattr(property_group, field_names[0], chosen_variant_raw)
+            chosen_variant_raw = ron_to_string(value)
+            setattr(property_group, plan.selector, chosen_variant_raw)
 
-    elif type_info == "List":
+    elif kind == "list":
         item_list = getattr(property_group, "list")
-        item_type_name = getattr(property_group, "type_name_short")
-        custom_property_values = parse_tuplestruct_string(value, start_nesting=2 if item_type_name.startswith("wrapper_") and value.startswith('(') else 1) # TODO : the additional check here is wrong, there is an issue somewhere in higher level stuff
+        value = unwrap_ron_value(value) # ([a, b]) => [a, b]
+        if not isinstance(value, RonList):
+            raise Exception("expected a list, got " + ron_to_string(value))
         # clear list first
         item_list.clear()
-        #print("custom_property_values", custom_property_values, "value", value, "item_type_name", item_type_name)
 
-        for raw_value in custom_property_values:
+        item_plan = plan.item_plan
+        for item_value in value:
             new_entry = item_list.add()   
-            item_type_name = getattr(new_entry, "type_name") # we get the REAL type name
-            definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
-
-            if definition != None:
-                property_group_value_from_custom_property_value(new_entry, definition, registry, value=raw_value, nesting=nesting)            
+            if item_plan is not None:
+                property_group_value_from_ron_value(new_entry, item_plan, item_value)
+
+def set_field_value(property_group, field_name, field_plan, is_value, value):
+    if field_plan is None:
+        setattr(property_group, field_name, ron_to_string(value))
+    elif is_value:
+        setattr(property_group, field_name, field_plan.from_ron(value))
     else:
-        try:
-            value = value.replace("(", "").replace(")", "")# FIXME: temporary, incoherent use of nesting levels between parse_tuplestruct_string & parse_struct_string
-            value = type_mappings[type_name](value) if type_name in type_mappings else value
-            return value
-        except:
-            pass
\ No newline at end of file
+        property_group_value_from_ron_value(getattr(property_group, field_name), field_plan, value)
@@ -0,0 +1,34 @@
+from collections import OrderedDict
+from .ron import RonTuple, parse_ron
+
+# bounded LRU cache of parsed custom property values, keyed by (type long name, raw custom property value)
+# heavily instanced scenes have lots of objects with the exact same component values: those only get parsed once
+# the parsed values are shared, so they must never be modified (property_group_value_from_ron_value only reads them)
+class ParsedValuesCache():
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.values.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, type_name, string):
+        key = (type_name, string)
+        value = self.values.get(key, None)
+        if value is not None:
+            self.values.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = parse_ron(string) if string.strip() != "" else RonTuple() # an empty custom property is the same as ()
+        self.values[key] = value
+        if len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+        return value
+
+    def format_stats(self):
+        return "parsed values cache: {} entries, {} hits, {} misses".format(len(self.values), self.hits, self.misses)
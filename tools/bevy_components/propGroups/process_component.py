@@ -6,9 +6,24 @@ from . import process_tupples
 from . import process_enum
 from . import process_list
 
-def process_component(registry, definition, update, extras=None, nesting = []):
+# number of generated propertyGroup classes currently registered in blender, to check that reloads do not leak classes
+registered_property_groups_count = 0
+
+# generates the "plan" (plain, cacheable data) for the propertyGroup of the given definition, & of the propertyGroups of its fields
+# there is a single propertyGroup per type (the type_key, the long name by default), shared by all the types using it:
+# the update callbacks find out what component they belong to at runtime (see prop_groups.update_component)
+# owner_name is the long name of the registry type the propertyGroup belongs to (itself, or the enum of a variant)
+def process_component(registry, definition, plan, extras=None, type_key=None, owner_name=None):
     component_name = definition['title']
     short_name = definition["short_name"]
+    type_key = type_key if type_key is not None else component_name
+    owner_name = owner_name if owner_name is not None else component_name
+    # for practicality, we add an entry for a reverse lookup (short => long name, since we already have long_name => short_name with the keys of the raw registry)
+    registry.add_shortName_to_longName(short_name, component_name)
+    if type_key in plan: # already processed (or being processed, for recursive types)
+        return type_key
+    plan[type_key] = None
+
     type_info = definition["typeInfo"] if "typeInfo" in definition else None
     type_def = definition["type"] if "type" in definition else None
     properties = definition["properties"] if "properties" in definition else {}
@@ -31,21 +46,21 @@ def process_component(registry, definition, update, extras=None, nesting = []):
 
 
     if has_properties:
-        __annotations__ = __annotations__ | process_structs.process_structs(registry, definition, properties, update, nesting)
+        __annotations__ = __annotations__ | process_structs.process_structs(registry, definition, properties, plan)
         with_properties = True
         tupple_or_struct = "struct"
 
     if has_prefixItems:
-        __annotations__ = __annotations__ | process_tupples.process_tupples(registry, definition, prefixItems, update, nesting)
+        __annotations__ = __annotations__ | process_tupples.process_tupples(registry, definition, prefixItems, plan)
         with_items = True
         tupple_or_struct = "tupple"
 
     if is_enum:
-        __annotations__ = __annotations__ | process_enum.process_enum(registry, definition, update, nesting)
+        __annotations__ = __annotations__ | process_enum.process_enum(registry, definition, plan)
         with_enum = True
 
     if is_list:
-        __annotations__ = __annotations__ | process_list.process_list(registry, definition, update, nesting)
+        __annotations__ = __annotations__ | process_list.process_list(registry, definition, plan)
         with_list= True
     
     field_names = []
@@ -54,40 +69,73 @@ def process_component(registry, definition, update, extras=None, nesting = []):
  
 
     extras = extras if extras is not None else {
+        "nested": True,
         "type_name": component_name
     }
-    root_component = nesting[0] if len(nesting) > 0 else component_name
     # print("DONE:",short_name,"__annotations__", __annotations__)
     # print("")
     property_group_params = {
          **extras,
-        '__annotations__': __annotations__,
         'tupple_or_struct': tupple_or_struct,
         'field_names': field_names, 
         **dict(with_properties = with_properties, with_items= with_items, with_enum= with_enum, with_list= with_list, short_name= short_name),
-        'root_component': root_component
     }
-    #FIXME: YIKES, but have not found another way: 
-    """ Withouth this ; the following does not work
-    -BasicTest
-    - NestingTestLevel2
-        -BasicTest => the registration & update callback of this one overwrites the first "basicTest"
-    have not found a cleaner workaround so far
-    """
-    property_group_name = registry.generate_propGroup_name(nesting, short_name)
-    (property_group_pointer, property_group_class) = property_group_from_infos(property_group_name, property_group_params)
-    # add our component propertyGroup to the registry
-    registry.register_component_propertyGroup(property_group_name, property_group_pointer)
-    # for practicality, we add an entry for a reverse lookup (short => long name, since we already have long_name => short_name with the keys of the raw registry)
-    registry.add_shortName_to_longName(short_name, component_name)
+    is_component = definition['isComponent'] if "isComponent" in definition else False
+    plan[type_key] = {
+        "name": registry.generate_propGroup_name(type_key, short_name if type_key == component_name else None),
+        "long_name": owner_name,
+        "component_name": short_name if is_component else None,
+        "params": property_group_params,
+        "annotations": __annotations__,
+        "is_component_propertyGroup": True # if true, gets added to the registry's component_propertyGroups
+    }
+
+    return type_key
+
+# the type keys of the propertyGroups used by the fields of a propertyGroup plan
+def get_plan_dependencies(group_plan):
+    dependencies = []
+    for (property_type, options, _) in group_plan["annotations"].values():
+        if property_type in ("PointerProperty", "CollectionProperty"):
+            dependencies.append(options["type"])
+    return dependencies
+
+# turns the plan of a single property (see utils.blender_property_plan) into an actual blender property
+# classes: type key => registered propertyGroup class
+def property_from_plan(property_plan, classes, update):
+    (property_type, options, with_update) = property_plan
+    if property_type in ("PointerProperty", "CollectionProperty"): # the type is the type key of a propertyGroup
+        options = {**options, "type": classes[options["type"]]}
+    if with_update:
+        options = {**options, "update": update}
+    return getattr(bpy.props, property_type)(**options)
+
+# creates & registers the actual propertyGroup class described by a propertyGroup plan
+def property_group_from_plan(group_plan, classes, update):
+    __annotations__ = {}
+    for (field_name, property_plan) in group_plan["annotations"].items():
+        __annotations__[field_name] = property_from_plan(property_plan, classes, update)
+    property_group_parameters = {
+        **group_plan["params"],
+        '__annotations__': __annotations__
+    }
+    return property_group_from_infos(group_plan["name"], property_group_parameters)
 
-    return (property_group_pointer, property_group_class)
-                
 def property_group_from_infos(property_group_name, property_group_parameters):
+    global registered_property_groups_count
     # print("creating property group", property_group_name)
     property_group_class = type(property_group_name, (PropertyGroup,), property_group_parameters)
     
     bpy.utils.register_class(property_group_class)
+    registered_property_groups_count += 1
     property_group_pointer = PointerProperty(type=property_group_class)
     
-    return (property_group_pointer, property_group_class)
\ No newline at end of file
+    return (property_group_pointer, property_group_class)
+
+def unregister_property_group(property_group_class):
+    global registered_property_groups_count
+    try:
+        bpy.utils.unregister_class(property_group_class)
+        registered_property_groups_count -= 1
+    except Exception as error:
+        print("failed to unregister propertyGroup", property_group_class, error)
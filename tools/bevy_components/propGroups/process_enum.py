@@ -1,13 +1,12 @@
-from bpy.props import (StringProperty)
 from . import process_component
+from .utils import blender_property_plan
 
-def process_enum(registry, definition, update, nesting):
+def process_enum(registry, definition, plan):
     blender_property_mapping = registry.blender_property_mapping
     short_name = definition["short_name"]
     type_def = definition["type"] if "type" in definition else None
     values = definition["oneOf"]
 
-    nesting = nesting + [short_name]
     __annotations__ = {}
     original_type_name = "enum"
 
@@ -20,33 +19,29 @@ def process_enum(registry, definition, update, nesting):
             item_name = item["title"]
             item_short_name = item["short_name"] if "short_name" in item else item_name
             variant_name = "variant_"+item_short_name
+            variant_type_key = definition["title"] + "::" + variant_name # variant names are only unique within their enum
             labels.append(item_name)
 
             if "prefixItems" in item:
                 #print("tupple variant in enum", short_name, item)
                 registry.add_custom_type(item_short_name, item)
-                (sub_component_group, _) = process_component.process_component(registry, item, update, {"nested": True}, nesting) 
-                additional_annotations[variant_name] = sub_component_group
+                sub_component_group = process_component.process_component(registry, item, plan, {"nested": True}, variant_type_key, definition["title"]) 
+                additional_annotations[variant_name] = ("PointerProperty", dict(type=sub_component_group), False)
             elif "properties" in item:
                 #print("struct variant in enum", short_name, item)
                 registry.add_custom_type(item_short_name, item)
-                (sub_component_group, _) = process_component.process_component(registry, item, update, {"nested": True}, nesting) 
-                additional_annotations[variant_name] = sub_component_group
+                sub_component_group = process_component.process_component(registry, item, plan, {"nested": True}, variant_type_key, definition["title"]) 
+                additional_annotations[variant_name] = ("PointerProperty", dict(type=sub_component_group), False)
             else: # for the cases where it's neither a tupple nor a structs: FIXME: not 100% sure of this
                 #print("other variant in enum", short_name)
-                annotations = {"variant_"+item_name: StringProperty(default="----<ignore_field>----")}
+                annotations = {"variant_"+item_name: ("StringProperty", dict(default="----<ignore_field>----"), False)}
                 additional_annotations = additional_annotations | annotations
 
         items = tuple((e, e, e) for e in labels)
         property_name = short_name
 
         blender_property_def = blender_property_mapping[original_type_name]
-        blender_property = blender_property_def["type"](
-            **blender_property_def["presets"],# we inject presets first
-            name = property_name,
-            items=items,
-            update= update
-)
+        blender_property = blender_property_plan(blender_property_def, name = property_name, items=items)
         __annotations__[property_name] = blender_property
 
         for a in additional_annotations:
@@ -58,12 +53,7 @@ def process_enum(registry, definition, update, nesting):
         property_name = short_name
         
         blender_property_def = blender_property_mapping[original_type_name]
-        blender_property = blender_property_def["type"](
-            **blender_property_def["presets"],# we inject presets first
-            name = property_name,
-            items=items,
-            update= update
-        )
+        blender_property = blender_property_plan(blender_property_def, name = property_name, items=items)
         __annotations__[property_name] = blender_property
     
     return __annotations__
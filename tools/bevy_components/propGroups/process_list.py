@@ -1,35 +1,33 @@
-from bpy.props import (StringProperty, IntProperty, CollectionProperty)
 from .utils import generate_wrapper_propertyGroup
 from . import process_component
+from ..registry.type_refs import MISSING_TYPE
 
-def process_list(registry, definition, update, nesting=[]):
+def process_list(registry, definition, plan):
     value_types_defaults = registry.value_types_defaults 
-    type_infos = registry.type_infos
 
     short_name = definition["short_name"]
-    ref_name = definition["items"]["type"]["$ref"].replace("#/$defs/", "")
-    
-    item_definition = type_infos[ref_name]
+    type_ref = definition["items"]["type"]
+    item_definition = type_ref.definition
+    if item_definition is MISSING_TYPE:
+        raise KeyError(type_ref.type_name)
     item_long_name = item_definition["title"]
     item_short_name = item_definition["short_name"]
     is_item_value_type = item_long_name in value_types_defaults
 
-    property_group_class = None
+    property_group_name = None
     #if the content of the list is a unit type, we need to generate a fake wrapper, otherwise we cannot use layout.prop(group, "propertyName") as there is no propertyName !
     if is_item_value_type:
-        property_group_class = generate_wrapper_propertyGroup(short_name, item_long_name, definition["items"]["type"]["$ref"],registry, update)
+        property_group_name = generate_wrapper_propertyGroup(short_name, item_long_name, type_ref["$ref"],registry, plan, definition["title"])
     else:
-        (_, list_content_group_class) = process_component.process_component(registry, item_definition, update, {"nested": True, "type_name": item_long_name}, nesting)
-        property_group_class = list_content_group_class
+        property_group_name = process_component.process_component(registry, item_definition, plan, {"nested": True, "type_name": item_long_name})
 
-    nesting = nesting+[short_name]
-    item_collection = CollectionProperty(type=property_group_class)
+    item_collection = ("CollectionProperty", dict(type=property_group_name), False)
 
     item_short_name = item_short_name if not is_item_value_type else  "wrapper_" + item_short_name
     __annotations__ = {
         "list": item_collection,
-        "list_index": IntProperty(name = "Index for list", default = 0,  update=update),
-        "type_name_short": StringProperty(default=item_short_name)
+        "list_index": ("IntProperty", dict(name = "Index for list", default = 0), True),
+        "type_name_short": ("StringProperty", dict(default=item_short_name), False)
     }
 
     return __annotations__
\ No newline at end of file
@@ -1,24 +1,22 @@
-from bpy.props import (StringProperty)
 from . import process_component
+from .utils import blender_property_plan
+from ..registry.type_refs import MISSING_TYPE
 
-def process_tupples(registry, definition, prefixItems, update, nesting=[]):
+def process_tupples(registry, definition, prefixItems, plan):
     value_types_defaults = registry.value_types_defaults 
     blender_property_mapping = registry.blender_property_mapping
-    type_infos = registry.type_infos
-    short_name = definition["short_name"]
 
-    nesting = nesting+[short_name]
     __annotations__ = {}
 
     default_values = []
     prefix_infos = []
     for index, item in enumerate(prefixItems):
-        ref_name = item["type"]["$ref"].replace("#/$defs/", "")
+        type_ref = item["type"]
+        original = type_ref.definition
 
         property_name = str(index)# we cheat a bit, property names are numbers here, as we do not have a real property name
        
-        if ref_name in type_infos:
-            original = type_infos[ref_name]
+        if original is not MISSING_TYPE:
             original_type_name = original["title"]
             is_value_type = original_type_name in value_types_defaults
 
@@ -29,24 +27,18 @@ def process_tupples(registry, definition, prefixItems, update, nesting=[]):
             if is_value_type:
                 if original_type_name in blender_property_mapping:
                     blender_property_def = blender_property_mapping[original_type_name]
-                    blender_property = blender_property_def["type"](
-                        **blender_property_def["presets"],# we inject presets first
-                        name = property_name, 
-                        default=value,
-                        update= update
-                    )
+                    blender_property = blender_property_plan(blender_property_def, name = property_name, default=value)
                   
                     __annotations__[property_name] = blender_property
             else:
                 original_long_name = original["title"]
-                (sub_component_group, _) = process_component.process_component(registry, original, update, {"nested": True, "type_name": original_long_name}, nesting)
-                __annotations__[property_name] = sub_component_group
+                sub_component_group = process_component.process_component(registry, original, plan, {"nested": True, "type_name": original_long_name})
+                __annotations__[property_name] = ("PointerProperty", dict(type=sub_component_group), False)
         else: 
             # component not found in type_infos, generating placeholder
-            __annotations__[property_name] = StringProperty(default="N/A")
-            registry.add_missing_typeInfo(ref_name)
-            # the root component also becomes invalid (in practice it is not always a component, but good enough)
-            registry.add_invalid_component(nesting[0])
+            __annotations__[property_name] = ("StringProperty", dict(default="N/A"), False)
+            # (all the types using this one, directly or not, become invalid, see registry.update_invalid_components)
+            registry.add_missing_typeInfo(type_ref.type_name)
 
 
     return __annotations__
@@ -1,40 +1,185 @@
+import re
+import time
 import bpy
 from .conversions_from_prop_group import property_group_value_to_custom_property_value
-from .process_component import process_component
-from .utils import update_calback_helper
+from .process_component import process_component, property_group_from_plan, get_plan_dependencies, unregister_property_group
+from ..components.metadata import ComponentMetadata, mark_component_dirty, refresh_components_of_all_objects, write_dirty_components
+
+component_path_regex = re.compile(r'^components_meta\.components\[(\d+)\]')
+
+# in the ui, changes are coalesced: dragging a slider fires dozens of updates per second, but the custom properties
+# only get written once the changes stop for this long (s), see flush_pending_updates
+# scripts & background runs expect the custom properties to be up to date right after setting a value: no delay there
+coalesced_updates_delay = 0.0 if bpy.app.background else 0.15
+pending_update_objects = set() # names of the objects with components waiting to be written
+last_update_time = 0.0
 
 ## main callback function, fired whenever any property changes, no matter the nesting level
-def update_component(self, context, definition, component_name):
+# the propertyGroups are shared by all the components using the same types, so we find out what object & component we are in at runtime
+def update_component(self, context):
     registry = bpy.context.window_manager.components_registry
-    current_object = bpy.context.object
-    update_disabled = current_object["__disable__update"] if "__disable__update" in current_object else False
-    update_disabled = registry.disable_all_object_updates or update_disabled # global settings
-    if update_disabled:
+    if registry.disable_all_object_updates: # global settings
+        return
+    current_object = self.id_data
+    if "__disable__update" in current_object and current_object["__disable__update"]:
+        return
+    match = component_path_regex.match(self.path_from_id())
+    if match is None:
+        return
+    component_meta = current_object.components_meta.components[int(match.group(1))]
+    # deferred mode: the custom property gets written later, see write_dirty_components
+    if registry.deferred_custom_properties or coalesced_updates_delay > 0:
+        mark_component_dirty(current_object, component_meta)
+        if not registry.deferred_custom_properties:
+            request_pending_updates_flush(current_object)
         return
+    component_name = component_meta.name
     print("")
     print("update in component", component_name, self, "current_object", current_object.name)
-    components_in_object = current_object.components_meta.components
-    component_meta =  next(filter(lambda component: component["name"] == component_name, components_in_object), None)
-    if component_meta != None:
-        property_group_name = registry.get_propertyGroupName_from_shortName(component_name)
+    long_name = registry.short_names_to_long_names.get(component_name, None)
+    property_group_name = registry.get_propertyGroupName_from_shortName(component_name)
+    if long_name is not None and property_group_name is not None:
+        definition = registry.type_infos[long_name]
         self = getattr(component_meta, property_group_name)
         # we use our helper to set the values
-        context.object[component_name] = property_group_value_to_custom_property_value(self, definition, registry, None)
+        current_object[component_name] = property_group_value_to_custom_property_value(self, definition, registry, None)
 
 
+def request_pending_updates_flush(object):
+    global last_update_time
+    last_update_time = time.perf_counter()
+    if len(pending_update_objects) == 0:
+        bpy.app.timers.register(flush_pending_updates, first_interval=coalesced_updates_delay)
+    pending_update_objects.add(object.name)
+
+# writes the custom properties of the components changed since the last flush, once per component
+# runs as a timer, that keeps rescheduling itself as long as changes keep coming in
+def flush_pending_updates(force=False):
+    remaining = last_update_time + coalesced_updates_delay - time.perf_counter()
+    if remaining > 0 and not force:
+        return remaining
+    objects = [bpy.data.objects.get(object_name, None) for object_name in pending_update_objects]
+    pending_update_objects.clear()
+    if force and bpy.app.timers.is_registered(flush_pending_updates):
+        bpy.app.timers.unregister(flush_pending_updates)
+    registry = bpy.context.window_manager.components_registry
+    if not registry.deferred_custom_properties:
+        write_dirty_components([object for object in objects if object is not None])
+    return None
+
 def generate_propertyGroups_for_components():
     registry = bpy.context.window_manager.components_registry
     if not registry.has_type_infos():
         registry.load_type_infos()
 
+    # incremental reload: only the types that changed need to be regenerated
+    if registry.types_to_regenerate is not None:
+        with registry.load_profiler.phase("regenerate") as phase:
+            regenerate_propertyGroups(registry, registry.types_to_regenerate)
+            phase["types"] = len(registry.types_to_regenerate)
+        registry.set_types_to_regenerate(None)
+        return
+
+    # the plan might already be available from the registry cache, in that case no need to analyse the type infos again
+    if not registry.has_propertyGroups_plan():
+        with registry.load_profiler.phase("plan") as phase:
+            registry.set_propertyGroups_plan(generate_propertyGroups_plan(registry))
+            phase["types"] = len(registry.propertyGroups_plan)
+        with registry.load_profiler.phase("save_cache"):
+            registry.save_cache()
+    # the actual propertyGroups are only created when first needed, see materialize_component_propertyGroups
+
+# generates the plan (plain, cacheable data, see process_component) of all the propertyGroups needed for the type infos
+def generate_propertyGroups_plan(registry):
     type_infos = registry.type_infos
+    plan = {}
+
+    for component_name in list(type_infos.keys()):
+        if component_name not in registry.custom_type_names:
+            process_component(registry, type_infos[component_name], plan)
 
-    for component_name in type_infos:
-        definition = type_infos[component_name]
-        short_name = definition["short_name"]
-        is_component = definition['isComponent'] if "isComponent" in definition else False
-        root_property_name = short_name if is_component else None
-        process_component(registry, definition, update_calback_helper(definition, update_component, root_property_name), None, [])
-        
     # if we had to add any wrapper types on the fly, process them now
-    registry.process_custom_types()
\ No newline at end of file
+    registry.process_custom_types()
+    registry.update_invalid_components()
+    return plan
+
+# only regenerates the propertyGroups of the given types, keeps all the others, & refreshes the objects using the regenerated components
+def regenerate_propertyGroups(registry, type_names):
+    if len(type_names) == 0:
+        return
+    plan = registry.propertyGroups_plan
+    # the propertyGroups of enum variants & wrappers belong to the type that generated them
+    removed_plan = {type_key: plan.pop(type_key) for (type_key, group_plan) in list(plan.items()) if type_key in type_names or group_plan["long_name"] in type_names}
+    removed_propertyGroup_names = unregister_propertyGroups(registry, removed_plan)
+
+    for component_name in list(registry.type_infos.keys()):
+        if component_name in type_names and component_name not in registry.custom_type_names:
+            process_component(registry, registry.type_infos[component_name], plan)
+    registry.process_custom_types()
+    registry.update_invalid_components()
+    registry.save_cache()
+
+    # the new propertyGroups get materialized as needed by the objects using them
+    component_names = set()
+    regenerated_plan = [plan[type_key] for type_key in plan if type_key in type_names or plan[type_key]["long_name"] in type_names]
+    for group_plan in list(removed_plan.values()) + regenerated_plan:
+        if group_plan["component_name"] is not None:
+            component_names.add(group_plan["component_name"])
+    print("regenerated propertyGroups for", len(type_names), "types, refreshing components", component_names)
+    refresh_components_of_all_objects(component_names, removed_propertyGroup_names)
+
+# unregisters the propertyGroups of the given plan (type key => propertyGroup plan), returns the names of the ones that were used by components
+def unregister_propertyGroups(registry, plan):
+    # the propertyGroups using others have to be unregistered first, ie in reverse registration order
+    for type_key in reversed(list(registry.propertyGroup_classes.keys())):
+        if type_key in plan:
+            unregister_property_group(registry.propertyGroup_classes.pop(type_key))
+    removed_propertyGroup_names = []
+    for group_plan in plan.values():
+        property_group_name = group_plan["name"]
+        if group_plan["is_component_propertyGroup"]:
+            registry.component_propertyGroups.pop(property_group_name, None)
+            removed_propertyGroup_names.append(property_group_name)
+    for (key, property_group_name) in list(registry.short_names_to_propgroup_names.items()):
+        if property_group_name in removed_propertyGroup_names:
+            del registry.short_names_to_propgroup_names[key]
+    return removed_propertyGroup_names
+
+# tears down everything generated from the current registry: unregisters all the propertyGroup classes
+# & removes the pointers to them that were injected into ComponentMetadata (see metadata.upsert_component_in_object)
+def unregister_all_propertyGroups(registry):
+    for property_group_name in registry.component_propertyGroups:
+        if hasattr(ComponentMetadata, property_group_name):
+            delattr(ComponentMetadata, property_group_name)
+    # the propertyGroups using others have to be unregistered first, ie in reverse registration order
+    for property_group_class in reversed(list(registry.propertyGroup_classes.values())):
+        unregister_property_group(property_group_class)
+    registry.propertyGroup_classes.clear()
+    registry.component_propertyGroups.clear()
+
+# creates & registers the propertyGroups of the given type (long name), if they do not exist yet
+def materialize_component_propertyGroups(registry, component_name):
+    if component_name in registry.propertyGroup_classes:
+        return False
+    if registry.propertyGroups_plan.get(component_name, None) is None:
+        return False
+    materialize_propertyGroup(registry, component_name, set())
+    return True
+
+# creates & registers the actual propertyGroup of the given type key from its plan, after the propertyGroups it uses
+def materialize_propertyGroup(registry, type_key, in_progress):
+    if type_key in registry.propertyGroup_classes:
+        return registry.propertyGroup_classes[type_key]
+    if type_key in in_progress:
+        raise Exception("cannot generate propertyGroups for recursive type " + type_key)
+    in_progress.add(type_key)
+    group_plan = registry.propertyGroups_plan[type_key]
+    for dependency in get_plan_dependencies(group_plan):
+        materialize_propertyGroup(registry, dependency, in_progress)
+    (property_group_pointer, property_group_class) = property_group_from_plan(group_plan, registry.propertyGroup_classes, update_component)
+    registry.propertyGroup_classes[type_key] = property_group_class
+    # add our component propertyGroup to the registry
+    if group_plan["is_component_propertyGroup"]:
+        registry.register_component_propertyGroup(group_plan["name"], property_group_pointer)
+    in_progress.discard(type_key)
+    return property_group_class
@@ -0,0 +1,147 @@
+import re
+
+# the values of the subset of RON (https://github.com/ron-rs/ron) that Bevy emits & that we generate, once parsed:
+# - RonStruct: (a: 1, b: 2) or named: Linear(end: 0.0, start: 0.0), Vec3(x:0.0, y:0.0, z:0.0)
+# - RonTuple: (1, 2) or named: Float(0.0), () is an empty tuple
+# - RonList: [1, 2]
+# - RonString: "some text"
+# - everything else (numbers, booleans & unit enum variants: 1.0, true, Metal) is kept as a plain str
+class RonStruct(dict):
+    __slots__ = ("name",)
+
+    def __init__(self, name=None):
+        super().__init__()
+        self.name = name
+
+class RonTuple(list):
+    __slots__ = ("name",)
+
+    def __init__(self, name=None):
+        super().__init__()
+        self.name = name
+
+class RonList(list):
+    __slots__ = ()
+
+class RonString(str):
+    __slots__ = ()
+
+class RonParseError(Exception):
+    pass
+
+# a single regex tokenizes the whole input in one pass:
+# punctuation, strings, atoms (possibly followed by ':' for field names, or '(' for named structs/tuples), & anything else, that is an error
+token_regex = re.compile(r'([()\[\],])|"((?:[^"\\]|\\.)*)"|([^\s()\[\],:"]+)(?:(\s*:)|(\())?|(\S)')
+# the escape sequences of RON strings, any other backslash is kept as is (ie hand written windows paths)
+escape_regex = re.compile(r'\\(?:u\{([0-9a-fA-F]{1,6})\}|(["\\\'nrt0bf/]))')
+unescaped_characters = {'"': '"', "\\": "\\", "'": "'", "n": "\n", "r": "\r", "t": "\t", "0": "\0", "b": "\b", "f": "\f", "/": "/"}
+# what quote_ron_string escapes: quotes, backslashes & control characters
+escaped_characters = {code: "\\u{{{:x}}}".format(code) for code in range(0x20)}
+escaped_characters.update({ord('"'): '\\"', ord("\\"): "\\\\", ord("\n"): "\\n", ord("\r"): "\\r", ord("\t"): "\\t", ord("\0"): "\\0"})
+
+PUNCTUATION = 1
+STRING = 2
+ATOM = 3
+FIELD_NAME = 4
+NAMED_OPEN = 5
+
+# parses a complete RON string into a tree of values (see RonStruct etc)
+# the containers being parsed are kept in an explicit stack rather than recursion, so there is no limit to the nesting depth
+def parse_ron(string):
+    root = RonTuple() # holds the top level value
+    stack = [] # (parent container, pending field name in the parent)
+    container = root
+    field_name = None
+    expect_value = True
+
+    for match in token_regex.finditer(string):
+        kind = match.lastindex
+        if kind == ATOM or kind == STRING:
+            if kind == ATOM:
+                value = match.group(3)
+            else:
+                value = match.group(2)
+                value = RonString(unescape_ron_string(value) if "\\" in value else value)
+        elif kind == FIELD_NAME:
+            # the first field of a struct: what we thought was a tuple is actually a struct
+            if type(container) is RonTuple and container is not root and len(container) == 0:
+                container = RonStruct(container.name)
+            if type(container) is not RonStruct or field_name is not None or not expect_value:
+                raise RonParseError("unexpected field name at position {} in {}".format(match.start(), string))
+            field_name = match.group(3)
+            continue
+        elif kind == NAMED_OPEN or kind == PUNCTUATION and match.group(1) in "([":
+            if not expect_value:
+                raise RonParseError("expected ',' or closing bracket at position {} in {}".format(match.start(), string))
+            stack.append((container, field_name))
+            if kind == NAMED_OPEN:
+                container = RonTuple(match.group(3))
+            else:
+                container = RonTuple() if match.group(1) == "(" else RonList()
+            field_name = None
+            continue
+        elif kind == PUNCTUATION:
+            char = match.group(1)
+            if char == ",":
+                if expect_value or container is root:
+                    raise RonParseError("unexpected ',' at position {} in {}".format(match.start(), string))
+                expect_value = True
+                continue
+            # closing bracket
+            if container is root or (type(container) is RonList) != (char == "]") or field_name is not None:
+                raise RonParseError("unexpected '{}' at position {} in {}".format(char, match.start(), string))
+            value = container
+            (container, field_name) = stack.pop()
+            expect_value = True
+        else:
+            raise RonParseError("unexpected '{}' at position {} in {}".format(match.group(), match.start(), string))
+
+        # we have a complete value: add it to its container
+        if not expect_value:
+            raise RonParseError("expected ',' or closing bracket at position {} in {}".format(match.start(), string))
+        if type(container) is RonStruct:
+            if field_name is None:
+                raise RonParseError("expected a field name at position {} in {}".format(match.start(), string))
+            container[field_name] = value
+            field_name = None
+        else:
+            container.append(value)
+        expect_value = False
+
+    if len(stack) != 0:
+        raise RonParseError("unterminated value in {}".format(string))
+    if len(root) != 1:
+        raise RonParseError("expected a single value in {}".format(string))
+    return root[0]
+
+def unescape_character(match):
+    if match.group(1) is not None:
+        code = int(match.group(1), 16)
+        return chr(code) if code <= 0x10ffff else match.group(0)
+    return unescaped_characters[match.group(2)]
+
+# the content of a RON string (without its quotes) => the actual text
+def unescape_ron_string(value):
+    return escape_regex.sub(unescape_character, value)
+
+# some "text" => "some \"text\"", the reverse of the unescaping done in parse_ron
+def quote_ron_string(value):
+    return '"' + value.translate(escaped_characters) + '"'
+
+# turns a parsed value back into a RON string
+def ron_to_string(value):
+    if isinstance(value, RonString):
+        return quote_ron_string(value)
+    if isinstance(value, RonStruct):
+        return (value.name or "") + "(" + ", ".join(field_name + ": " + ron_to_string(field_value) for (field_name, field_value) in value.items()) + ")"
+    if isinstance(value, RonTuple):
+        return (value.name or "") + "(" + ", ".join(ron_to_string(item) for item in value) + ")"
+    if isinstance(value, RonList):
+        return "[" + ", ".join(ron_to_string(item) for item in value) + "]"
+    return str(value)
+
+# (value) => value, for the places where newtypes & their content are interchangeable
+def unwrap_ron_value(value):
+    while isinstance(value, RonTuple) and value.name is None and len(value) == 1:
+        value = value[0]
+    return value
@@ -1,19 +1,18 @@
-# helper function that returns a lambda, used for the PropertyGroups update function
-def update_calback_helper(definition, update, component_name_override):
-    return lambda self, context: update(self, context, definition, component_name_override)
+# helper that returns the "plan" of a blender property : plain data (property type name, options, whether it needs the update callback)
+# that can be cached & turned into an actual property later (see process_component.property_from_plan)
+def blender_property_plan(blender_property_def, with_update=True, **options):
+    return (blender_property_def["type"].__name__, {**blender_property_def["presets"], **options}, with_update)
 
-import bpy
-from bpy.props import (StringProperty)
-from bpy_types import PropertyGroup
-
-# this helper creates a "fake"/wrapper property group that is NOT a real type in the registry
+# this helper creates the plan of a "fake"/wrapper property group that is NOT a real type in the registry
 # usefull for things like value types in list items etc
-def generate_wrapper_propertyGroup(short_name, item_long_name, definition, registry, update):
+def generate_wrapper_propertyGroup(short_name, item_long_name, definition, registry, plan, owner_name):
     value_types_defaults = registry.value_types_defaults 
     blender_property_mapping = registry.blender_property_mapping
     is_item_value_type = item_long_name in value_types_defaults
 
     wrapper_name = "wrapper_" + short_name
+    if wrapper_name in plan:
+        return wrapper_name
 
     wrapper_definition = {
         "isComponent": False,
@@ -33,28 +32,28 @@ def generate_wrapper_propertyGroup(short_name, item_long_name, definition, regis
     }
     registry.add_custom_type(wrapper_name, wrapper_definition)
 
-    blender_property = StringProperty(default="", update=update)
+    blender_property = ("StringProperty", dict(default=""), True)
     if item_long_name in blender_property_mapping:
         value = value_types_defaults[item_long_name] if is_item_value_type else None
         blender_property_def = blender_property_mapping[item_long_name]
-        blender_property = blender_property_def["type"](
-            **blender_property_def["presets"],# we inject presets first
-            name = "property_name",
-            default = value,
-            update = update
-        )
+        blender_property = blender_property_plan(blender_property_def, name = "property_name", default = value)
         
     wrapper_annotations = {
         '0' : blender_property
     }
     property_group_params = {
-        '__annotations__': wrapper_annotations,
         'tupple_or_struct': "tupple",
         'field_names': ['0'], 
         **dict(with_properties = False, with_items= True, with_enum= False, with_list= False, short_name= wrapper_name, type_name=wrapper_name),
         #'root_component': root_component
     }
-    property_group_class = type(wrapper_name, (PropertyGroup,), property_group_params)
-    bpy.utils.register_class(property_group_class)
+    plan[wrapper_name] = {
+        "name": wrapper_name,
+        "long_name": owner_name,
+        "component_name": None,
+        "params": property_group_params,
+        "annotations": wrapper_annotations,
+        "is_component_propertyGroup": False
+    }
 
-    return property_group_class
\ No newline at end of file
+    return wrapper_name
\ No newline at end of file
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import bpy
+
+# bump this whenever the structure of the cached data changes, to invalidate existing caches
+CACHE_FORMAT_VERSION = 4
+
+def get_addon_version():
+    from .. import bl_info
+    return ".".join(str(number) for number in bl_info["version"])
+
+# the cache key: hash of the raw schema file content + add-on version (the generated data changes with the add-on's code)
+# + any settings that change what gets loaded from the schema (ie type filters)
+def compute_schema_hash(raw_schema, settings=""):
+    hasher = hashlib.sha1(raw_schema)
+    hasher.update(("bevy_components:" + get_addon_version() + ":" + str(CACHE_FORMAT_VERSION)).encode("utf-8"))
+    hasher.update(settings.encode("utf-8"))
+    return hasher.hexdigest()
+
+# one cache file per schema file, stored in the user's blender config folder (or the temp folder as a fallback)
+def get_cache_path(schema_path):
+    try:
+        cache_folder = bpy.utils.user_resource('CONFIG', path="bevy_components_cache", create=True)
+    except Exception:
+        cache_folder = os.path.join(tempfile.gettempdir(), "bevy_components_cache")
+        os.makedirs(cache_folder, exist_ok=True)
+    cache_name = hashlib.sha1(os.path.abspath(schema_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_folder, cache_name + ".cache")
+
+# returns the cached data if it exists & matches the given schema hash, None otherwise
+def load_registry_cache(cache_path, schema_hash):
+    try:
+        with open(cache_path, "rb") as cache_file:
+            cached = pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except Exception as error:
+        print("failed to load registry cache", cache_path, error)
+        return None
+
+    if not isinstance(cached, dict) or cached.get("schema_hash", None) != schema_hash:
+        return None
+    return cached
+
+def save_registry_cache(cache_path, data):
+    # write to a temporary file first, so that we never leave a half written cache behind
+    temporary_path = cache_path + ".tmp"
+    try:
+        with open(temporary_path, "wb") as cache_file:
+            pickle.dump(data, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except Exception as error:
+        print("failed to save registry cache", cache_path, error)
@@ -0,0 +1,17 @@
+# helpers for incremental reloads of the registry: find out which types changed between two versions of the schema
+# & which types need their propertyGroups regenerated because of it
+
+# types that were added, removed or whose definition changed
+def find_changed_types(previous_type_infos, type_infos):
+    changed_types = set()
+    for type_name in type_infos:
+        if previous_type_infos.get(type_name, None) != type_infos[type_name]:
+            changed_types.add(type_name)
+    for type_name in previous_type_infos:
+        if type_name not in type_infos:
+            changed_types.add(type_name)
+    return changed_types
+
+# the changed types + all the types that reference them, directly or not, in the old or in the new version of the schema (see TypeGraph)
+def find_types_to_regenerate(previous_type_graph, type_graph, changed_types):
+    return set(changed_types) | previous_type_graph.transitive_dependents_of(changed_types) | type_graph.transitive_dependents_of(changed_types)
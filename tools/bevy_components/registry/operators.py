@@ -4,8 +4,8 @@ from bpy_types import (Operator)
 from bpy.props import (StringProperty)
 from bpy_extras.io_utils import ImportHelper
 
-from ..helpers import upsert_settings
-from ..components.metadata import apply_customProperty_values_to_object_propertyGroups, apply_propertyGroup_values_to_object_customProperties, ensure_metadata_for_all_objects
+from ..components.metadata import apply_customProperty_values_to_object_propertyGroups, apply_customProperty_values_to_objects_propertyGroups_for_component, apply_propertyGroup_values_to_object_customProperties, apply_propertyGroup_values_to_objects_customProperties_for_component, chunk_objects_per_component, cleanup_invalid_metadata, format_conversion_stats
+from ..jobs import ComponentsJob, ComponentsJobOperator
 from ..propGroups.prop_groups import generate_propertyGroups_for_components
 
 class ReloadRegistryOperator(Operator):
@@ -21,12 +21,14 @@ class ReloadRegistryOperator(Operator):
 
     def execute(self, context):
         print("reload registry")
-        context.window_manager.components_registry.load_schema()
+        registry = context.window_manager.components_registry
+        registry.load_schema()
         generate_propertyGroups_for_components()
         print("")
         print("")
         print("")
-        ensure_metadata_for_all_objects()
+        registry.ensure_metadata_for_all_objects()
+        registry.report_load_profile()
 
         # now force refresh the ui
         for area in context.screen.areas: 
@@ -36,11 +38,12 @@ class ReloadRegistryOperator(Operator):
 
         return {'FINISHED'}
     
-class COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_ALL(Operator):
+class COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_ALL(ComponentsJobOperator, Operator):
     """Apply registry to ALL objects: update the custom property values of all objects based on their definition, if any"""
     bl_idname = "object.refresh_custom_properties_all"
     bl_label = "Apply Registry to all objects"
     bl_options = {"UNDO"}
+    progress_property = "custom_properties_from_components_progress_all"
 
     @classmethod
     def register(cls):
@@ -50,20 +53,19 @@ class COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_ALL(Operator):
     def unregister(cls):
         del bpy.types.WindowManager.custom_properties_from_components_progress_all
 
-    def execute(self, context):
+    def create_job(self, context):
         print("apply registry to all")
-        #context.window_manager.components_registry.load_schema()
-        total = len(bpy.data.objects)
-
-        for index, object in enumerate(bpy.data.objects):
-            apply_propertyGroup_values_to_object_customProperties(object)
-            progress = index / total
-            context.window_manager.custom_properties_from_components_progress_all = progress
-            # now force refresh the ui
-            bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
-        context.window_manager.custom_properties_from_components_progress_all = -1.0
-
-        return {'FINISHED'}
+        objects = list(bpy.data.objects)
+        # the metadata is cleaned up first, then all the objects are done one component type at a time
+        cleanup_chunks = [(None, objects[start:start + 200]) for start in range(0, len(objects), 200)]
+        def process_chunk(chunk):
+            (component_name, chunk_objects) = chunk
+            if component_name is None:
+                for object in chunk_objects:
+                    cleanup_invalid_metadata(object)
+            else:
+                apply_propertyGroup_values_to_objects_customProperties_for_component(chunk_objects, component_name)
+        return ComponentsJob(cleanup_chunks + chunk_objects_per_component(objects), process_chunk)
     
 class COMPONENTS_OT_REFRESH_CUSTOM_PROPERTIES_CURRENT(Operator):
     """Apply registry to CURRENT object: update the custom property values of current object based on their definition, if any"""
@@ -129,11 +131,12 @@ class COMPONENTS_OT_REFRESH_PROPGROUPS_FROM_CUSTOM_PROPERTIES_CURRENT(Operator):
         return {'FINISHED'}
     
 
-class COMPONENTS_OT_REFRESH_PROPGROUPS_FROM_CUSTOM_PROPERTIES_ALL(Operator):
+class COMPONENTS_OT_REFRESH_PROPGROUPS_FROM_CUSTOM_PROPERTIES_ALL(ComponentsJobOperator, Operator):
     """Update UI values from custom properties to ALL object"""
     bl_idname = "object.refresh_ui_from_custom_properties_all"
     bl_label = "Apply custom_properties to all objects"
     bl_options = {"UNDO"}
+    progress_property = "components_from_custom_properties_progress_all"
 
     @classmethod
     def register(cls):
@@ -143,34 +146,26 @@ class COMPONENTS_OT_REFRESH_PROPGROUPS_FROM_CUSTOM_PROPERTIES_ALL(Operator):
     def unregister(cls):
         del bpy.types.WindowManager.components_from_custom_properties_progress_all
 
-    def execute(self, context):
+    def create_job(self, context):
         print("apply custom properties to all object")
         bpy.context.window_manager.components_registry.disable_all_object_updates = True
-        errors = []
-        total = len(bpy.data.objects)
-
-        for index, object in enumerate(bpy.data.objects):
-          
-            try:
-                apply_customProperty_values_to_object_propertyGroups(object)
-            except Exception as error:
-                del object["__disable__update"] # make sure custom properties are updateable afterwards, even in the case of failure
-                errors.append( "object: '" + object.name + "', error: " + str(error))
-
-            progress = index / total
-            context.window_manager.components_from_custom_properties_progress_all = progress
-            # now force refresh the ui
-            bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
-
-
-
-        if len(errors) > 0:
-            self.report({'ERROR'}, "Failed to update propertyGroup values from custom property: Errors:" + str(errors))
+        # all the objects at once, one component type at a time
+        # the identical values are only converted once per component type, across chunks
+        converted_values_per_component = {}
+        self.stats = {"conversions": 0, "copies": 0}
+        def process_chunk(chunk):
+            (component_name, chunk_objects) = chunk
+            converted_values = converted_values_per_component.setdefault(component_name, {})
+            return apply_customProperty_values_to_objects_propertyGroups_for_component(chunk_objects, component_name, converted_values, self.stats)
+        return ComponentsJob(chunk_objects_per_component(bpy.data.objects), process_chunk)
+
+    def finish(self, context, job):
+        print(format_conversion_stats(self.stats))
+        if len(job.errors) > 0:
+            self.report({'ERROR'}, "Failed to update propertyGroup values from custom property: Errors:" + job.format_errors())
         else: 
-            self.report({'INFO'}, "Sucessfully generated UI values for custom properties for all objects")
+            self.report({'INFO'}, "Sucessfully generated UI values for custom properties for all objects (" + format_conversion_stats(self.stats) + ")")
         bpy.context.window_manager.components_registry.disable_all_object_updates = False
-        context.window_manager.components_from_custom_properties_progress_all = -1.0
-        return {'FINISHED'}
 
 class OT_OpenFilebrowser(Operator, ImportHelper):
     """Browse for registry json file"""
@@ -192,7 +187,7 @@ class OT_OpenFilebrowser(Operator, ImportHelper):
         registry = context.window_manager.components_registry
         registry.schemaPath = relative_path
 
-        upsert_settings(registry.settings_save_path, {"schemaPath": relative_path})
+        registry.save_settings()
         
         return {'FINISHED'}
     
@@ -0,0 +1,38 @@
+import json
+import time
+from contextlib import contextmanager
+from ..propGroups import process_component
+
+# records, for each phase of the last registry load (read, parse, plan, metadata...):
+# - the wall time (in seconds)
+# - the number of types processed
+# - the number of propertyGroup classes registered
+class LoadProfiler():
+    def __init__(self):
+        self.phases = {} # phase name => {"duration", "types", "classes", ...}, in execution order
+
+    def clear(self):
+        self.phases.clear()
+
+    # usage: with profiler.phase("parse") as phase: ...; phase["types"] = len(type_infos)
+    @contextmanager
+    def phase(self, name):
+        phase = {"duration": 0.0, "types": 0, "classes": 0}
+        classes_count = process_component.registered_property_groups_count
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase["duration"] = time.perf_counter() - start
+            phase["classes"] = process_component.registered_property_groups_count - classes_count
+            self.phases[name] = phase
+
+    def total_duration(self):
+        return sum(phase["duration"] for phase in self.phases.values())
+
+    def format_phase(self, name):
+        phase = self.phases[name]
+        return "{}: {:.2f} ms, {} types, {} classes".format(name, phase["duration"] * 1000, phase["types"], phase["classes"])
+
+    def to_json(self):
+        return json.dumps({"total_duration": self.total_duration(), "phases": self.phases})
@@ -1,4 +1,5 @@
 import bpy
+import hashlib
 import json
 import os
 import uuid
@@ -6,9 +7,20 @@ from pathlib import Path
 from bpy_types import (PropertyGroup)
 from bpy.props import (StringProperty, BoolProperty, FloatProperty, FloatVectorProperty, IntProperty, IntVectorProperty, EnumProperty, PointerProperty, CollectionProperty)
 
-from ..helpers import load_settings
-from ..propGroups.prop_groups import generate_propertyGroups_for_components
-from ..components.metadata import ComponentMetadata, ensure_metadata_for_all_objects
+from ..helpers import load_settings, upsert_settings
+from .cache import compute_schema_hash, get_cache_path, load_registry_cache, save_registry_cache
+from .incremental import find_changed_types, find_types_to_regenerate
+from .watcher import schema_watcher
+from .type_graph import TypeGraph
+from .type_filters import parse_type_filters, filter_type_infos
+from .type_refs import resolve_type_refs
+from .profiler import LoadProfiler
+from ..propGroups import process_component
+from ..propGroups.conversion_plans import compile_conversion_plan
+from ..propGroups.parsed_values_cache import ParsedValuesCache
+from ..propGroups.prop_groups import generate_propertyGroups_for_components, materialize_component_propertyGroups, unregister_all_propertyGroups
+from ..components.usage_index import ComponentUsageIndex
+from ..components.metadata import ensure_metadata_for_all_objects, start_ensure_metadata_job, write_dirty_components
 
 # helper class to store missing bevy types information
 class MissingBevyType(bpy.types.PropertyGroup):
@@ -25,33 +37,39 @@ def toggle_watcher(self, context):
         except Exception as error:
             print("failed to unregister", error)
             pass
+        schema_watcher.stop()
     else:
         self.watcher_active = True
         bpy.app.timers.register(watch_schema)
 
+def save_registry_settings(self, context):
+    self.save_settings()
+
+def toggle_deferred_custom_properties(self, context):
+    # back to immediate mode: the custom properties have to be up to date from now on
+    if not self.deferred_custom_properties and self.has_type_infos():
+        write_dirty_components()
+    self.save_settings()
+
 def watch_schema():
     self = bpy.context.window_manager.components_registry
     # print("watching schema file for changes")
     try:
-        stamp = os.stat(self.schemaFullPath).st_mtime
-        stamp = str(stamp)
-        if stamp != self.schemaTimeStamp and self.schemaTimeStamp != "":
-            print("FILE CHANGED !!", stamp,  self.schemaTimeStamp)
-            # see here for better ways : https://stackoverflow.com/questions/11114492/check-if-a-file-is-not-open-nor-being-used-by-another-process
-            """try:
-                os.rename(path, path)
-                #return False
-            except OSError:    # file is in use
-                print("in use")
-                #return True"""
-            #bpy.ops.object.reload_registry()
-            # we need to add an additional delay as the file might not have loaded yet
-            bpy.app.timers.register(lambda: bpy.ops.object.reload_registry(), first_interval=1)
-
-        self.schemaTimeStamp = stamp
+        if self.schemaFullPath != "":
+            schema_watcher.watch(self.schemaFullPath)
+            # only true once the file is done being written to, see SchemaWatcher
+            if schema_watcher.has_changed():
+                with open(self.schemaFullPath, "rb") as schema_file:
+                    schema_hash = compute_schema_hash(schema_file.read(), self.get_load_settings_key())
+                stamp = str(os.stat(self.schemaFullPath).st_mtime)
+                # the file is often rewritten without any actual changes (ie on each Bevy build): nothing to do in that case
+                if schema_hash != self.schema_hash:
+                    print("FILE CHANGED !!", stamp,  self.schemaTimeStamp)
+                    bpy.ops.object.reload_registry()
+                self.schemaTimeStamp = stamp
     except Exception as error:
-        pass
-    return self.watcher_poll_frequency if self.watcher_enabled else None
+        print("failed to check registry file for changes", error)
+    return schema_watcher.poll_interval(self.watcher_poll_frequency) if self.watcher_enabled else None
 
 
 # this is where we store the information for all available components
@@ -81,13 +99,39 @@ class ComponentsRegistry(PropertyGroup):
 
     disable_all_object_updates: BoolProperty(name="disable_object_updates", default=False) # type: ignore
 
+    ## registry cache
+    cache_enabled: BoolProperty(name="cache_enabled", description="cache the processed registry on disk, to speed up subsequent loads of the same schema", default=True) # type: ignore
+    incremental_reload: BoolProperty(name="incremental_reload", description="when reloading the same schema, only regenerate the types that changed (& the types using them)", default=True) # type: ignore
+
+    ## deferred custom properties
+    deferred_custom_properties: BoolProperty(
+        name="deferred custom properties",
+        description="only write the custom properties of the edited components when needed (export, save), instead of on every change",
+        default=False,
+        update=toggle_deferred_custom_properties
+    ) # type: ignore
+
+    ## type filters, applied when loading the schema
+    type_filters_include: StringProperty(
+        name="include types",
+        description="only load the types whose long name starts with one of these (comma separated) prefixes, ie 'my_game::, bevy_pbr::', + the types they use. All types if empty",
+        default="",
+        update=save_registry_settings
+    )# type: ignore
+    type_filters_exclude: StringProperty(
+        name="exclude types",
+        description="do not load the types whose long name starts with one of these (comma separated) prefixes, unless they are used by loaded types",
+        default="",
+        update=save_registry_settings
+    )# type: ignore
+
     ## file watcher
     watcher_enabled: BoolProperty(name="Watcher_enabled", default=True, update=toggle_watcher)# type: ignore
     watcher_active: BoolProperty(name = "Flag for watcher status", default = False)# type: ignore
 
     watcher_poll_frequency: IntProperty(
         name="watcher poll frequency",
-        description="frequency (s) at wich to poll for changes to the registry file",
+        description="frequency (s) at wich to poll for changes to the registry file, if file system notifications are not available",
         min=1,
         max=10,
         default=1
@@ -215,6 +259,18 @@ class ComponentsRegistry(PropertyGroup):
     short_names_to_long_names = {}
     custom_types_to_add = {}
     invalid_components = []
+    registry_serialized = True # whether the "registry" string property is in sync with type_infos
+    load_profiler = LoadProfiler() # timings & counts of each phase of the last registry load, see LoadProfiler
+    schema_hash = "" # hash of the content of the last loaded schema file (+ add-on version), used as cache key
+    loaded_from_cache = False
+    propertyGroups_plan = {} # type key (long name of type, enum variant, wrapper) => the plan of its propertyGroup, see process_component.process_component
+    propertyGroup_classes = {} # type key => registered propertyGroup class, only for the types that have been materialized, in registration order
+    custom_type_names = [] # the types we added ourselves (wrappers etc), not present in the schema
+    types_to_regenerate = None # set by an incremental reload: the types whose propertyGroups need to be regenerated, None for a full reload
+    type_graph = TypeGraph() # references between types, see TypeGraph
+    parsed_values_cache = ParsedValuesCache() # parsed custom property values, cleared on each load, see ParsedValuesCache
+    conversion_plans = {} # long name => how to convert the values of that type to/from custom properties, compiled on first use, see get_conversion_plan
+    component_usage_index = ComponentUsageIndex() # which objects use which components, see ComponentUsageIndex
 
     @classmethod
     def register(cls):
@@ -225,47 +281,80 @@ class ComponentsRegistry(PropertyGroup):
     def unregister(cls):
         bpy.context.window_manager.components_registry.watcher_active = False
 
-        for propgroup_name in cls.component_propertyGroups.keys():
-            try:
-                delattr(ComponentMetadata, propgroup_name)
-                #print("unregistered propertyGroup", propgroup_name)
-            except Exception as error:
-                pass
-                #print("failed to remove", error, "ComponentMetadata")
+        unregister_all_propertyGroups(cls)
         
         try:
             bpy.app.timers.unregister(watch_schema)
         except Exception as error:
             print("failed to unregister", error)
             pass
+        schema_watcher.stop()
 
         del bpy.types.WindowManager.components_registry
 
     def load_schema(self):
         print("load schema", self)
-        # cleanup previous data if any
-        self.propGroupIdCounter = 0
-        self.short_names_to_propgroup_names.clear()
-        self.missing_types_list.clear()
-        self.type_infos.clear()
-        self.type_infos_missing.clear()
-        self.component_propertyGroups.clear()
-        self.short_names_to_long_names.clear()
-        self.custom_types_to_add.clear()
-        self.invalid_components.clear()
-
         # now prepare paths to load data
         file_path = bpy.data.filepath
         # Get the folder
         folder_path = os.path.dirname(file_path)
         path =  os.path.join(folder_path, self.schemaPath)
+
+        # if this schema is already loaded, we keep everything that did not change, see prepare_incremental_reload
+        incremental = self.incremental_reload and path == self.schemaFullPath and self.has_type_infos() and self.has_propertyGroups_plan()
+        ComponentsRegistry.types_to_regenerate = None
+        # a new load starts: see report_load_profile for the results
+        profiler = self.load_profiler
+        profiler.clear()
+        self.parsed_values_cache.clear()
+        # the current propertyGroups might get replaced: the values they hold must not be lost
+        if self.has_type_infos():
+            write_dirty_components()
+        if not incremental:
+            with profiler.phase("clear"):
+                self.clear_registry_data()
         self.schemaFullPath = path
 
         f = Path(bpy.path.abspath(path)) # make a path object of abs path
-        with open(path) as f: 
-            data = json.load(f) 
-            defs = data["$defs"]
-            self.registry = json.dumps(defs) # FIXME:meh ?
+        with profiler.phase("read"):
+            with open(path, "rb") as f: 
+                raw_schema = f.read()
+            schema_hash = compute_schema_hash(raw_schema, self.get_load_settings_key())
+
+        cached = None
+        if not incremental and self.cache_enabled:
+            with profiler.phase("cache") as phase:
+                cached = load_registry_cache(get_cache_path(path), schema_hash)
+                if cached is not None:
+                    # no need to parse & process the schema at all: type infos, lookups & propertyGroups plan are all in the cache
+                    self.restore_from_cache(cached)
+                    phase["types"] = len(self.type_infos)
+        if cached is None:
+            with profiler.phase("parse") as phase:
+                if incremental:
+                    if schema_hash != self.schema_hash:
+                        data = json.loads(raw_schema)
+                        self.prepare_incremental_reload(self.filter_type_infos(resolve_type_refs(data["$defs"])))
+                        ComponentsRegistry.registry_serialized = False
+                    else:
+                        ComponentsRegistry.types_to_regenerate = set()
+                else:
+                    # we parse the schema only once: the parsed $defs ARE our working copy of the type infos
+                    # the type references are resolved right away, so nothing else has to look them up by name
+                    data = json.loads(raw_schema)
+                    ComponentsRegistry.type_infos = self.filter_type_infos(resolve_type_refs(data["$defs"]))
+                phase["types"] = len(self.type_infos)
+        if not incremental:
+            with profiler.phase("type_graph") as phase:
+                self.type_graph.build(self.type_infos)
+                phase["types"] = len(self.type_infos)
+            # the "registry" string property is only filled in lazily (see serialize_registry)
+            ComponentsRegistry.registry_serialized = False
+        ComponentsRegistry.schema_hash = schema_hash
+
+        print("registry schema loaded{}: {} types".format(
+            " from cache" if cached is not None else (" (incremental)" if incremental else ""),
+            len(self.type_infos)))
 
         # start timer
         if not self.watcher_active and self.watcher_enabled:
@@ -273,15 +362,150 @@ class ComponentsRegistry(PropertyGroup):
             print("registering function", watch_schema)
             bpy.app.timers.register(watch_schema)
 
+    # drops the types the user is not interested in (see type_filters_include/exclude) before doing anything else with them
+    def filter_type_infos(self, type_infos):
+        filtered_type_infos = filter_type_infos(type_infos, parse_type_filters(self.type_filters_include), parse_type_filters(self.type_filters_exclude))
+        if len(filtered_type_infos) != len(type_infos):
+            print("type filters: kept", len(filtered_type_infos), "types out of", len(type_infos))
+        return filtered_type_infos
+
+    # the settings that change what gets loaded from the schema file, part of the cache key
+    def get_load_settings_key(self):
+        type_filters = [parse_type_filters(self.type_filters_include), parse_type_filters(self.type_filters_exclude)]
+        return json.dumps(type_filters) if type_filters != [[], []] else ""
+
+    def clear_registry_data(self):
+        # the propertyGroups of the previous load are not usable anymore: get rid of them completely, otherwise they pile up in blender
+        unregister_all_propertyGroups(self)
+        self.propGroupIdCounter = 0
+        self.short_names_to_propgroup_names.clear()
+        self.missing_types_list.clear()
+        self.type_infos.clear()
+        self.type_infos_missing.clear()
+        self.short_names_to_long_names.clear()
+        self.custom_types_to_add.clear()
+        self.invalid_components.clear()
+        ComponentsRegistry.propertyGroups_plan = {}
+        ComponentsRegistry.loaded_from_cache = False
+        self.custom_type_names.clear()
+        self.type_graph.clear()
+        self.conversion_plans.clear()
+
+    # replaces the type infos with the new ones, but only marks the types that changed (& the types that use them) for regeneration
+    # everything else (propertyGroups, lookups) is kept as is
+    def prepare_incremental_reload(self, new_type_infos):
+        previous_type_infos = self.type_infos
+        # our custom types are not in the schema, but the propertyGroups we keep might still need them
+        for type_name in self.custom_type_names:
+            new_type_infos[type_name] = previous_type_infos[type_name]
+        resolve_type_refs(new_type_infos, [new_type_infos[type_name] for type_name in self.custom_type_names])
+        type_graph = TypeGraph()
+        type_graph.build(new_type_infos)
+
+        changed_types = find_changed_types(previous_type_infos, new_type_infos)
+        types_to_regenerate = find_types_to_regenerate(self.type_graph, type_graph, changed_types)
+        print("incremental reload: changed types", changed_types, "types to regenerate", len(types_to_regenerate))
+
+        ComponentsRegistry.type_infos = new_type_infos
+        ComponentsRegistry.type_graph = type_graph
+        ComponentsRegistry.types_to_regenerate = types_to_regenerate
+        # the conversion plans of the other types are still valid: they only point to plans of unchanged types
+        for type_name in types_to_regenerate:
+            self.conversion_plans.pop(type_name, None)
+
+        # forget what we know about the types to regenerate, it gets added back when generating their propertyGroups
+        for (short_name, long_name) in list(self.short_names_to_long_names.items()):
+            if long_name in types_to_regenerate:
+                del self.short_names_to_long_names[short_name]
+        self.invalid_components[:] = [short_name for short_name in self.invalid_components if short_name in self.short_names_to_long_names]
+        type_infos_missing = [type_name for type_name in self.type_infos_missing if type_name not in new_type_infos]
+        self.type_infos_missing.clear()
+        self.missing_types_list.clear()
+        for type_name in type_infos_missing:
+            self.add_missing_typeInfo(type_name)
+        self.missing_type_infos = str(self.type_infos_missing)
+
 
-    # we load the json once, so we do not need to do it over & over again
+    # only needed if we have a serialized registry but no type infos (they are set directly by load_schema)
     def load_type_infos(self):
         print("load type infos")
-        ComponentsRegistry.type_infos = json.loads(self.registry)
+        if self.registry != "":
+            ComponentsRegistry.type_infos = resolve_type_refs(json.loads(self.registry))
+            ComponentsRegistry.registry_serialized = True
+            self.type_graph.build(self.type_infos)
+            self.conversion_plans.clear()
+
+    # the "registry" string property is only (re)generated when needed, ie when saving the .blend file
+    def serialize_registry(self):
+        if self.registry_serialized or not self.has_type_infos():
+            return
+        with self.load_profiler.phase("serialize") as phase:
+            self.registry = json.dumps(self.type_infos)
+            ComponentsRegistry.registry_serialized = True
+            phase["types"] = len(self.type_infos)
+        print("registry serialized:", self.load_profiler.format_phase("serialize"))
     
     def has_type_infos(self):
         return len(self.type_infos.keys()) != 0
 
+    def has_propertyGroups_plan(self):
+        return len(self.propertyGroups_plan) != 0
+
+    def set_propertyGroups_plan(self, plan):
+        ComponentsRegistry.propertyGroups_plan = plan
+
+    # propertyGroups are only created & registered when first needed (ie a component is added, or found on an object)
+    def ensure_propertyGroups(self, long_name):
+        return materialize_component_propertyGroups(self, long_name)
+
+    def materialized_types_count(self):
+        return len(self.propertyGroup_classes)
+
+    # all the generated propertyGroup classes currently registered, should never be more than materialized_types_count
+    def live_propertyGroups_count(self):
+        return process_component.registered_property_groups_count
+
+    # the conversion plans are compiled once per type (& kept until the type changes), instead of looking up the definitions on each conversion
+    def get_conversion_plan(self, definition):
+        return compile_conversion_plan(self, definition, self.conversion_plans)
+
+    def set_types_to_regenerate(self, type_names):
+        ComponentsRegistry.types_to_regenerate = type_names
+
+    # stores the processed registry (pre-processed type infos, lookups, propertyGroups plan) on disk
+    def save_cache(self):
+        if not self.cache_enabled or self.schema_hash == "" or self.schemaFullPath == "":
+            return
+        save_registry_cache(get_cache_path(self.schemaFullPath), {
+            "schema_hash": self.schema_hash,
+            "type_infos": self.type_infos,
+            "type_infos_missing": self.type_infos_missing,
+            "invalid_components": self.invalid_components,
+            "short_names_to_long_names": self.short_names_to_long_names,
+            "short_names_to_propgroup_names": self.short_names_to_propgroup_names,
+            "propertyGroups_plan": self.propertyGroups_plan,
+            "custom_type_names": self.custom_type_names,
+        })
+
+    def restore_from_cache(self, cached):
+        ComponentsRegistry.type_infos = resolve_type_refs(cached["type_infos"]) # the type references are cached as plain "$ref"s
+        for type_name in cached["type_infos_missing"]:
+            self.add_missing_typeInfo(type_name)
+        self.invalid_components.extend(cached["invalid_components"])
+        self.short_names_to_long_names.update(cached["short_names_to_long_names"])
+        self.short_names_to_propgroup_names.update(cached["short_names_to_propgroup_names"])
+        ComponentsRegistry.propertyGroups_plan = cached["propertyGroups_plan"]
+        self.custom_type_names.extend(cached["custom_type_names"])
+        ComponentsRegistry.loaded_from_cache = True
+
+    def save_settings(self):
+        upsert_settings(self.settings_save_path, {
+            "schemaPath": self.schemaPath,
+            "type_filters_include": self.type_filters_include,
+            "type_filters_exclude": self.type_filters_exclude,
+            "deferred_custom_properties": self.deferred_custom_properties
+        })
+
     def load_settings(self):
         print("loading settings")
         settings = load_settings(self.settings_save_path)
@@ -289,10 +513,32 @@ class ComponentsRegistry(PropertyGroup):
         if settings!= None:
             print("settings", settings)
             self.schemaPath = settings["schemaPath"]
+            self.type_filters_include = settings.get("type_filters_include", "")
+            self.type_filters_exclude = settings.get("type_filters_exclude", "")
+            self.deferred_custom_properties = settings.get("deferred_custom_properties", False)
             self.load_schema()
             generate_propertyGroups_for_components()
-            ensure_metadata_for_all_objects()
-
+            # the file should be usable right away: the metadata gets checked in the background (except without ui, ie scripts)
+            self.ensure_metadata_for_all_objects(in_background=not bpy.app.background)
+            self.report_load_profile()
+
+    def ensure_metadata_for_all_objects(self, in_background=False):
+        with self.load_profiler.phase("metadata") as phase:
+            if in_background:
+                start_ensure_metadata_job()
+            else:
+                phase["checked"] = ensure_metadata_for_all_objects()
+            phase["types"] = self.materialized_types_count()
+            phase["objects"] = len(bpy.data.objects)
+
+    # the results of the last load, as json in background mode (ie nightly runs), so they can be tracked by scripts
+    def report_load_profile(self):
+        profiler = self.load_profiler
+        print("registry loaded in {:.2f} ms".format(profiler.total_duration() * 1000))
+        for name in profiler.phases:
+            print("  ", profiler.format_phase(name))
+        if bpy.app.background:
+            print("BEVY_COMPONENTS_LOAD_PROFILE", profiler.to_json())
 
     # we keep a list of component propertyGroup around 
     def register_component_propertyGroup(self, name, propertyGroup):
@@ -314,13 +560,25 @@ class ComponentsRegistry(PropertyGroup):
         self.custom_types_to_add[type_name] = type_definition
 
     def process_custom_types(self):
+        resolve_type_refs(self.type_infos, self.custom_types_to_add.values())
         for type_name in self.custom_types_to_add:
             self.type_infos[type_name] = self.custom_types_to_add[type_name]
+            self.type_graph.add_type(type_name, self.type_infos[type_name])
+            if type_name not in self.custom_type_names:
+                self.custom_type_names.append(type_name)
         self.custom_types_to_add.clear()
 
     def add_invalid_component(self, component_name):
         self.invalid_components.append(component_name)
 
+    # all the types that use a missing type, directly or not, are invalid
+    def update_invalid_components(self):
+        invalid_types = self.type_graph.transitive_dependents_of(self.type_infos_missing)
+        self.invalid_components.clear()
+        for type_name in self.type_infos:
+            if type_name in invalid_types and type_name not in self.custom_type_names:
+                self.add_invalid_component(self.type_infos[type_name]["short_name"])
+
 
     ###########
         
@@ -334,18 +592,12 @@ class ComponentsRegistry(PropertyGroup):
     
     short_names_to_propgroup_names = {}
 
-    # generate propGroup name from nesting level & shortName: each shortName + nesting is unique
-    def generate_propGroup_name(self, nesting, shortName):
-        #print("gen propGroup name for", shortName, nesting)
-        #if shortName in self.short_names_to_propgroup_names and len(nesting) == 0:
-        #    return self.get_propertyGroupName_from_shortName(shortName)
-        
-        self.propGroupIdCounter += 1
-
-        propGroupIndex = str(self.propGroupIdCounter)
-        propGroupName = propGroupIndex + "_ui"
-        key = str(nesting) + shortName if len(nesting) > 0 else shortName
-        self.short_names_to_propgroup_names[key] = propGroupName
+    # generate propGroup name from the type key: there is a single propGroup per type, so the name is stable across reloads & sessions
+    # shortName is only given for actual registry types, that can be looked up by short name (not for enum variants etc)
+    def generate_propGroup_name(self, type_key, shortName=None):
+        propGroupName = hashlib.sha1(type_key.encode("utf-8")).hexdigest()[:12] + "_ui"
+        if shortName is not None:
+            self.short_names_to_propgroup_names[shortName] = propGroupName
         return propGroupName
 
     def get_propertyGroupName_from_shortName(self, shortName):
@@ -0,0 +1,29 @@
+from .type_graph import get_type_references
+
+# turns the user provided list of long name prefixes ("bevy_render::, my_game::") into a list
+def parse_type_filters(filters):
+    return [prefix.strip() for prefix in filters.replace("\n", ",").split(",") if prefix.strip() != ""]
+
+# only keeps the types matching the include/exclude long name prefixes, + all the types they use (directly or not), even if excluded
+# no include prefixes means all types are included
+def filter_type_infos(type_infos, include_prefixes, exclude_prefixes):
+    if len(include_prefixes) == 0 and len(exclude_prefixes) == 0:
+        return type_infos
+    include_prefixes = tuple(include_prefixes)
+    exclude_prefixes = tuple(exclude_prefixes)
+
+    kept_types = set()
+    to_visit = []
+    for type_name in type_infos:
+        included = len(include_prefixes) == 0 or type_name.startswith(include_prefixes)
+        if included and not type_name.startswith(exclude_prefixes):
+            to_visit.append(type_name)
+    while len(to_visit) > 0:
+        type_name = to_visit.pop()
+        if type_name in kept_types or type_name not in type_infos:
+            continue
+        kept_types.add(type_name)
+        to_visit.extend(get_type_references(type_infos[type_name]))
+
+    # we keep the original order of the types
+    return {type_name: definition for (type_name, definition) in type_infos.items() if type_name in kept_types}
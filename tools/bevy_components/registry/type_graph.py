@@ -0,0 +1,70 @@
+from .type_refs import TypeRef
+
+# returns the long names of all the types referenced ("$ref") by the given definition, at any depth (fields, tupple items, list items, enum variants...)
+def get_type_references(definition):
+    references = set()
+    to_visit = [definition]
+    while len(to_visit) > 0:
+        current = to_visit.pop()
+        if type(current) is TypeRef:
+            references.add(current.type_name)
+        elif isinstance(current, dict):
+            for (key, value) in current.items():
+                if key == "$ref" and isinstance(value, str):
+                    references.add(value.replace("#/$defs/", ""))
+                else:
+                    to_visit.append(value)
+        elif isinstance(current, list):
+            to_visit.extend(current)
+    return references
+
+# index of the references between types (by long name), built once when the registry is loaded
+# - dependencies: the types a type refers to (its fields, tupple items, list items, enum variants...)
+# - dependents: the types referring to a type (ie all the components embedding a given struct)
+# referenced types that are missing from the registry are included as well
+class TypeGraph():
+    def __init__(self):
+        self.dependencies = {}
+        self.dependents = {}
+
+    def clear(self):
+        self.dependencies.clear()
+        self.dependents.clear()
+
+    def build(self, type_infos):
+        self.clear()
+        for type_name in type_infos:
+            self.add_type(type_name, type_infos[type_name])
+
+    def add_type(self, type_name, definition):
+        self.remove_type(type_name)
+        references = get_type_references(definition)
+        self.dependencies[type_name] = references
+        for reference in references:
+            self.dependents.setdefault(reference, set()).add(type_name)
+
+    def remove_type(self, type_name):
+        for reference in self.dependencies.pop(type_name, []):
+            dependents = self.dependents.get(reference, None)
+            if dependents is not None:
+                dependents.discard(type_name)
+                if len(dependents) == 0:
+                    del self.dependents[reference]
+
+    # the returned sets are the graph's own: do not modify them
+    def dependencies_of(self, type_name):
+        return self.dependencies.get(type_name, frozenset())
+
+    def dependents_of(self, type_name):
+        return self.dependents.get(type_name, frozenset())
+
+    # all the types that depend on any of the given types, directly or not
+    def transitive_dependents_of(self, type_names):
+        result = set()
+        to_visit = list(type_names)
+        while len(to_visit) > 0:
+            for dependent in self.dependents_of(to_visit.pop()):
+                if dependent not in result:
+                    result.add(dependent)
+                    to_visit.append(dependent)
+        return result
@@ -0,0 +1,37 @@
+# stands in for the definition of the types that are referenced but missing from the registry
+class MissingType():
+    def __repr__(self):
+        return "MISSING_TYPE"
+
+MISSING_TYPE = MissingType()
+
+# a {"$ref": "#/$defs/long_name"} of the schema, with its target resolved once when loading the registry:
+# - type_name: the long name of the referenced type
+# - definition: its definition (in type_infos) or MISSING_TYPE
+# it is still the same dict for everything else (json, comparisons), & gets cached as a plain dict, see resolve_type_refs
+class TypeRef(dict):
+    __slots__ = ("type_name", "definition")
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+# replaces all the {"$ref": ...} of the given definitions (all the type infos by default) by TypeRefs pointing into type_infos
+# existing TypeRefs are pointed to the current type_infos again
+def resolve_type_refs(type_infos, definitions=None):
+    to_visit = list(type_infos.values() if definitions is None else definitions)
+    while len(to_visit) > 0:
+        current = to_visit.pop()
+        for (key, value) in (current.items() if isinstance(current, dict) else enumerate(current)):
+            if isinstance(value, dict):
+                ref = value.get("$ref", None)
+                if isinstance(ref, str):
+                    if type(value) is not TypeRef:
+                        value = TypeRef(value)
+                        current[key] = value # same key: fine while iterating
+                    value.type_name = ref.replace("#/$defs/", "")
+                    value.definition = type_infos.get(value.type_name, MISSING_TYPE)
+                else:
+                    to_visit.append(value)
+            elif isinstance(value, list):
+                to_visit.append(value)
+    return type_infos
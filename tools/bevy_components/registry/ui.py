@@ -45,6 +45,33 @@ class BEVY_COMPONENTS_PT_Configuration(bpy.types.Panel):
         row.prop(registry, "watcher_enabled", text="enable registry file polling")
         row.prop(registry, "watcher_poll_frequency", text="registry file poll frequency (s)")
 
+        row = layout.row()
+        row.prop(registry, "cache_enabled", text="cache processed registry on disk")
+        row = layout.row()
+        row.prop(registry, "incremental_reload", text="only regenerate changed types on reload")
+        row = layout.row()
+        row.prop(registry, "deferred_custom_properties", text="only write custom properties on export/save")
+
+        row = layout.row()
+        row.prop(registry, "type_filters_include", text="include types")
+        row = layout.row()
+        row.prop(registry, "type_filters_exclude", text="exclude types")
+
+        if registry.has_type_infos():
+            row = layout.row()
+            row.label(text="propertyGroups generated for {} / {} types".format(registry.materialized_types_count(), len(registry.propertyGroups_plan)))
+            row = layout.row()
+            row.label(text="registered propertyGroup classes: {}".format(registry.live_propertyGroups_count()))
+            row = layout.row()
+            row.label(text=registry.parsed_values_cache.format_stats())
+
+        profiler = registry.load_profiler
+        if len(profiler.phases) > 0:
+            box = layout.box()
+            box.label(text="last registry load: {:.2f} ms".format(profiler.total_duration() * 1000))
+            for name in profiler.phases:
+                box.label(text=profiler.format_phase(name))
+
         layout.separator()
         layout.separator()
 
@@ -121,37 +148,15 @@ class BEVY_COMPONENTS_PT_AdvancedToolsPanel(bpy.types.Panel):
         box.label(text="Invalid/ unregistered components")
 
         objects_with_invalid_components = []
-        invalid_component_names = []
 
         self.draw_invalid_or_unregistered_header(layout, ["Component", "Object", "Status", "Target"])
 
-        for object in bpy.data.objects: # TODO: very inneficent
-            if len(object.keys()) > 0:
-                if "components_meta" in object:
-                    components_metadata = object.components_meta.components
-                    comp_names = []
-                    for index, component_meta in enumerate(components_metadata):
-                        short_name = component_meta.name
-                        if component_meta.invalid:
-                            self.draw_invalid_or_unregistered(layout, "Invalid", short_name, object)
-                        
-                            if not object.name in objects_with_invalid_components:
-                                objects_with_invalid_components.append(object.name)
-                            
-                            if not short_name in invalid_component_names:
-                                invalid_component_names.append(short_name)
-
-
-                        comp_names.append(short_name) 
-
-                    for custom_property in object.keys():
-                        if custom_property != 'components_meta' and custom_property not in comp_names:
-                            self.draw_invalid_or_unregistered(layout, "Unregistered", custom_property, object)
-
-                            if not object.name in objects_with_invalid_components:
-                                objects_with_invalid_components.append(object.name)
-                            if not short_name in invalid_component_names:
-                                invalid_component_names.append(custom_property)
+        # only the objects with invalid components are visited, see ComponentUsageIndex
+        for (object_name, component_name, status) in registry.component_usage_index.get_invalid_components():
+            object = bpy.data.objects[object_name]
+            self.draw_invalid_or_unregistered(layout, status, component_name, object)
+            if not object_name in objects_with_invalid_components:
+                objects_with_invalid_components.append(object_name)
         layout.separator()
         layout.separator()
         original_name = bpy.context.window_manager.bevy_component_rename_helper.original_name
@@ -196,6 +201,14 @@ class BEVY_COMPONENTS_PT_AdvancedToolsPanel(bpy.types.Panel):
             if hasattr(layout,"progress") : # only for Blender > 4.0
                 col.progress(factor = remove_components_progress, text=f"updating {remove_components_progress * 100.0:.2f}%")
 
+        # let the user know if the original type is also used inside other types
+        original_long_name = registry.short_names_to_long_names.get(original_name, None)
+        if original_long_name is not None:
+            dependents = [registry.type_infos[type_name]["short_name"] for type_name in registry.type_graph.dependents_of(original_long_name) if type_name in registry.type_infos]
+            if len(dependents) > 0:
+                row = layout.row()
+                row.label(text="used in: " + ", ".join(sorted(dependents)))
+
         layout.separator()
         layout.separator()
         row = layout.row()
@@ -0,0 +1,132 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+
+# inotify constants, see <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+INOTIFY_POLL_INTERVAL = 0.1 # (s) reading pending inotify events is cheap, so we can check often
+SETTLE_POLL_INTERVAL = 0.1 # (s) how often to check a file that is being written to
+SETTLE_DELAY = 0.2 # (s) a file is considered completely written if its size & modification time did not change for that long
+
+def load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1 # make sure inotify is available
+        return libc
+    except Exception as error:
+        print("inotify not available, falling back to polling", error)
+        return None
+
+# watches a single file for changes
+# - uses inotify on linux: no polling of the file system, & we know when the writer closed the file
+# - falls back to polling os.stat everywhere else
+# in both cases, a change is only reported once the file is stable (not being written to anymore), see has_changed
+class SchemaWatcher():
+    def __init__(self):
+        self.path = None
+        self.inotify_fd = None
+        self.pending = False # the file was touched, but we do not know yet if it is done being written to
+        self.write_finished = False # inotify told us the writer closed the file
+        self.last_stat = None
+        self.last_stat_change = 0
+
+    def watch(self, path):
+        if path == self.path:
+            return
+        self.stop()
+        self.path = path
+        self.last_stat = self.stat()
+        libc = load_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            print("failed to initialize inotify, falling back to polling", os.strerror(ctypes.get_errno()))
+            return
+        # we watch the folder rather than the file: the file might get replaced (deleted + created / moved) rather than written to
+        folder = os.path.dirname(os.path.abspath(path)).encode(sys.getfilesystemencoding())
+        if libc.inotify_add_watch(fd, folder, IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            print("failed to watch", folder, "falling back to polling", os.strerror(ctypes.get_errno()))
+            os.close(fd)
+            return
+        self.inotify_fd = fd
+
+    def stop(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+        self.inotify_fd = None
+        self.path = None
+        self.pending = False
+        self.write_finished = False
+
+    def uses_inotify(self):
+        return self.inotify_fd is not None
+
+    def stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            return None
+
+    def read_events(self):
+        file_name = os.path.basename(self.path).encode(sys.getfilesystemencoding())
+        while True:
+            try:
+                data = os.read(self.inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                (_, mask, _, name_length) = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+                offset += INOTIFY_EVENT_HEADER.size
+                name = data[offset: offset + name_length].rstrip(b"\0")
+                offset += name_length
+                if name == file_name:
+                    self.pending = True
+                    if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        self.write_finished = True
+
+    # returns True once the watched file was modified AND is done being written to
+    def has_changed(self):
+        if self.path is None:
+            return False
+        if self.uses_inotify():
+            self.read_events()
+            if not self.pending:
+                return False
+
+        stat = self.stat()
+        now = time.monotonic()
+        if stat != self.last_stat:
+            self.last_stat = stat
+            self.last_stat_change = now
+            self.pending = True
+        if not self.pending or stat is None:
+            return False
+
+        if self.write_finished or now - self.last_stat_change >= SETTLE_DELAY:
+            self.pending = False
+            self.write_finished = False
+            return True
+        return False
+
+    # how long to wait before the next call to has_changed
+    def poll_interval(self, poll_frequency):
+        if self.pending:
+            return SETTLE_POLL_INTERVAL
+        return INOTIFY_POLL_INTERVAL if self.uses_inotify() else poll_frequency
+
+schema_watcher = SchemaWatcher()
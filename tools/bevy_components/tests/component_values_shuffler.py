@@ -3,6 +3,7 @@ import random
 import string
 import uuid
 from bpy_types import PropertyGroup
+from ..registry.type_refs import MISSING_TYPE
 
 def random_bool():
     return bool(random.getrandbits(1))
@@ -104,8 +105,8 @@ def component_values_shuffler(seed=1, property_group=None, definition=None, regi
 
     elif type_info == "Struct":
         for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["properties"][field_name]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
+            item_definition = definition["properties"][field_name]["type"].definition
+            item_definition = item_definition if item_definition is not MISSING_TYPE else None
 
             value = getattr(property_group, field_name)
             is_property_group = isinstance(value, PropertyGroup)
@@ -123,8 +124,8 @@ def component_values_shuffler(seed=1, property_group=None, definition=None, regi
         #print("tup")
 
         for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["prefixItems"][index]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
+            item_definition = definition["prefixItems"][index]["type"].definition
+            item_definition = item_definition if item_definition is not MISSING_TYPE else None
 
             value = getattr(property_group, field_name)
             is_property_group = isinstance(value, PropertyGroup)
@@ -142,8 +143,8 @@ def component_values_shuffler(seed=1, property_group=None, definition=None, regi
     elif type_info == "TupleStruct":
         #print("tupstruct")
         for index, field_name in enumerate(property_group.field_names):
-            item_type_name = definition["prefixItems"][index]["type"]["$ref"].replace("#/$defs/", "")
-            item_definition = registry.type_infos[item_type_name] if item_type_name in registry.type_infos else None
+            item_definition = definition["prefixItems"][index]["type"].definition
+            item_definition = item_definition if item_definition is not MISSING_TYPE else None
 
             value = getattr(property_group, field_name)
             is_property_group = isinstance(value, PropertyGroup)
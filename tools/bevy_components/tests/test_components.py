@@ -1,8 +1,16 @@
+import json
+import os
+import tempfile
 import bpy
 import pprint
 
 from ..propGroups.conversions_to_prop_group import property_group_value_from_custom_property_value
 from ..propGroups.conversions_from_prop_group import property_group_value_to_custom_property_value
+from ..components import metadata
+from ..components.metadata import (apply_customProperty_values_to_objects_propertyGroups, apply_customProperty_values_to_objects_propertyGroups_for_component, apply_propertyGroup_values_to_objects_customProperties, ensure_metadata_for_all_objects, find_component_metadata_index, get_component_metadata_by_short_name, remove_component_from_object, write_dirty_components)
+from ..propGroups import prop_groups
+from ..jobs import ComponentsJob
+from .. import post_undo
 from .component_values_shuffler import component_values_shuffler
 from .expected_component_values import (expected_custom_property_values, expected_custom_property_values_randomized)
 
@@ -166,6 +174,395 @@ def test_components_should_generate_correct_propertyGroup_values_from_custom_pro
     assert len(added_components) == 159
 
 
+def test_components_should_escape_string_values(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    short_name = "BasicTest"
+    component_type = registry.short_names_to_long_names[short_name]
+    definition = registry.type_infos[component_type]
+    bpy.ops.object.add_bevy_component(component_type=component_type)
+
+    object = bpy.context.object
+    property_group_name = registry.get_propertyGroupName_from_shortName(short_name)
+    component_meta = next(filter(lambda component: component["name"] == short_name, object.components_meta.components), None)
+    propertyGroup = getattr(component_meta, property_group_name, None)
+
+    # quotes, braces & booleans inside strings used to be mangled by the post processing of the generated value
+    text = 'it\'s a "quoted" {True, False,)} C:\\path'
+    setattr(propertyGroup, "c", text)
+    custom_property_value = object[short_name]
+    assert custom_property_value == '(a: 0.0, b: 0, c: "it\'s a \\"quoted\\" {True, False,)} C:\\\\path")'
+
+    # and it should get back the exact same text
+    setattr(propertyGroup, "c", "")
+    property_group_value_from_custom_property_value(propertyGroup, definition, registry, custom_property_value, nesting = [])
+    assert propertyGroup.c == text
+    assert property_group_value_to_custom_property_value(propertyGroup, definition, registry, None) == custom_property_value
+
+def test_components_batch_conversion(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    objects = []
+    for index in range(10):
+        bpy.ops.mesh.primitive_cube_add()
+        object = bpy.context.selected_objects[0]
+        object.name = "BatchCube" + str(index)
+        object["BasicTest"] = '(a: ' + str(float(index)) + ', b: ' + str(index) + ', c: "cube ' + str(index) + '")'
+        object["CameraTrackingOffset"] = '(Vec3(x:' + str(float(index)) + ', y:1.0, z:2.0))'
+        objects.append(object)
+    ensure_metadata_for_all_objects()
+
+    # custom properties => propertyGroups, for all objects & components at once
+    errors = apply_customProperty_values_to_objects_propertyGroups(objects)
+    assert len(errors) == 0
+    for index, object in enumerate(objects):
+        basic_test = getattr(get_component_metadata_by_short_name(object, "BasicTest"), registry.get_propertyGroupName_from_shortName("BasicTest"))
+        assert basic_test.b == index
+        assert basic_test.c == "cube " + str(index)
+
+        basic_test.b = index * 2 # the custom property gets updated as usual
+        object["BasicTest"] = ""
+        object["CameraTrackingOffset"] = ""
+
+    # & back
+    apply_propertyGroup_values_to_objects_customProperties(objects)
+    for index, object in enumerate(objects):
+        assert object["BasicTest"] == '(a: ' + str(float(index)) + ', b: ' + str(index * 2) + ', c: "cube ' + str(index) + '")'
+        assert object["CameraTrackingOffset"] == '(Vec3(x:' + str(float(index)) + ', y:1.0, z:2.0))'
+
+    # invalid values are reported, per object, without stopping the others
+    objects[3]["BasicTest"] = "(a: 1.0"
+    errors = apply_customProperty_values_to_objects_propertyGroups(objects)
+    assert len(errors) == 1 and "BatchCube3" in errors[0]
+    assert registry.disable_all_object_updates == False
+
+def test_components_deferred_custom_properties(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    short_name = "BasicTest"
+    component_type = registry.short_names_to_long_names[short_name]
+    bpy.ops.object.add_bevy_component(component_type=component_type)
+    object = bpy.context.object
+    component_meta = get_component_metadata_by_short_name(object, short_name)
+    propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName(short_name))
+    initial_value = object[short_name]
+
+    registry.deferred_custom_properties = True
+    try:
+        # edits only flag the component
+        setattr(propertyGroup, "a", 12.5)
+        setattr(propertyGroup, "c", "deferred")
+        assert object[short_name] == initial_value
+        assert component_meta.values_dirty == True
+        assert metadata.dirty_component_objects == {object.name}
+
+        # the custom property is written once, when needed
+        assert write_dirty_components() == 1
+        assert object[short_name] == '(a: 12.5, b: 0, c: "deferred")'
+        assert component_meta.values_dirty == False
+        assert write_dirty_components() == 0
+        assert metadata.dirty_component_objects == set()
+
+        # undo can restore the components as dirty: they are found again among the edited objects
+        component_meta.values_dirty = True
+        post_undo(bpy.context.scene)
+        assert metadata.dirty_component_objects == {object.name}
+        assert write_dirty_components() == 1
+
+        # reading the custom properties back uses them as they are (ie edited by hand), the pending edits are dropped
+        setattr(propertyGroup, "b", 3)
+        object[short_name] = '(a: 1.5, b: 9, c: "by hand")'
+        bpy.ops.object.refresh_ui_from_custom_properties_current()
+        assert propertyGroup.b == 9
+        assert component_meta.values_dirty == False
+        assert object[short_name] == '(a: 1.5, b: 9, c: "by hand")'
+    finally:
+        registry.deferred_custom_properties = False
+
+    # and back in immediate mode, every change is written right away
+    setattr(propertyGroup, "b", 4)
+    assert object[short_name] == '(a: 1.5, b: 4, c: "by hand")'
+
+def test_components_coalesced_updates(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    short_name = "BasicTest"
+    component_type = registry.short_names_to_long_names[short_name]
+    bpy.ops.object.add_bevy_component(component_type=component_type)
+    object = bpy.context.object
+    component_meta = get_component_metadata_by_short_name(object, short_name)
+    propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName(short_name))
+    initial_value = object[short_name]
+
+    prop_groups.coalesced_updates_delay = 10.0
+    try:
+        # ie dragging a slider
+        for index in range(20):
+            setattr(propertyGroup, "a", float(index))
+        setattr(propertyGroup, "b", 7)
+        assert object[short_name] == initial_value
+        assert prop_groups.pending_update_objects == {object.name}
+
+        # nothing is written as long as the changes keep coming in
+        assert prop_groups.flush_pending_updates() > 0
+        assert object[short_name] == initial_value
+
+        prop_groups.flush_pending_updates(force=True)
+        assert len(prop_groups.pending_update_objects) == 0
+        assert component_meta.values_dirty == False
+    finally:
+        prop_groups.coalesced_updates_delay = 0.0
+
+    # same value as without coalescing
+    coalesced_value = object[short_name]
+    setattr(propertyGroup, "b", 0)
+    setattr(propertyGroup, "b", 7)
+    assert object[short_name] == coalesced_value == '(a: 19.0, b: 7, c: " ")'
+
+def test_components_metadata_index(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    object = bpy.context.object
+    short_names = ["BasicTest", "CameraTrackingOffset", "EnumComplex", "TupleTestStr"]
+    for short_name in short_names:
+        bpy.ops.object.add_bevy_component(component_type=registry.short_names_to_long_names[short_name])
+    for (index, short_name) in enumerate(short_names):
+        assert find_component_metadata_index(object, short_name) == index
+        assert get_component_metadata_by_short_name(object, short_name).name == short_name
+    assert find_component_metadata_index(object, "NotAComponent") == None
+
+    # kept up to date when removing components
+    remove_component_from_object(object, "CameraTrackingOffset")
+    assert find_component_metadata_index(object, "CameraTrackingOffset") == None
+    assert find_component_metadata_index(object, "TupleTestStr") == 2
+
+    # & rebuilt when the metadata changes behind its back (ie undo)
+    object.components_meta.components.remove(0)
+    assert find_component_metadata_index(object, "EnumComplex") == 0
+    object.components_meta.components[0].name = "TupleTestStr"
+    object.components_meta.components[1].name = "EnumComplex"
+    assert find_component_metadata_index(object, "EnumComplex") == 1
+
+    # same length, different names (ie undoing a rename): only the undo/redo handler knows about it
+    assert find_component_metadata_index(object, "BasicTest") == None
+    object.components_meta.components[0].name = "BasicTest"
+    post_undo(bpy.context.scene)
+    assert find_component_metadata_index(object, "BasicTest") == 0
+
+def test_components_ensure_metadata_incrementally(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    objects = []
+    for index in range(5):
+        bpy.ops.mesh.primitive_cube_add()
+        object = bpy.context.selected_objects[0]
+        object.name = "MetadataCube" + str(index)
+        object["BasicTest"] = '(a: 1.0, b: ' + str(index) + ', c: "cube")'
+        objects.append(object)
+
+    # only the objects that changed since the last check get checked again
+    assert ensure_metadata_for_all_objects() == 5
+    assert get_component_metadata_by_short_name(objects[0], "BasicTest") != None
+    assert ensure_metadata_for_all_objects() == 0
+    objects[2]["CameraTrackingOffset"] = '(Vec3(x:0.0, y:1.0, z:2.0))'
+    assert ensure_metadata_for_all_objects() == 1
+    assert get_component_metadata_by_short_name(objects[2], "CameraTrackingOffset") != None
+
+    # in the background, a slice at a time
+    for object in objects:
+        object.components_meta.metadata_stamp = ""
+    job = metadata.start_ensure_metadata_job(slice_duration=0.0)
+    progresses = []
+    while metadata.run_ensure_metadata_job() is not None:
+        progresses.append(bpy.context.window_manager.components_metadata_progress)
+    assert len(progresses) > 0 and all(0.0 < progress < 1.0 for progress in progresses)
+    assert bpy.context.window_manager.components_metadata_progress == -1.0
+    assert job.is_done() and job.checked == 5
+    assert metadata.ensure_metadata_job == None
+
+def test_components_ensure_metadata_dependency_first(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    with open(os.path.join(os.path.dirname(bpy.data.filepath), setup_data["schema_path"])) as schema_file:
+        schema = json.load(schema_file)
+    # a component that is also used by another component
+    inner = "bevy_example::test_components::DependencyInner"
+    outer = "bevy_example::test_components::DependencyOuter"
+    schema["$defs"][inner] = {**schema["$defs"]["bevy_example::test_components::BasicTest"], "short_name": "DependencyInner", "title": inner}
+    schema["$defs"][outer] = {**schema["$defs"]["bevy_example::test_components::BasicTest"], "short_name": "DependencyOuter", "title": outer,
+        "properties": {"inner": {"type": {"$ref": "#/$defs/" + inner}}}, "required": ["inner"]}
+    schema_path = os.path.join(tempfile.mkdtemp(), "registry.json")
+    with open(schema_path, "w") as schema_file:
+        json.dump(schema, schema_file)
+    registry.schemaPath = schema_path
+    bpy.ops.object.reload_registry()
+
+    bpy.ops.mesh.primitive_cube_add()
+    object = bpy.context.selected_objects[0]
+    object["DependencyOuter"] = '(inner: (a: 1.0, b: 2, c: "outer"))'
+    object["DependencyInner"] = '(a: 3.0, b: 4, c: "inner")'
+    ensure_metadata_for_all_objects()
+
+    # reopening the file: the metadata is up to date, but the propertyGroups have to be generated again,
+    # the inner one first as a dependency of the outer one
+    incremental_reload = registry.incremental_reload
+    registry.incremental_reload = False
+    try:
+        bpy.ops.object.reload_registry()
+    finally:
+        registry.incremental_reload = incremental_reload
+    assert ensure_metadata_for_all_objects() == 0
+    component_meta = get_component_metadata_by_short_name(object, "DependencyInner")
+    assert getattr(component_meta, registry.get_propertyGroupName_from_shortName("DependencyInner"), None) != None
+    bpy.ops.object.refresh_ui_from_custom_properties_current()
+    assert object["DependencyInner"] == '(a: 3.0, b: 4, c: "inner")'
+    assert component_meta.invalid == False
+
+def test_components_string_escapes_round_trip(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    short_name = "BasicTest"
+    bpy.ops.object.add_bevy_component(component_type=registry.short_names_to_long_names[short_name])
+    object = bpy.context.object
+    value = '(a: 0.0, b: 0, c: "line\\none\\ttab \\"quoted\\" C:\\\\path")'
+    object[short_name] = value
+    bpy.ops.object.refresh_ui_from_custom_properties_current()
+    propertyGroup = getattr(get_component_metadata_by_short_name(object, short_name), registry.get_propertyGroupName_from_shortName(short_name))
+    assert propertyGroup.c == 'line\none\ttab "quoted" C:\\path'
+    assert property_group_value_to_custom_property_value(propertyGroup, registry.type_infos[registry.short_names_to_long_names[short_name]], registry, None) == value
+
+def test_components_job(setup_data):
+    processed = []
+    def process_item(item):
+        processed.append(item)
+        return ["error " + str(item)] if item % 4 == 0 else []
+
+    # a bit of work at a time
+    job = ComponentsJob(range(10), process_item)
+    assert job.run_chunk(0.0) == False
+    assert processed == [0] and job.progress() == 0.1
+    job.run_all()
+    assert job.is_done() and processed == list(range(10))
+    assert job.errors == ["error 0", "error 4", "error 8"]
+    assert job.format_errors(max_errors=2) == "['error 0', 'error 4'] (and 1 more)"
+
+    # the exceptions are reported as errors, without stopping the job
+    def failing_process_item(item):
+        if item == 1:
+            raise ValueError("failed " + str(item))
+        return []
+    job = ComponentsJob(range(3), failing_process_item)
+    job.run_all()
+    assert job.position == 3 and job.errors == ["failed 1"]
+
+    # cancelled jobs stop right away
+    job = ComponentsJob(range(10), process_item)
+    job.run_chunk(0.0)
+    job.cancel()
+    assert job.is_done() and job.position == 1
+
+def test_components_usage_index(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+    usage_index = registry.component_usage_index
+
+    objects = []
+    for index in range(3):
+        bpy.ops.mesh.primitive_cube_add()
+        object = bpy.context.selected_objects[0]
+        object.name = "UsageCube" + str(index)
+        objects.append(object)
+    bpy.ops.object.add_bevy_component(component_type=registry.short_names_to_long_names["BasicTest"])
+    objects[0]["BasicTest"] = "(a: 1.0, b: 2, c: \"\")"
+    ensure_metadata_for_all_objects()
+    assert "UsageCube0" in usage_index.get_objects_with_component("BasicTest")
+    assert "UsageCube2" in usage_index.get_objects_with_component("BasicTest")
+    assert "UsageCube1" not in usage_index.get_objects_with_component("BasicTest")
+
+    # changes made outside of the add-on are picked up once the object is marked (ie by a depsgraph update)
+    objects[0]["NotAComponent"] = 1.0
+    usage_index.mark_object(objects[0])
+    assert ("UsageCube0", "NotAComponent", "Unregistered") in usage_index.get_invalid_components()
+    get_component_metadata_by_short_name(objects[0], "BasicTest").invalid = True
+    usage_index.mark_object(objects[0])
+    assert ("UsageCube0", "BasicTest", "Invalid") in usage_index.get_invalid_components()
+
+    remove_component_from_object(objects[2], "BasicTest")
+    assert "UsageCube2" not in usage_index.get_objects_with_component("BasicTest")
+
+    # removing a component from all objects only visits the objects that have it
+    bpy.ops.object.remove_bevy_component_all(component_name="BasicTest")
+    assert usage_index.get_objects_with_component("BasicTest") == []
+    assert "BasicTest" not in objects[0]
+
+    # components added from python (no depsgraph update, same amount of objects) are removed too
+    objects[1]["BasicTest"] = "(a: 1.0, b: 2, c: \"\")"
+    assert "UsageCube1" not in usage_index.get_objects_with_component("BasicTest")
+    bpy.ops.object.remove_bevy_component_all(component_name="BasicTest")
+    assert "BasicTest" not in objects[1]
+
+def test_components_batch_conversion_identical_values(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    values = {
+        "EnumComplex": ['StructLike(a: 0.5, b: 61, c: "instance")', 'Float(2.0)'],
+        "VecOfVec3s2": ['([(Vec3(x:1.0, y:2.0, z:3.0))])', '([])'],
+    }
+    objects = []
+    for index in range(10):
+        bpy.ops.mesh.primitive_cube_add()
+        object = bpy.context.selected_objects[0]
+        object.name = "InstanceCube" + str(index)
+        # most objects share the same values, ie instances of the same blueprint
+        for (short_name, component_values) in values.items():
+            object[short_name] = component_values[0] if index < 8 else component_values[1]
+        objects.append(object)
+    ensure_metadata_for_all_objects()
+    # the propertyGroups start from different values
+    objects[1]["VecOfVec3s2"] = '([(Vec3(x:5.0, y:5.0, z:5.0)), (Vec3(x:6.0, y:6.0, z:6.0))])'
+    apply_customProperty_values_to_objects_propertyGroups([objects[1]])
+    objects[1]["VecOfVec3s2"] = values["VecOfVec3s2"][0]
+
+    stats = {"conversions": 0, "copies": 0}
+    errors = []
+    for short_name in values:
+        errors.extend(apply_customProperty_values_to_objects_propertyGroups_for_component(objects, short_name, None, stats))
+    assert errors == []
+    assert stats == {"conversions": 4, "copies": 16}
+
+    # every object ends up with its own value
+    for object in objects:
+        for short_name in values:
+            definition = registry.type_infos[registry.short_names_to_long_names[short_name]]
+            component_meta = get_component_metadata_by_short_name(object, short_name)
+            propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName(short_name))
+            assert property_group_value_to_custom_property_value(propertyGroup, definition, registry, None) == object[short_name]
+
+    # an object with a broken value is reported by name, the others are still done
+    objects[0]["VecOfVec3s2"] = "([(Vec3(x:1.0"
+    objects[1]["VecOfVec3s2"] = values["VecOfVec3s2"][1]
+    errors = apply_customProperty_values_to_objects_propertyGroups_for_component(objects[0:2], "VecOfVec3s2")
+    assert len(errors) == 1 and "object: 'InstanceCube0', component: 'VecOfVec3s2'" in errors[0]
+    component_meta = get_component_metadata_by_short_name(objects[1], "VecOfVec3s2")
+    propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName("VecOfVec3s2"))
+    assert property_group_value_to_custom_property_value(propertyGroup, registry.type_infos[registry.short_names_to_long_names["VecOfVec3s2"]], registry, None) == "([])"
+
 def test_remove_components(setup_data):
     registry = bpy.context.window_manager.components_registry
     registry.schemaPath = setup_data["schema_path"]
@@ -1,4 +1,6 @@
-from ..propGroups.conversions_to_prop_group import parse_struct_string, parse_tuplestruct_string
+import pytest
+from .test_conversions_benchmark import parse_struct_string, parse_tuplestruct_string
+from ..propGroups.ron import RonStruct, RonTuple, RonList, RonString, RonParseError, parse_ron, quote_ron_string, ron_to_string
 
 
 def test_parse_tuplestruct_string():
@@ -48,4 +50,59 @@ def test_parse_struct_string():
     
     assert parse_struct_string("dimensions: UVec3(x:0.0, y:0.0, z:0.0), dynamic_resizing: true, z_config: (far_z_mode: MaxLightRange, first_slice_depth: 0.0)") == {'dimensions': 'UVec3(x:0.0, y:0.0, z:0.0)', 'dynamic_resizing': 'true', 'z_config': '(far_z_mode: MaxLightRange, first_slice_depth: 0.0)'}
 
-    assert parse_struct_string('(inverse_bindposes: Strong(""), joints: [4294967295, 4294967295, 4294967295])', start_nesting=1) == {'inverse_bindposes': 'Strong("")', 'joints': '[4294967295, 4294967295, 4294967295]'}
\ No newline at end of file
+    assert parse_struct_string('(inverse_bindposes: Strong(""), joints: [4294967295, 4294967295, 4294967295])', start_nesting=1) == {'inverse_bindposes': 'Strong("")', 'joints': '[4294967295, 4294967295, 4294967295]'}
+
+def test_parse_ron():
+    assert parse_ron("(A)") == ['A']
+    assert parse_ron("[(A)]") == [['A']]
+    assert isinstance(parse_ron("[(A)]"), RonList)
+    assert isinstance(parse_ron("[(A)]")[0], RonTuple)
+    assert parse_ron("()") == []
+    assert parse_ron("[]") == []
+
+    assert parse_ron("(a: 45, b:65)") == {'a': '45', 'b': '65'}
+    assert isinstance(parse_ron("(a: 45, b:65)"), RonStruct)
+    assert parse_ron("(x:-2.0, y:120.0, z:1.0,)") == {'x': '-2.0', 'y': '120.0', 'z': '1.0'}
+    assert parse_ron("(filters: (25), memberships: (5))") == {'filters': ['25'], 'memberships': ['5']}
+
+    # named structs & tuples (enum variants, glam types...)
+    vec = parse_ron("(Vec3(x:-2.0, y:120.0, z:1.0))")[0]
+    assert vec == {'x': '-2.0', 'y': '120.0', 'z': '1.0'}
+    assert vec.name == "Vec3"
+    variant = parse_ron("Capsule(Vec3(x:1.0, y:2.0, z:0.0), Vec3(x:0.0, y:0.0, z:0.0), 3.0)")
+    assert variant.name == "Capsule"
+    assert len(variant) == 3
+    assert variant[2] == "3.0"
+    assert parse_ron("Metal") == "Metal"
+
+    # strings are values, no matter what they contain
+    assert parse_ron('(7.2, 2607, "sdf")') == ['7.2', '2607', 'sdf']
+    assert isinstance(parse_ron('("sdf")')[0], RonString)
+    assert parse_ron('(name: "a, (b): [c]")') == {'name': 'a, (b): [c]'}
+    assert parse_ron('("say \\"hi\\"", "C:\\\\path\\other")') == ['say "hi"', 'C:\\path\\other']
+    assert parse_ron('""') == ""
+
+    # no recursion: no limit to the nesting depth
+    assert parse_ron("(" * 5000 + "1" + ")" * 5000) is not None
+
+    for invalid in ["", "(", "(a: 1", "(1 2)", "(1,,2)", "(a: 1, 2)", "[a: 1]", "(1))", '("a)', "1, 2"]:
+        with pytest.raises(RonParseError):
+            parse_ron(invalid)
+
+def test_ron_to_string():
+    for value in ['(a: 0.0, b: 0, c: " ")', 'Capsule(Vec3(x:1.0, y:2.0, z:0.0), 3.0)', '([(1.0, 2.0), (3.0, 4.0)])', '""', 'Metal']:
+        assert parse_ron(ron_to_string(parse_ron(value))) == parse_ron(value)
+
+def test_ron_string_escapes():
+    # the escape sequences Bevy writes are read back as the actual characters
+    assert parse_ron('"line\\none\\ttab\\r\\0"') == "line\none\ttab\r\0"
+    assert parse_ron('"\\u{e9}t\\u{1F600}"') == "\u00e9t\U0001F600"
+    assert parse_ron(r'"it\'s"') == "it's"
+
+    # & written the same way
+    for value in ["line\none\ttab", "C:\\path\\to", 'say "hi"', "\r\n\0\x01", "é", "", " "]:
+        quoted = quote_ron_string(value)
+        assert parse_ron(quoted) == value
+        assert "\n" not in quoted and "\t" not in quoted
+        assert ron_to_string(parse_ron(quoted)) == quoted
+    assert quote_ron_string("line\none\ttab") == '"line\\none\\ttab"'
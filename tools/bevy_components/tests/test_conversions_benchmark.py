@@ -0,0 +1,234 @@
+import json
+import os
+import tempfile
+import time
+import bpy
+import pytest
+from ..propGroups.conversions_to_prop_group import property_group_value_from_custom_property_value
+from ..propGroups.conversions_from_prop_group import property_group_value_to_custom_property_value
+from ..propGroups.ron import parse_ron
+from .component_values_shuffler import component_values_shuffler
+from .setup_data import setup_data
+
+# the previous way of getting at all the values of a custom property (replaced by ron.parse_ron), kept as the baseline of the benchmark:
+# split, then split each part again, etc
+def parse_struct_string(string, start_nesting=0):
+    #print("processing struct string", string, "start_nesting", start_nesting)
+    fields = {}
+    buff = []
+    current_fieldName = None
+    nesting_level = 0 
+
+    start_offset = 0
+    end_offset = 0
+
+    for index, char in enumerate(string):
+        buff.append(char)
+        if char == "," and nesting_level == start_nesting:
+            #print("first case", end_offset)
+            end_offset = index
+            end_offset = len(string) if end_offset == 0 else end_offset
+
+            val = "".join(string[start_offset:end_offset])
+            fields[current_fieldName] = val.strip()
+            start_offset = index + 1
+            #print("done with field name", current_fieldName, "value", fields[current_fieldName])
+
+        if char == "[" or char == "(":
+            nesting_level  += 1
+            if nesting_level == start_nesting:
+                start_offset = index + 1 
+                #print("nesting & setting start offset", start_offset)
+            #print("nesting down", nesting_level)
+
+        if char == "]" or char == ")" :
+            #print("nesting up", nesting_level)
+            if nesting_level == start_nesting:
+                end_offset = index
+                #print("unesting & setting end offset", end_offset)
+            nesting_level  -= 1
+
+
+        if char == ":" and nesting_level == start_nesting:
+            end_offset = index
+            fieldName = "".join(string[start_offset:end_offset])
+            current_fieldName = fieldName.strip()
+            start_offset = index + 1
+            end_offset = 0 #hack
+            #print("starting field name", fieldName, "index", index)
+            buff = []
+            
+    end_offset = len(string) if end_offset == 0 else end_offset
+    #print("final start and end offset", start_offset, end_offset, "total length", len(string))
+
+    val = "".join(string[start_offset:end_offset])
+
+    fields[current_fieldName] = val.strip()
+    #print("done with all fields", fields)
+    return fields
+
+def parse_tuplestruct_string(string, start_nesting=0):
+    #print("processing tuppleStruct", string, "start_nesting", start_nesting)
+    fields = []
+    buff = []
+    nesting_level = 0 
+    field_index = 0
+
+    start_offset = 0
+    end_offset = 0
+    # todo: strip all stuff before start_nesting
+
+    for index, char in enumerate(string):
+        buff.append(char)
+        if char == "," and nesting_level == start_nesting:
+            end_offset = index
+            end_offset = len(string) if end_offset == 0 else end_offset
+
+            val = "".join(string[start_offset:end_offset])
+            fields.append(val.strip())
+            field_index += 1
+            #print("start and end offset", start_offset, end_offset, "total length", len(string))
+            #print("done with field name", field_index, "value", fields)
+            start_offset = index + 1
+            end_offset = 0 # hack
+
+        if char == "[" or char == "(":
+            nesting_level  += 1
+            if nesting_level == start_nesting:
+                start_offset = index + 1 
+                #print("nesting & setting start offset", start_offset)
+            #print("nesting down", nesting_level)
+
+        if char == "]" or char == ")" :
+            if nesting_level == start_nesting:
+                end_offset = index
+                #print("unesting & setting end offset", end_offset)
+            #print("nesting up", nesting_level)
+            nesting_level  -= 1
+
+
+    end_offset = len(string) if end_offset == 0 else end_offset
+    #print("final start and end offset", start_offset, end_offset, "total length", len(string))
+
+    val = "".join(string[start_offset:end_offset]) #if end_offset != 0 else buff)
+    fields.append(val.strip())
+    fields = list(filter(lambda entry: entry != '', fields))
+    #print("done with all fields", fields)
+    return fields
+
+def parse_nested_with_string_splitting(value):
+    for item in parse_tuplestruct_string(value, start_nesting=1):
+        if item.startswith("("):
+            parse_nested_with_string_splitting(item)
+
+def parse_structs_list_with_string_splitting(value):
+    for item in parse_tuplestruct_string(value, start_nesting=1):
+        parse_struct_string(item, start_nesting=1)
+
+# the benchmarks only print their timings, & are only run on demand: they are slow, & timings vary with the machine & its load
+# BEVY_COMPONENTS_BENCHMARKS=1 pytest -svv -k benchmark --blender-executable <path_to_blender>
+benchmark = pytest.mark.skipif(os.environ.get("BEVY_COMPONENTS_BENCHMARKS", "") == "", reason="benchmarks are opt-in, set BEVY_COMPONENTS_BENCHMARKS to run them")
+
+def best_duration(function, value, runs=3):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(value)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+@benchmark
+def test_ron_parser_benchmark():
+    results = {}
+    for depth in [50, 200, 800]:
+        deep_value = "(" * depth + "1" + ")" * depth
+        results["deep_" + str(depth)] = (best_duration(parse_nested_with_string_splitting, deep_value), best_duration(parse_ron, deep_value))
+    for length in [100, 1000, 10000]:
+        long_value = "[" + ", ".join('(a: {}.5, b: {}, c: "text")'.format(index, index) for index in range(length)) + "]"
+        results["long_" + str(length)] = (best_duration(parse_structs_list_with_string_splitting, long_value), best_duration(parse_ron, long_value))
+
+    for (name, (string_splitting_duration, ron_parser_duration)) in results.items():
+        print("{}: string splitting {:.2f} ms, ron parser {:.2f} ms".format(name, string_splitting_duration * 1000, ron_parser_duration * 1000))
+    # string splitting is quadratic with the nesting depth, the parser is linear
+    (string_splitting_duration, ron_parser_duration) = results["deep_800"]
+    print("deep_800: ron parser {:.1f}x faster".format(string_splitting_duration / max(ron_parser_duration, 1e-9)))
+
+# the round trip benchmark writes the ops/s of every component to a json file (BEVY_COMPONENTS_BENCHMARK_RESULTS, defaults to the temp folder)
+# & compares them to the results of an earlier run if BEVY_COMPONENTS_BENCHMARK_BASELINE points to one: the regressions are only reported
+# (the baseline is a local file, from the same machine: timings from elsewhere are meaningless)
+benchmark_samples = 20 # random values per component
+benchmark_regression_ratio = 1.5 # slower than the baseline by more than this: reported
+
+@benchmark
+def test_round_trip_benchmark(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+    object = bpy.context.object
+
+    results = {} # long name => {"to_ron": ops/s, "from_ron": ops/s}
+    errors = []
+    for type_name in registry.type_infos:
+        definition = registry.type_infos[type_name]
+        if not definition.get("isComponent", False):
+            continue
+        short_name = definition["short_name"]
+        bpy.ops.object.add_bevy_component(component_type=type_name)
+        component_meta = next(filter(lambda component: component["name"] == short_name, object.components_meta.components), None)
+        propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName(short_name))
+
+        # the shuffler would otherwise trigger the update of the custom property for each field it changes
+        registry.disable_all_object_updates = True
+        try:
+            values = []
+            to_ron_duration = 0
+            for seed in range(benchmark_samples):
+                component_values_shuffler(seed=seed, property_group=propertyGroup, definition=definition, registry=registry)
+                start = time.perf_counter()
+                value = property_group_value_to_custom_property_value(propertyGroup, definition, registry, None)
+                to_ron_duration += time.perf_counter() - start
+                values.append(value)
+
+            from_ron_duration = 0
+            for value in values:
+                registry.parsed_values_cache.clear() # we want to measure the actual parsing
+                start = time.perf_counter()
+                property_group_value_from_custom_property_value(propertyGroup, definition, registry, value)
+                from_ron_duration += time.perf_counter() - start
+                # the round trip should not change anything
+                if property_group_value_to_custom_property_value(propertyGroup, definition, registry, None) != value:
+                    errors.append(short_name)
+        finally:
+            registry.disable_all_object_updates = False
+
+        results[type_name] = {
+            "to_ron": benchmark_samples / max(to_ron_duration, 1e-9),
+            "from_ron": benchmark_samples / max(from_ron_duration, 1e-9)
+        }
+        bpy.ops.object.remove_bevy_component(component_name=short_name)
+
+    print("round trip conversions, ops/s (property group => RON, RON => property group), slowest first:")
+    def round_trip_duration(type_name):
+        return 1 / results[type_name]["to_ron"] + 1 / results[type_name]["from_ron"]
+    for type_name in sorted(results, key=round_trip_duration, reverse=True)[:10]:
+        print("  {}: {:.0f}, {:.0f}".format(registry.type_infos[type_name]["short_name"], results[type_name]["to_ron"], results[type_name]["from_ron"]))
+
+    results_path = os.environ.get("BEVY_COMPONENTS_BENCHMARK_RESULTS", "") or os.path.join(tempfile.gettempdir(), "bevy_components_conversions_benchmark.json")
+    with open(results_path, "w") as results_file:
+        json.dump({"samples": benchmark_samples, "ops_per_second": results}, results_file, indent=2, sort_keys=True)
+    print("results written to", results_path)
+
+    baseline_path = os.environ.get("BEVY_COMPONENTS_BENCHMARK_BASELINE", "")
+    if baseline_path != "":
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)["ops_per_second"]
+        regressions = 0
+        for type_name in results:
+            for direction in ["to_ron", "from_ron"]:
+                if type_name in baseline and results[type_name][direction] * benchmark_regression_ratio < baseline[type_name][direction]:
+                    regressions += 1
+                    print("  slower than the baseline:", type_name, direction, "{:.0f} ops/s instead of {:.0f}".format(results[type_name][direction], baseline[type_name][direction]))
+        print(regressions, "regressions compared to", baseline_path)
+
+    assert len(errors) == 0
+    assert len(results) == 159
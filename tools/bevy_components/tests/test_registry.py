@@ -1,6 +1,28 @@
+import json
+import os
+import tempfile
+import time
 import bpy
+import pytest
+from ..registry.cache import compute_schema_hash
+from ..registry.registry import watch_schema
+from ..registry.type_refs import MISSING_TYPE, resolve_type_refs
+from ..registry.watcher import SchemaWatcher
+from ..components.metadata import get_component_metadata_by_short_name
+from ..propGroups.conversions_to_prop_group import property_group_value_from_custom_property_value
+from ..propGroups.parsed_values_cache import ParsedValuesCache
 from .setup_data import setup_data
 
+# the tests change the registry settings as they need: they get restored afterwards, even when a test fails
+@pytest.fixture(autouse=True)
+def registry_settings():
+    registry = bpy.context.window_manager.components_registry
+    cache_enabled = registry.cache_enabled
+    incremental_reload = registry.incremental_reload
+    yield
+    registry.cache_enabled = cache_enabled
+    registry.incremental_reload = incremental_reload
+
 def test_blend(setup_data):
     registry = bpy.context.window_manager.components_registry
     registry.schemaPath = setup_data["schema_path"]
@@ -20,4 +42,345 @@ def test_blend(setup_data):
     propertyGroup = getattr(component_meta, property_group_name, None)
 
 
-    assert propertyGroup.field_names == ['a', 'b', 'c']
\ No newline at end of file
+    assert propertyGroup.field_names == ['a', 'b', 'c']
+
+def test_registry_serialized_lazily(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    registry.incremental_reload = False
+    bpy.ops.object.reload_registry()
+
+    # the schema is parsed once, and the string version of the registry is only generated on demand (ie when saving)
+    assert registry.has_type_infos()
+    assert registry.registry_serialized == False
+    assert "read" in registry.load_profiler.phases
+    assert "parse" in registry.load_profiler.phases or "cache" in registry.load_profiler.phases
+
+    registry.serialize_registry()
+    assert registry.registry_serialized == True
+    assert json.loads(registry.registry) == registry.type_infos
+
+def test_registry_cache(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    registry.cache_enabled = True
+    registry.incremental_reload = False
+    bpy.ops.object.reload_registry()
+
+    short_names_to_long_names = dict(registry.short_names_to_long_names)
+    short_names_to_propgroup_names = dict(registry.short_names_to_propgroup_names)
+    type_infos_missing = list(registry.type_infos_missing)
+    schema_hash = registry.schema_hash
+
+    # the schema did not change: the second load is served from the cache, with the same results
+    bpy.ops.object.reload_registry()
+    assert registry.loaded_from_cache == True
+    assert "cache" in registry.load_profiler.phases
+    assert "parse" not in registry.load_profiler.phases
+    assert registry.schema_hash == schema_hash
+    assert registry.short_names_to_long_names == short_names_to_long_names
+    assert registry.short_names_to_propgroup_names == short_names_to_propgroup_names
+    assert registry.type_infos_missing == type_infos_missing
+
+    # and components still work as usual
+    short_name = "BasicTest"
+    add_component_operator = bpy.ops.object.add_bevy_component
+    add_component_operator(component_type=registry.short_names_to_long_names[short_name])
+    assert bpy.context.object[short_name] == '(a: 0.0, b: 0, c: " ")'
+
+def test_registry_incremental_reload(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    with open(os.path.join(os.path.dirname(bpy.data.filepath), setup_data["schema_path"])) as schema_file:
+        schema = json.load(schema_file)
+    schema_path = os.path.join(tempfile.mkdtemp(), "registry.json")
+    with open(schema_path, "w") as schema_file:
+        json.dump(schema, schema_file)
+
+    registry.schemaPath = schema_path
+    registry.incremental_reload = True
+    registry.cache_enabled = False
+    bpy.ops.object.reload_registry()
+
+    object = bpy.context.object
+    add_component_operator = bpy.ops.object.add_bevy_component
+    for short_name in ["BasicTest", "NestingTestLevel2", "TupleTestU64"]:
+        add_component_operator(component_type=registry.short_names_to_long_names[short_name])
+    object["BasicTest"] = '(a: 0.5, b: 12, c: "foo")'
+    bpy.ops.object.refresh_ui_from_custom_properties_current()
+
+    propertyGroup_classes = {short_name: registry.propertyGroup_classes[registry.short_names_to_long_names[short_name]] for short_name in ["BasicTest", "NestingTestLevel2", "TupleTestU64"]}
+    propertyGroup_name = registry.get_propertyGroupName_from_shortName("BasicTest")
+
+    # change the type of one of the fields of BasicTest: it, & the components using it, get regenerated, nothing else
+    basic_test = schema["$defs"]["bevy_example::test_components::BasicTest"]
+    basic_test["properties"]["b"] = {"type": {"$ref": "#/$defs/u32"}}
+    with open(schema_path, "w") as schema_file:
+        json.dump(schema, schema_file)
+    bpy.ops.object.reload_registry()
+
+    assert registry.propertyGroup_classes[registry.short_names_to_long_names["TupleTestU64"]] == propertyGroup_classes["TupleTestU64"]
+    assert registry.propertyGroup_classes[registry.short_names_to_long_names["BasicTest"]] != propertyGroup_classes["BasicTest"]
+    assert registry.propertyGroup_classes[registry.short_names_to_long_names["NestingTestLevel2"]] != propertyGroup_classes["NestingTestLevel2"]
+    # propertyGroup names only depend on the type
+    assert registry.get_propertyGroupName_from_shortName("BasicTest") == propertyGroup_name
+
+    # the values are kept
+    assert object["BasicTest"] == '(a: 0.5, b: 12, c: "foo")'
+    component_meta = next(filter(lambda component: component["name"] == "BasicTest", object.components_meta.components), None)
+    propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName("BasicTest"))
+    assert propertyGroup.b == 12
+    assert component_meta.invalid == False
+
+    # unchanged schema: nothing to do
+    propertyGroup_class = registry.propertyGroup_classes[registry.short_names_to_long_names["BasicTest"]]
+    bpy.ops.object.reload_registry()
+    assert registry.propertyGroup_classes[registry.short_names_to_long_names["BasicTest"]] == propertyGroup_class
+
+def wait_for(condition, timeout=5):
+    start = time.monotonic()
+    while not condition():
+        if time.monotonic() - start > timeout:
+            return False
+        time.sleep(0.05)
+    return True
+
+def test_registry_watcher(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    with open(os.path.join(os.path.dirname(bpy.data.filepath), setup_data["schema_path"]), "rb") as schema_file:
+        raw_schema = schema_file.read()
+    schema_path = os.path.join(tempfile.mkdtemp(), "registry.json")
+    with open(schema_path, "wb") as schema_file:
+        schema_file.write(raw_schema)
+    registry.schemaPath = schema_path
+    registry.cache_enabled = False
+    bpy.ops.object.reload_registry()
+
+    watcher = SchemaWatcher()
+    watcher.watch(registry.schemaFullPath)
+    assert watcher.has_changed() == False
+
+    # the file gets rewritten, the change is reported once the file is completely written, & only once
+    with open(schema_path, "wb") as schema_file:
+        schema_file.write(raw_schema)
+    assert wait_for(watcher.has_changed)
+    assert watcher.has_changed() == False
+    watcher.stop()
+
+    # a rewrite with the same content does not reload the registry, a rewrite with different content does
+    basic_test = "bevy_example::test_components::BasicTest"
+    propertyGroup_plan = registry.propertyGroups_plan[basic_test]
+    with open(schema_path, "wb") as schema_file:
+        schema_file.write(raw_schema)
+    time.sleep(0.5)
+    watch_schema()
+    assert registry.propertyGroups_plan[basic_test] is propertyGroup_plan
+
+    schema = json.loads(raw_schema)
+    schema["$defs"][basic_test]["properties"]["b"] = {"type": {"$ref": "#/$defs/u32"}}
+    changed_schema = json.dumps(schema).encode("utf-8")
+    with open(schema_path, "wb") as schema_file:
+        schema_file.write(changed_schema)
+    assert wait_for(lambda: watch_schema() is not None and registry.schema_hash == compute_schema_hash(changed_schema))
+    assert registry.propertyGroups_plan[basic_test] is not propertyGroup_plan
+
+def test_registry_type_graph(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    type_graph = registry.type_graph
+    basic_test = "bevy_example::test_components::BasicTest"
+    nesting_test_level_2 = "bevy_example::test_components::NestingTestLevel2"
+
+    assert type_graph.dependencies_of(basic_test) == {"f32", "u64", "alloc::string::String"}
+    assert basic_test in type_graph.dependencies_of(nesting_test_level_2)
+    # (the dependents also include the custom types we generate for enum variants)
+    assert {nesting_test_level_2, "bevy_example::test_components::EnumComplex"} <= type_graph.dependents_of(basic_test)
+    # NestedTupleStuff contains an EnumComplex, which contains a BasicTest
+    assert "bevy_example::test_components::NestedTupleStuff" in type_graph.transitive_dependents_of([basic_test])
+    assert "bevy_example::test_components::NestedTupleStuff" not in type_graph.dependents_of(basic_test)
+
+def test_registry_lazy_propertyGroups(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    with open(os.path.join(os.path.dirname(bpy.data.filepath), setup_data["schema_path"])) as schema_file:
+        schema = json.load(schema_file)
+    # a component that is not used by any object
+    lazy_test = "bevy_example::test_components::LazyTest"
+    schema["$defs"][lazy_test] = {**schema["$defs"]["bevy_example::test_components::BasicTest"], "short_name": "LazyTest", "title": lazy_test}
+    schema_path = os.path.join(tempfile.mkdtemp(), "registry.json")
+    with open(schema_path, "w") as schema_file:
+        json.dump(schema, schema_file)
+
+    registry.schemaPath = schema_path
+    registry.cache_enabled = False
+    bpy.ops.object.reload_registry()
+
+    # only the propertyGroups of components in use are generated
+    materialized_types_count = registry.materialized_types_count()
+    assert materialized_types_count < len(registry.propertyGroups_plan)
+    assert lazy_test not in registry.propertyGroup_classes
+
+    bpy.ops.object.add_bevy_component(component_type=lazy_test)
+    assert lazy_test in registry.propertyGroup_classes
+    assert registry.materialized_types_count() == materialized_types_count + 1
+    assert bpy.context.object["LazyTest"] == '(a: 0.0, b: 0, c: " ")'
+
+def test_registry_shared_propertyGroups(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    # BasicTest is used by NestingTestLevel2 & EnumComplex: all of them use the same propertyGroup class for it
+    basic_test = "bevy_example::test_components::BasicTest"
+    nesting_test_level_2 = "bevy_example::test_components::NestingTestLevel2"
+    assert registry.propertyGroups_plan[nesting_test_level_2]["annotations"]["basic"][1]["type"] == basic_test
+    registry.ensure_propertyGroups(nesting_test_level_2)
+    basic_test_class = registry.propertyGroup_classes[basic_test]
+    assert registry.ensure_propertyGroups(basic_test) == False
+    assert registry.propertyGroup_classes[basic_test] is basic_test_class
+
+    # updates in the shared propertyGroup go to the right component
+    object = bpy.context.object
+    bpy.ops.object.add_bevy_component(component_type=nesting_test_level_2)
+    component_meta = next(filter(lambda component: component["name"] == "NestingTestLevel2", object.components_meta.components), None)
+    propertyGroup = getattr(component_meta, registry.get_propertyGroupName_from_shortName("NestingTestLevel2"))
+    propertyGroup.basic.b = 42
+    assert "b: 42" in object["NestingTestLevel2"]
+
+def test_registry_reload_does_not_leak(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    registry.incremental_reload = False
+    bpy.ops.object.reload_registry()
+    live_propertyGroups_count = registry.live_propertyGroups_count()
+    assert live_propertyGroups_count == registry.materialized_types_count()
+
+    # full reloads tear down the previous propertyGroups before generating new ones
+    for _ in range(20):
+        bpy.ops.object.reload_registry()
+        assert registry.live_propertyGroups_count() == live_propertyGroups_count
+
+def test_registry_type_filters(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+    types_count = len(registry.type_infos)
+    schema_hash = registry.schema_hash
+
+    # only the included types are loaded, + the types they use
+    registry.type_filters_include = "bevy_example::test_components::NestingTestLevel2, bevy_example::test_components::TupleTest2"
+    registry.type_filters_exclude = "bevy_example::test_components::TupleTest2"
+    bpy.ops.object.reload_registry()
+    assert registry.schema_hash != schema_hash
+    assert "bevy_example::test_components::NestingTestLevel2" in registry.type_infos
+    assert "bevy_example::test_components::BasicTest" in registry.type_infos
+    assert "bevy_example::test_components::TupleTest2" not in registry.type_infos
+    assert "bevy_example::test_components::TupleTestU64" not in registry.type_infos
+    assert len(registry.type_infos) < types_count
+
+    registry.type_filters_include = ""
+    registry.type_filters_exclude = ""
+    bpy.ops.object.reload_registry()
+    assert registry.schema_hash == schema_hash
+    assert "bevy_example::test_components::TupleTestU64" in registry.type_infos
+
+def test_registry_load_profile(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    registry.cache_enabled = False
+    registry.incremental_reload = False
+    bpy.ops.object.reload_registry()
+
+    phases = registry.load_profiler.phases
+    assert list(phases.keys()) == ["clear", "read", "parse", "type_graph", "plan", "save_cache", "metadata"]
+    assert phases["parse"]["types"] == len(registry.type_infos) - len(registry.custom_type_names)
+    assert phases["plan"]["types"] == len(registry.propertyGroups_plan)
+    # the propertyGroups are generated for the components used by the objects
+    assert phases["metadata"]["classes"] == registry.live_propertyGroups_count()
+    assert phases["clear"]["classes"] <= 0
+
+    profile = json.loads(registry.load_profiler.to_json())
+    assert profile["total_duration"] == registry.load_profiler.total_duration()
+    assert profile["phases"]["read"]["duration"] >= 0
+
+def test_registry_conversion_plans(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    # compiled once per type, with the plans of the field types resolved
+    definition = registry.type_infos["bevy_example::test_components::NestingTestLevel2"]
+    plan = registry.get_conversion_plan(definition)
+    assert registry.get_conversion_plan(definition) is plan
+    assert plan.kind == "struct"
+    fields = {field_name: (field_plan, is_value) for (field_name, field_plan, is_value) in plan.fields}
+    assert list(fields.keys()) == list(definition["properties"].keys())
+    assert fields["basic"][0] is registry.conversion_plans["bevy_example::test_components::BasicTest"]
+    assert fields["basic"][1] == False
+    assert fields["text"][0].kind == "value" and fields["text"][1] == True
+
+    # enums with data get a table of their variants
+    enum_definition = registry.type_infos["bevy_example::test_components::EnumComplex"]
+    enum_plan = registry.get_conversion_plan(enum_definition)
+    assert list(enum_plan.variants.keys()) == [variant["title"] for variant in enum_definition["oneOf"]]
+    (index, variant_definition, field_name, variant_plan) = enum_plan.variants["StructLike"]
+    assert variant_definition is enum_definition["oneOf"][index]
+    assert field_name == "variant_StructLike" and variant_plan.kind == "struct"
+    assert enum_plan.variants["SomeThing"][3] == None # unit variant
+
+    # kept as long as the type does not change
+    bpy.ops.object.reload_registry()
+    assert registry.get_conversion_plan(registry.type_infos[definition["title"]]) is plan
+    # a full reload drops them all
+    registry.incremental_reload = False
+    bpy.ops.object.reload_registry()
+    assert registry.get_conversion_plan(registry.type_infos[definition["title"]]) is not plan
+
+def test_registry_type_refs(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+
+    # the "$ref"s point directly to the definitions they reference
+    basic_test = registry.type_infos["bevy_example::test_components::BasicTest"]
+    type_ref = basic_test["properties"]["a"]["type"]
+    assert type_ref.type_name == "f32"
+    assert type_ref.definition is registry.type_infos["f32"]
+    # but they serialize as before
+    assert type_ref == {"$ref": "#/$defs/f32"}
+    assert json.loads(json.dumps(basic_test)) == basic_test
+
+    type_infos = resolve_type_refs({"Foo": {"title": "Foo", "properties": {"bar": {"type": {"$ref": "#/$defs/Bar"}}}}})
+    assert type_infos["Foo"]["properties"]["bar"]["type"].definition is MISSING_TYPE
+
+def test_registry_parsed_values_cache(setup_data):
+    registry = bpy.context.window_manager.components_registry
+    registry.schemaPath = setup_data["schema_path"]
+    bpy.ops.object.reload_registry()
+    cache = registry.parsed_values_cache
+    assert cache.hits == 0 and cache.misses == 0
+
+    # identical values are only parsed once
+    definition = registry.type_infos["bevy_example::test_components::BasicTest"]
+    bpy.ops.object.add_bevy_component(component_type=definition["title"])
+    object = bpy.context.object
+    propertyGroup = getattr(get_component_metadata_by_short_name(object, "BasicTest"), registry.get_propertyGroupName_from_shortName("BasicTest"))
+    for index in range(3):
+        property_group_value_from_custom_property_value(propertyGroup, definition, registry, '(a: 0.5, b: 12, c: "foo")')
+    assert propertyGroup.b == 12
+    assert cache.misses == 1 and cache.hits == 2
+    parsed_value = cache.parse(definition["title"], '(a: 0.5, b: 12, c: "foo")')
+    assert parsed_value["b"] == "12"
+
+    # the least recently used values are dropped first
+    small_cache = ParsedValuesCache(max_size=2)
+    first = small_cache.parse("f32", "1.0")
+    small_cache.parse("f32", "2.0")
+    small_cache.parse("f32", "1.0")
+    small_cache.parse("f32", "3.0")
+    assert list(small_cache.values.keys()) == [("f32", "1.0"), ("f32", "3.0")]
+    assert small_cache.parse("f32", "1.0") is first
+
+    # & everything is dropped on reload
+    bpy.ops.object.reload_registry()
+    assert len(cache.values) == 0 and cache.hits == 0